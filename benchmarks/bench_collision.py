@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+"""
+衝突判定の計測
+ランダムに配置した障害物(直方体・球)と床の中で、関節空間の補間による
+軌道を一括で判定し、広域判定のブロックの大きさごとの処理時間を比較する
+
+使い方:
+    python benchmarks/bench_collision.py [--samples N] [--obstacles N]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# リポジトリの src ディレクトリ(未インストールでも計測できるようにする)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, 'src'))
+
+import numpy as np  # noqa: E402
+from robot_arm_simulator.collision import (  # noqa: E402
+    Box, CollisionChecker, CollisionScene, Sphere)
+from robot_arm_simulator.config import RobotConfig  # noqa: E402
+from robot_arm_simulator.trajectory import joint_trajectory  # noqa: E402
+
+
+def make_scene(count, seed=0):
+    """到達距離の2倍の範囲(z >= 0)に直方体と球を交互に配置した障害物の集合"""
+    rng = np.random.default_rng(seed)
+    reach = RobotConfig.get_max_reach()
+    scene = CollisionScene()
+    for index in range(count):
+        center = rng.uniform(-2.0 * reach, 2.0 * reach, 3)
+        center[2] = abs(center[2])
+        if index % 2:
+            scene.add(Box(center, rng.uniform(4.0, 12.0, 3)))
+        else:
+            scene.add(Sphere(center, rng.uniform(2.0, 6.0)))
+    return scene
+
+
+def make_path(samples, seed=0):
+    """ランダムな経由点(1000 サンプルごと)を5次補間した軌道"""
+    rng = np.random.default_rng(seed)
+    count = max(samples // 1000, 1) + 1
+    waypoints = rng.uniform([-np.pi, 0.0, 0.3, -1.0],
+                            [np.pi, 1.2, 2.0, 1.0], (count, 4))
+    return joint_trajectory(waypoints, dt=0.001).angles[:samples]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--samples', type=int, default=100000,
+                        help='軌道のサンプル数, デフォルト: 100000')
+    parser.add_argument('--obstacles', type=int, default=300,
+                        help='障害物の数, デフォルト: 300')
+    args = parser.parse_args()
+
+    scene = make_scene(args.obstacles)
+    path = make_path(args.samples)
+    print(f'scene   : {scene}')
+    print(f'samples : {len(path)}')
+
+    reference = None
+    for block_size in (1, 16, 64, 256):
+        checker = CollisionChecker(scene=scene, block_size=block_size)
+        start = time.perf_counter()
+        result = checker.check(path)
+        elapsed = time.perf_counter() - start
+        print(f'block {block_size:4d} : {elapsed:.3f} s  {result}')
+        if reference is None:
+            reference = result.colliding
+        elif not np.array_equal(reference, result.colliding):
+            print('[ERROR] result differs from block_size=1')
+            return 1
+
+    checker = CollisionChecker(scene=scene)
+    start = time.perf_counter()
+    result = checker.check(path, first_only=True)
+    elapsed = time.perf_counter() - start
+    print(f'first only : {elapsed:.3f} s  index={result.index}, '
+          f'pair={result.pair}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+"""
+制御サーバーの計測(ローカルのテストクライアント)
+同じプロセスで ControlServer を起動し、複数のクライアントから一定の頻度で
+関節・手先の目標を送り続けたときの、目標の反映までの遅延・周期の処理時間・
+遅れた周期の数と、状態を読まない遅いクライアントで捨てた状態の数を表示する。
+最後に目標へ到達することを確認する
+
+使い方:
+    python benchmarks/bench_control_server.py [--clients N] [--rate HZ]
+                                              [--send-rate HZ] [--seconds S]
+                                              [--unix PATH]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+# リポジトリの src ディレクトリ(未インストールでも計測できるようにする)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, 'src'))
+
+import numpy as np  # noqa: E402
+from robot_arm_simulator.control_server import (  # noqa: E402
+    ControlClient, ControlServer)
+
+
+async def stream_targets(address, index, send_rate, seconds):
+    """一定の頻度で目標を送り続けるクライアント(偶数番は手先、奇数番は関節)"""
+    rng = np.random.default_rng(index)
+    client = await ControlClient().connect(address)
+    robot = ControlServer().robot
+    lower, upper = robot.joint_limits()
+    sent = 0
+    loop = asyncio.get_running_loop()
+    end = loop.time() + seconds
+    while loop.time() < end:
+        angles = rng.uniform(lower, upper)
+        if index % 2:
+            await client.send_joints(angles, message_id=f'{index}-{sent}')
+        else:
+            angles[3] = 0.0
+            position = robot.forward_kinematics(*angles)[-1]
+            await client.send_position(position, message_id=f'{index}-{sent}')
+        sent += 1
+        await asyncio.sleep(1.0 / send_rate)
+    await client.close()
+    return sent
+
+
+async def run(args):
+    server = ControlServer(rate=args.rate)
+    address = await server.start(path=args.unix)
+    print(f'server  : {address}, {args.rate:g} Hz')
+
+    # 状態を購読するが読まないクライアント(送信キューで古い状態を捨てる)
+    if isinstance(address, str):
+        _, slow = await asyncio.open_unix_connection(address)
+    else:
+        _, slow = await asyncio.open_connection(*address)
+    slow.write(b'{"type": "subscribe"}\n')
+    await slow.drain()
+
+    sent = await asyncio.gather(*(
+        stream_targets(address, index, args.send_rate, args.seconds)
+        for index in range(args.clients)))
+    print(f'sent    : {sum(sent)} targets from {args.clients} clients')
+
+    monitor = await ControlClient().connect(address)
+    await monitor.subscribe()
+    await monitor.send_joints([0.3, 0.8, 0.6, 0.1], message_id='final')
+    state = await monitor.wait_settled('final')
+    metrics = await monitor.metrics()
+    await monitor.close()
+    slow.close()
+    await server.close()
+
+    latency = metrics['target_latency']
+    duration = metrics['tick_duration']
+    print(f'latency : p50 {latency["p50_ms"]:.3f} ms, '
+          f'p99 {latency["p99_ms"]:.3f} ms, max {latency["max_ms"]:.3f} ms '
+          f'({latency["count"]} targets)')
+    print(f'tick    : p50 {duration["p50_ms"]:.3f} ms, '
+          f'p99 {duration["p99_ms"]:.3f} ms, '
+          f'overruns {metrics["overruns"]} / {metrics["tick"]}')
+    for client in metrics['clients']:
+        print(f'client  : {client}')
+    if not np.allclose(state['angles'], [0.3, 0.8, 0.6, 0.1]):
+        print(f'[ERROR] did not reach the final target: {state}')
+        return 1
+    print(f'final   : tick {state["tick"]}, angles {state["angles"]}')
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--clients', type=int, default=4,
+                        help='目標を送るクライアント数, デフォルト: 4')
+    parser.add_argument('--rate', type=float, default=100.0,
+                        help='サーバーの周期の頻度 [Hz], デフォルト: 100')
+    parser.add_argument('--send-rate', type=float, default=200.0,
+                        help='クライアントごとの送信頻度 [Hz], デフォルト: 200')
+    parser.add_argument('--seconds', type=float, default=3.0,
+                        help='送信を続ける時間 [s], デフォルト: 3')
+    parser.add_argument('--unix', metavar='PATH',
+                        help='TCP の代わりに使う Unix ソケットのパス')
+    args = parser.parse_args()
+    return asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
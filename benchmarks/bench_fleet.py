@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+"""
+複数台の一括シミュレーションの計測
+台ごとにリンク長の異なる Fleet を 1 kHz の周期で動かし、1周期
+(全台の step・手先位置・角度制限の判定)の処理時間を型ごとに計測する。
+全台の逆運動学の時間と、ThreeAxisKinematics との結果の一致も確認する。
+周期の予算を前提とする float32 の p99 が周期を超えた場合は終了コード 1 を
+返す(float64 は参考値)
+
+使い方:
+    python benchmarks/bench_fleet.py [--arms N] [--ticks N] [--dt S]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# リポジトリの src ディレクトリ(未インストールでも計測できるようにする)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, 'src'))
+
+import numpy as np  # noqa: E402
+from robot_arm_simulator.fleet import Fleet  # noqa: E402
+from robot_arm_simulator.kinematics import (  # noqa: E402
+    IK_STATUS_OK, ThreeAxisKinematics)
+
+
+def make_fleet(count, dtype, seed=0):
+    """リンク長を ±30 % ばらつかせた Fleet と、目標の関節角度"""
+    rng = np.random.default_rng(seed)
+    base = ThreeAxisKinematics()
+    links = np.array([base.link1, base.link2, base.link3])
+    scale = rng.uniform(0.7, 1.3, (count, 3))
+    fleet = Fleet(count, link_lengths=links * scale, dtype=dtype)
+    lower, upper = base.joint_limits()
+    return fleet, rng.uniform(lower, upper, (count, 4))
+
+
+def run_ticks(fleet, targets, ticks, dt):
+    """1周期ごとの処理時間 [s] の配列"""
+    fleet.set_targets(targets)
+    positions = np.empty((3, fleet.count), fleet.dtype)
+    elapsed = np.empty(ticks)
+    for tick in range(ticks):
+        start = time.perf_counter()
+        fleet.step(dt)
+        fleet.end_effector(out=positions)
+        fleet.within_limits(fleet.angles)
+        elapsed[tick] = time.perf_counter() - start
+    return elapsed
+
+
+def check_robots(fleet, samples=20):
+    """一部の台の手先位置を ThreeAxisKinematics と比較した最大誤差 [mm]"""
+    positions = fleet.end_effector()
+    error = 0.0
+    for index in np.linspace(0, fleet.count - 1, samples).astype(int):
+        robot = fleet.robot(index)
+        expected = robot.forward_kinematics_batch(
+            fleet.angles[:, index][None].astype(float))[0, -1]
+        error = max(error, np.abs(positions[:, index] - expected).max())
+    return error
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--arms', type=int, default=10000,
+                        help='台数, デフォルト: 10000')
+    parser.add_argument('--ticks', type=int, default=2000,
+                        help='計測する周期の数, デフォルト: 2000')
+    parser.add_argument('--dt', type=float, default=0.001,
+                        help='周期 [s], デフォルト: 0.001')
+    args = parser.parse_args()
+
+    for dtype in (np.float64, np.float32):
+        fleet, targets = make_fleet(args.arms, dtype)
+        elapsed = run_ticks(fleet, targets, args.ticks, args.dt)
+        mean, p99 = np.mean(elapsed), np.percentile(elapsed, 99)
+        error = check_robots(fleet)
+        print(f'{np.dtype(dtype).name:7s} : {args.arms} arms, '
+              f'tick mean {mean * 1e3:.3f} ms, p99 {p99 * 1e3:.3f} ms '
+              f'({mean / args.dt * 100:.0f} % of {args.dt * 1e3:g} ms), '
+              f'{fleet}, max error {error:.1e} mm')
+        if error > (1e-9 if dtype is np.float64 else 1e-3):
+            print('[ERROR] Fleet differs from ThreeAxisKinematics')
+            return 1
+        if dtype is np.float32 and p99 > args.dt:
+            print(f'[ERROR] float32 p99 tick exceeds {args.dt * 1e3:g} ms')
+            return 1
+
+    fleet, _ = make_fleet(args.arms, np.float64)
+    goal = fleet.end_effector(
+        np.vstack([make_fleet(args.arms, np.float64, seed=1)[1][:, :3].T,
+                   np.zeros(args.arms)]))
+    start = time.perf_counter()
+    angles, status = fleet.inverse_kinematics(goal)
+    elapsed = time.perf_counter() - start
+    solved = status == IK_STATUS_OK
+    error = np.abs(fleet.end_effector(angles) - goal)[:, solved].max()
+    print(f'IK      : {args.arms} arms, {elapsed * 1e3:.2f} ms, '
+          f'solved {np.count_nonzero(solved)}, max error {error:.1e} mm')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
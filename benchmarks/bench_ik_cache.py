@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+"""
+逆運動学キャッシュの計測
+同じ目標位置を繰り返し計算する場合の、キャッシュなし(毎回計算)と
+キャッシュのヒット時の1回あたりの時間を比較する
+
+使い方:
+    python benchmarks/bench_ik_cache.py [--targets N] [--rounds N]
+                                        [--threads N]
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+# リポジトリの src ディレクトリ(未インストールでも計測できるようにする)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, 'src'))
+
+import numpy as np  # noqa: E402
+from robot_arm_simulator.config import RobotConfig  # noqa: E402
+from robot_arm_simulator.ik_cache import IKCache  # noqa: E402
+from robot_arm_simulator.kinematics import inverse_kinematics  # noqa: E402
+
+
+def make_targets(count, seed=0):
+    """到達可能な範囲の目標位置を生成(リンク長の合計の 9 割以内)"""
+    rng = np.random.default_rng(seed)
+    direction = rng.normal(size=(count, 3))
+    direction /= np.linalg.norm(direction, axis=1, keepdims=True)
+    reach = 0.9 * RobotConfig.get_max_reach()
+    radius = reach * rng.uniform(0.3, 1.0, size=count) ** (1 / 3)
+    return (direction * radius[:, None]).tolist()
+
+
+def per_call_us(function, targets, rounds):
+    """targets を rounds 回繰り返したときの1回あたりの時間 [us]"""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for x, y, z in targets:
+            function(x, y, z)
+    return (time.perf_counter() - start) / (rounds * len(targets)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--targets', type=int, default=300,
+                        help='異なる目標位置の数, デフォルト: 300')
+    parser.add_argument('--rounds', type=int, default=20,
+                        help='繰り返し回数, デフォルト: 20')
+    parser.add_argument('--threads', type=int, default=4,
+                        help='共有キャッシュを使うスレッド数, デフォルト: 4')
+    args = parser.parse_args()
+
+    len_1 = RobotConfig.LINK1_LENGTH
+    len_2 = RobotConfig.LINK2_LENGTH + RobotConfig.LINK3_LENGTH
+    targets = make_targets(args.targets)
+
+    cold = per_call_us(
+        lambda x, y, z: inverse_kinematics(x, y, z, len_1, len_2),
+        targets, args.rounds)
+
+    cache = IKCache(maxsize=max(args.targets, 1))
+    cache.warm(targets, len_1, len_2)
+    hit = per_call_us(
+        lambda x, y, z: cache.inverse_kinematics(x, y, z, len_1, len_2),
+        targets, args.rounds)
+    print(f'cold solve : {cold:8.2f} us/call')
+    print(f'cache hit  : {hit:8.2f} us/call  ({cold / hit:.1f}x)')
+    print(cache.stats())
+
+    # 複数スレッドから同じキャッシュを使う(上限は目標数の半分で破棄も発生)
+    shared = IKCache(maxsize=max(args.targets // 2, 1))
+    workers = [threading.Thread(
+        target=per_call_us,
+        args=(lambda x, y, z: shared.inverse_kinematics(
+            x, y, z, len_1, len_2), targets[i::2], args.rounds))
+        for i in range(args.threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    stats = shared.stats()
+    print(f'{args.threads} threads: {elapsed:.3f} s, {stats}')
+    lookups = sum(len(targets[i::2]) for i in range(args.threads)) * \
+        args.rounds
+    if stats.hits + stats.misses != lookups:
+        print('[ERROR] lookup count mismatch')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
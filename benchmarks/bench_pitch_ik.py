@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+"""
+位置とピッチの逆運動学(4軸)の計測
+格子状の目標位置とピッチの組み合わせを一括で解き、処理速度・収束率・
+反復回数の分布・収束しなかった目標の残差を表示する
+
+使い方:
+    python benchmarks/bench_pitch_ik.py [--step MM] [--pitches N]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# リポジトリの src ディレクトリ(未インストールでも計測できるようにする)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, 'src'))
+
+import numpy as np  # noqa: E402
+from robot_arm_simulator.kinematics import ThreeAxisKinematics  # noqa: E402
+
+
+def make_grid(robot, step, pitches):
+    """
+    リンク長の合計を半径とする球内の格子点と、0 - π のピッチの組み合わせ
+
+    戻り値:
+        targets: 目標位置 [mm] 形状 (N, 3)
+        pitch: 目標ピッチ [rad] 形状 (N,)
+    """
+    reach = robot.link1 + robot.link2 + robot.link3
+    axis = np.arange(-reach, reach + step / 2, step)
+    points = np.stack(np.meshgrid(axis, axis, axis, indexing='ij'),
+                      axis=-1).reshape(-1, 3)
+    points = points[np.linalg.norm(points, axis=1) <= reach]
+    angles = np.linspace(0.0, np.pi, pitches)
+    targets = np.repeat(points, len(angles), axis=0)
+    pitch = np.tile(angles, len(points))
+    return targets, pitch
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--step', type=float, default=10.0,
+                        help='格子の間隔 [mm], デフォルト: 10')
+    parser.add_argument('--pitches', type=int, default=9,
+                        help='ピッチの分割数, デフォルト: 9')
+    parser.add_argument('--max-iterations', type=int, default=20,
+                        help='最大反復回数, デフォルト: 20')
+    args = parser.parse_args()
+
+    robot = ThreeAxisKinematics()
+    targets, pitch = make_grid(robot, args.step, args.pitches)
+
+    start = time.perf_counter()
+    result = robot.inverse_kinematics_pitch_batch(
+        targets, pitch, max_iterations=args.max_iterations)
+    elapsed = time.perf_counter() - start
+
+    iterations = result.iterations
+    print(f'targets    : {len(targets)}')
+    print(f'elapsed    : {elapsed:.3f} s '
+          f'({len(targets) / elapsed:,.0f} targets/s)')
+    print(f'converged  : {result.converged.mean() * 100:.2f} %')
+    print('iterations : mean {:.2f}, p50 {:.0f}, p95 {:.0f}, max {}'.format(
+        iterations.mean(), np.percentile(iterations, 50),
+        np.percentile(iterations, 95), iterations.max()))
+    counts = np.bincount(iterations, minlength=args.max_iterations + 1)
+    for count_iterations, count in enumerate(counts):
+        if count:
+            print(f'  {count_iterations:3d}: {count}')
+
+    # 収束しなかった目標(到達不能・角度制限)の残差
+    missed = ~result.converged
+    if missed.any():
+        print('not converged residual: position p50 {:.2f} / max {:.2f} mm, '
+              'pitch p50 {:.4f} / max {:.4f} rad'.format(
+                  np.median(result.position_error[missed]),
+                  result.position_error[missed].max(),
+                  np.median(result.pitch_error[missed]),
+                  result.pitch_error[missed].max()))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+"""
+経路計画の計測
+第1軸の回転を遮る壁がある場面で、RRT-Connect の1回の計画時間と、
+PRM のロードマップ作成(プロセス数ごと)・キャッシュからの読み込み・
+問い合わせの時間を比較する
+
+使い方:
+    python benchmarks/bench_planner.py [--nodes N] [--queries N]
+                                       [--workers N]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+# リポジトリの src ディレクトリ(未インストールでも計測できるようにする)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, 'src'))
+
+import numpy as np  # noqa: E402
+from robot_arm_simulator.collision import (  # noqa: E402
+    Box, CollisionChecker, CollisionScene)
+from robot_arm_simulator.planner import (  # noqa: E402
+    PRMPlanner, RRTConnectPlanner)
+
+
+def make_queries(checker, count, seed=0):
+    """壁の両側(第1軸が負と正)の衝突しない姿勢の組"""
+    rng = np.random.default_rng(seed)
+    lower, upper = checker.robot.joint_limits()
+    poses = rng.uniform(lower, upper, (50 * count, 4))
+    poses = poses[~checker.check(poses).colliding]
+    left = poses[poses[:, 0] < -0.5][:count]
+    right = poses[poses[:, 0] > 0.5][:count]
+    return list(zip(left, right))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--nodes', type=int, default=5000,
+                        help='PRM のノード数, デフォルト: 5000')
+    parser.add_argument('--queries', type=int, default=10,
+                        help='問い合わせの数, デフォルト: 10')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='ロードマップ作成のプロセス数, デフォルト: CPU 数')
+    args = parser.parse_args()
+
+    scene = CollisionScene([Box((120, 0, 100), (60, 20, 200), name='wall')])
+    checker = CollisionChecker(scene=scene)
+    queries = make_queries(checker, args.queries)
+
+    elapsed = []
+    for index, (start, goal) in enumerate(queries):
+        result = RRTConnectPlanner(checker, seed=index).plan(start, goal)
+        if not result.success:
+            print(f'[ERROR] RRT-Connect failed: {result}')
+            return 1
+        elapsed.append(result.elapsed)
+    print(f'RRT-Connect : {len(queries)} queries, '
+          f'mean {np.mean(elapsed):.3f} s, max {np.max(elapsed):.3f} s')
+
+    workers = args.workers or os.cpu_count() or 1
+    for count in sorted({1, workers}):
+        planner = PRMPlanner(checker, nodes=args.nodes)
+        start = time.perf_counter()
+        roadmap = planner.build(workers=count)
+        print(f'PRM build   : {time.perf_counter() - start:.3f} s '
+              f'({count} workers, {roadmap})')
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        planner.load(workers=workers, cache_dir=cache_dir)
+        cached = PRMPlanner(checker, nodes=args.nodes)
+        start = time.perf_counter()
+        cached.load(cache_dir=cache_dir)
+        print(f'PRM load    : {(time.perf_counter() - start) * 1000:.1f} ms '
+              f'(cached)')
+
+    elapsed = []
+    failed = 0
+    for start, goal in queries:
+        result = cached.plan(start, goal)
+        failed += not result.success
+        elapsed.append(result.elapsed)
+    print(f'PRM query   : {len(queries)} queries, '
+          f'mean {np.mean(elapsed) * 1000:.1f} ms, failed {failed}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+"""
+制御周期用の運動学の遅延の計測
+1周期ごとに関節角度を少しずつ動かして順運動学を計算し、
+ThreeAxisKinematics.forward_kinematics(毎回配列を作成)と
+RealtimeKinematics(事前に確保したバッファへ書き込み)の
+1回あたりの遅延の分布 (p50 / p99 / p99.9 / 最大) を比較する。
+GC は有効のまま計測する。別に tracemalloc で1周期ごとに確保された
+メモリ(周期内で解放されるものを含む)を計測し、1周期あたりの平均と
+確保のあった周期の数を表示する
+
+使い方:
+    python benchmarks/bench_realtime.py [--ticks N] [--histogram]
+"""
+
+import argparse
+import gc
+import math
+import os
+import sys
+import time
+import tracemalloc
+
+# リポジトリの src ディレクトリ(未インストールでも計測できるようにする)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, 'src'))
+
+import numpy as np  # noqa: E402
+from robot_arm_simulator.kinematics import ThreeAxisKinematics  # noqa: E402
+from robot_arm_simulator.realtime import (  # noqa: E402
+    RealtimeKinematics, RealtimeState)
+
+# 関節の角速度の指令 [rad/s] と周期 [s]
+VELOCITIES = (0.5, 0.3, -0.2, 0.4)
+DT = 0.001
+
+
+def measure(tick, ticks):
+    """
+    tick() を ticks 回呼び出したときの遅延
+
+    戻り値:
+        latency: 1回ごとの遅延 [ns] 形状 (ticks,)
+        collections: 計測中の GC の回数
+    """
+    latency = np.empty(ticks, dtype=np.int64)
+    perf_counter_ns = time.perf_counter_ns
+    for _ in range(1000):
+        tick()
+    collections = sum(stat['collections'] for stat in gc.get_stats())
+    for index in range(ticks):
+        start = perf_counter_ns()
+        tick()
+        latency[index] = perf_counter_ns() - start
+    collections = sum(stat['collections'] for stat in gc.get_stats()) - \
+        collections
+    return latency, collections
+
+
+def allocations(tick, ticks):
+    """
+    tick() の1回ごとに確保されたメモリ
+
+    tracemalloc のピークを周期ごとにリセットし、tick() の前の使用量からの
+    増分を数える(周期内で確保して解放したメモリも含む)。
+    tracemalloc は遅いため、遅延の計測とは別に実行する
+
+    戻り値:
+        sizes: 1回ごとの確保量 [byte] 形状 (ticks,)
+    """
+    sizes = np.zeros(ticks, dtype=np.int64)
+    get_traced_memory = tracemalloc.get_traced_memory
+    reset_peak = tracemalloc.reset_peak
+    for _ in range(1000):
+        tick()
+    tracemalloc.start()
+    try:
+        for index in range(ticks):
+            before = get_traced_memory()[0]
+            reset_peak()
+            tick()
+            sizes[index] = get_traced_memory()[1] - before
+    finally:
+        tracemalloc.stop()
+    return sizes
+
+
+def print_histogram(latency):
+    """遅延の分布を 2 倍刻みの区間で表示"""
+    edges = 2.0 ** np.arange(
+        math.floor(math.log2(latency.min())),
+        math.ceil(math.log2(latency.max())) + 1)
+    counts, _ = np.histogram(latency, bins=edges)
+    for low, count in zip(edges, counts):
+        if count:
+            bar = '#' * max(1, round(40 * count / counts.max()))
+            print(f'    {low / 1e3:9.2f} us - : {count:8d} {bar}')
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--ticks', type=int, default=200000,
+                        help='計測する周期の数, デフォルト: 200000')
+    parser.add_argument('--histogram', action='store_true',
+                        help='遅延の分布を表示する')
+    args = parser.parse_args()
+
+    robot = ThreeAxisKinematics()
+    realtime = RealtimeKinematics(robot)
+    state = RealtimeState()
+    angles = [0.0, 0.5, 0.5, 0.0]
+
+    def advance():
+        """関節角度を1周期分進める(計測側でメモリを確保しないよう展開)"""
+        angles[0] += VELOCITIES[0] * DT
+        angles[1] += VELOCITIES[1] * DT
+        angles[2] += VELOCITIES[2] * DT
+        angles[3] += VELOCITIES[3] * DT
+
+    def current():
+        """現在の方法: 角度を更新して forward_kinematics"""
+        advance()
+        return robot.forward_kinematics(*angles)
+
+    def realtime_forward():
+        """RealtimeKinematics.forward でバッファへ書き込み"""
+        advance()
+        return realtime.forward(angles[0], angles[1], angles[2], angles[3],
+                                out=state)
+
+    def realtime_step():
+        """RealtimeKinematics.step で速度指令から更新"""
+        return realtime.step(state, VELOCITIES, DT)
+
+    realtime.forward(*angles, out=state)
+    error = np.abs(np.array(robot.forward_kinematics(*angles)) -
+                   state.positions).max()
+    if error > 1e-9:
+        print(f'[ERROR] RealtimeKinematics differs by {error:.1e} mm')
+        return 1
+
+    for name, tick in (('forward_kinematics', current),
+                       ('realtime forward', realtime_forward),
+                       ('realtime step', realtime_step)):
+        angles[:] = [0.0, 0.5, 0.5, 0.0]
+        latency, collections = measure(tick, args.ticks)
+        sizes = allocations(tick, min(args.ticks, 20000))
+        p50, p99, p999 = np.percentile(latency, [50, 99, 99.9]) / 1e3
+        print(f'{name:18s} : p50 {p50:6.2f} us, p99 {p99:6.2f} us, '
+              f'p99.9 {p999:6.2f} us, max {latency.max() / 1e3:8.2f} us, '
+              f'alloc {sizes.mean():7.1f} B/tick '
+              f'({np.count_nonzero(sizes)}/{len(sizes)} ticks), '
+              f'gc {collections}')
+        if args.histogram:
+            print_histogram(latency)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+"""
+操作の記録の遅延の計測
+SessionRecorder.record を連続して呼び出し、1回あたりの遅延の分布
+(p50 / p99 / 最大)、計測中に増えたメモリブロック数、書き出しの
+追いつき(dropped)を表示する。比較としてリストへ追記する場合も計測する
+
+使い方:
+    python benchmarks/bench_recorder.py [--events N] [--capacity N]
+                                       [--compression zlib]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+# リポジトリの src ディレクトリ(未インストールでも計測できるようにする)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, 'src'))
+
+import numpy as np  # noqa: E402
+from robot_arm_simulator.recorder import SessionRecorder  # noqa: E402
+from robot_arm_simulator.trajectory_file import (  # noqa: E402
+    COMPRESSIONS, TrajectoryFile)
+
+
+def measure(record, events):
+    """
+    record(angles) を events 回呼び出したときの遅延
+
+    戻り値:
+        latency: 1回ごとの遅延 [ns] 形状 (events,)
+        blocks: 計測中に増えたメモリブロック数
+    """
+    angles = [0.1, 0.2, 0.3, 0.4]
+    latency = np.empty(events, dtype=np.int64)
+    perf_counter_ns = time.perf_counter_ns
+    blocks = sys.getallocatedblocks()
+    for index in range(events):
+        start = perf_counter_ns()
+        record(angles)
+        latency[index] = perf_counter_ns() - start
+    return latency, sys.getallocatedblocks() - blocks
+
+
+def report(name, latency, blocks):
+    """遅延の分布とメモリブロック数を表示"""
+    p50, p99 = np.percentile(latency, [50, 99]) / 1e3
+    print(f'{name:10s}: p50 {p50:7.2f} us, p99 {p99:7.2f} us, '
+          f'max {latency.max() / 1e3:9.2f} us, blocks {blocks:+d}')
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--events', type=int, default=500000,
+                        help='記録する回数, デフォルト: 500000')
+    parser.add_argument('--capacity', type=int, default=65536,
+                        help='リングバッファのフレーム数, デフォルト: 65536')
+    parser.add_argument('--compression', choices=COMPRESSIONS[1:],
+                        help='書き出しの圧縮方式, デフォルト: 圧縮なし')
+    args = parser.parse_args()
+    print(f'events: {args.events}, capacity: {args.capacity}')
+
+    history = []
+    clock = time.perf_counter
+
+    def append(angles):
+        history.append((clock(), tuple(angles)))
+
+    report('list', *measure(append, args.events))
+    del history[:]
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'session.rtraj')
+        recorder = SessionRecorder(
+            path, capacity=args.capacity,
+            flush_frames=max(1, args.capacity // 8),
+            compression=args.compression)
+        latency, blocks = measure(recorder.record, args.events)
+        recorder.close()
+        report('recorder', latency, blocks)
+        print(recorder)
+        with TrajectoryFile(path) as recording:
+            print(f'{recording}, {os.path.getsize(path) / 2 ** 20:.1f} MiB')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
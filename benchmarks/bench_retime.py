@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+"""
+関節の速度・加速度制限による時刻の付け直しの計測
+ランダムな経由点の5次補間の経路を retime で付け直し、処理時間と
+出力の関節速度・加速度の制限に対する最大比を表示する。
+制限を超えた場合は終了コード 1 を返す
+
+使い方:
+    python benchmarks/bench_retime.py [--samples N] [--rate HZ]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# リポジトリの src ディレクトリ(未インストールでも計測できるようにする)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, 'src'))
+
+import numpy as np  # noqa: E402
+from robot_arm_simulator.config import RobotConfig  # noqa: E402
+from robot_arm_simulator.kinematics import ThreeAxisKinematics  # noqa: E402
+from robot_arm_simulator.trajectory import (  # noqa: E402
+    joint_trajectory, retime)
+
+
+def make_path(samples, seed=0):
+    """角度制限内のランダムな経由点(1000 サンプルごと)を通る経路"""
+    rng = np.random.default_rng(seed)
+    lower, upper = ThreeAxisKinematics().joint_limits()
+    count = max(samples // 1000, 1) + 1
+    waypoints = lower + (upper - lower) * rng.uniform(0.2, 0.8, (count, 4))
+    path = joint_trajectory(waypoints, dt=0.001).angles
+    return path[:samples]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--samples', type=int, default=100000,
+                        help='経路のサンプル数, デフォルト: 100000')
+    parser.add_argument('--rate', type=float, default=1000.0,
+                        help='制御周期 [Hz], デフォルト: 1000')
+    args = parser.parse_args()
+
+    path = make_path(args.samples)
+    start = time.perf_counter()
+    trajectory = retime(path, rate=args.rate)
+    elapsed = time.perf_counter() - start
+
+    # 出力の差分による速度・加速度(最後の端数の周期は除く)
+    step = np.diff(trajectory.times)[:-1, None]
+    velocity = np.diff(trajectory.angles[:-1], axis=0) / step
+    acceleration = np.diff(velocity, axis=0) / step[1:]
+    velocity_ratio = np.abs(velocity) / RobotConfig.get_max_velocity_rad()
+    acceleration_ratio = \
+        np.abs(acceleration) / RobotConfig.get_max_acceleration_rad()
+    print(f'path samples : {len(path)}')
+    print(f'elapsed      : {elapsed * 1000:.1f} ms')
+    print(f'output       : {trajectory}')
+    print(f'velocity     : max {velocity_ratio.max():.3f} of limit')
+    print(f'acceleration : max {acceleration_ratio.max():.3f} of limit')
+    # 丸め誤差は許容する
+    if max(velocity_ratio.max(), acceleration_ratio.max()) > 1.0 + 1e-6:
+        print('[ERROR] retimed trajectory exceeds the joint limits')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+"""
+シリアルリンク機構の計測
+SerialChain.three_axis の順運動学を ThreeAxisKinematics と比較し、
+7軸の機構の順運動学・ヤコビ行列の一括計算の処理時間を計測する
+
+使い方:
+    python benchmarks/bench_serial_chain.py [--samples N]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# リポジトリの src ディレクトリ(未インストールでも計測できるようにする)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, 'src'))
+
+import numpy as np  # noqa: E402
+from robot_arm_simulator.kinematics import ThreeAxisKinematics  # noqa: E402
+from robot_arm_simulator.serial_chain import SerialChain  # noqa: E402
+
+# 7軸アームの DH パラメータ (a, alpha, d, offset)
+SEVEN_AXIS_DH = [[0, -np.pi / 2, 100, 0],
+                 [0, np.pi / 2, 0, 0],
+                 [0, -np.pi / 2, 80, 0],
+                 [0, np.pi / 2, 0, 0],
+                 [0, -np.pi / 2, 60, 0],
+                 [0, np.pi / 2, 0, 0],
+                 [0, 0, 20, 0]]
+
+
+def timed(function, *args):
+    """関数の実行時間 [s] と戻り値"""
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--samples', type=int, default=100000,
+                        help='姿勢の数, デフォルト: 100000')
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+
+    robot = ThreeAxisKinematics()
+    chain = SerialChain.three_axis(robot)
+    thetas = rng.uniform(*robot.joint_limits(), (args.samples, 4))
+    elapsed, expected = timed(robot.forward_kinematics_batch, thetas)
+    print(f'ThreeAxisKinematics FK : {elapsed:.3f} s')
+    elapsed, positions = timed(chain.forward_kinematics_batch, thetas)
+    error = np.abs(positions - expected).max()
+    print(f'SerialChain (4 axes) FK : {elapsed:.3f} s  '
+          f'max error {error:.2e} mm')
+    if error > 1e-9:
+        print('[ERROR] SerialChain differs from ThreeAxisKinematics')
+        return 1
+
+    chain = SerialChain.from_dh(SEVEN_AXIS_DH)
+    thetas = rng.uniform(*chain.joint_limits(), (args.samples, chain.dof))
+    elapsed, _ = timed(chain.forward_kinematics_batch, thetas)
+    print(f'SerialChain (7 axes) FK : {elapsed:.3f} s')
+    elapsed, _ = timed(chain.jacobian_batch, thetas)
+    print(f'SerialChain (7 axes) J  : {elapsed:.3f} s')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+"""
+連続する目標の逆運動学(追従)の計測
+-X 軸を横切る円(高さが上下する)に沿って 1 kHz で目標を与え、
+1サンプルずつ次の3通りで解いたときの遅延と関節角度の跳びを比較する
+
+    independent: inverse_kinematics_select_batch を目標ごとに独立に呼ぶ
+    nearest:     inverse_kinematics_select_batch に前回の解を current として渡す
+    tracker:     IKTracker.update(前回の解からの差分の更新)
+    tracker+max: IKTracker.update(max_step で1サンプルの変化を制限)
+
+theta1 の角度制限が [-π, π] のため、-X 軸を横切ると max_step なしでは
+どの方法でも theta1 が約 2π 跳ぶ。tracker+max の跳びが max_step を
+超えた場合は終了コード 1 を返す
+
+使い方:
+    python benchmarks/bench_tracking.py [--samples N] [--radius R]
+                                       [--max_step RAD]
+"""
+
+import argparse
+import math
+import os
+import sys
+import time
+
+# リポジトリの src ディレクトリ(未インストールでも計測できるようにする)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, 'src'))
+
+import numpy as np  # noqa: E402
+from robot_arm_simulator.kinematics import (  # noqa: E402
+    ThreeAxisKinematics)
+from robot_arm_simulator.tracking import IKTracker  # noqa: E402
+
+
+def circle(samples, radius):
+    """-X 軸を横切る円の目標の列 [mm] 形状 (samples, 3)"""
+    t = np.linspace(0.0, 2.0 * math.pi, samples)
+    return np.stack([radius * np.cos(t + 0.3),
+                     radius * np.sin(t + 0.3),
+                     60.0 + 20.0 * np.sin(3.0 * t)], axis=1)
+
+
+def run(solve, targets):
+    """
+    solve(x, y, z) を目標ごとに呼び出す
+
+    戻り値:
+        angles: 関節角度 [rad] 形状 (N, 4)
+        latency: 1サンプルごとの遅延 [ns] 形状 (N,)
+    """
+    angles = np.empty((len(targets), 4))
+    latency = np.empty(len(targets), dtype=np.int64)
+    perf_counter_ns = time.perf_counter_ns
+    for index, (x, y, z) in enumerate(targets.tolist()):
+        start = perf_counter_ns()
+        result = solve(x, y, z)
+        latency[index] = perf_counter_ns() - start
+        angles[index] = result
+    return angles, latency
+
+
+def report(name, robot, targets, angles, latency):
+    """
+    遅延・関節角度の跳び・位置の誤差を表示
+
+    戻り値:
+        max_jump: 1サンプルあたりの関節角度の変化の最大値 [rad]
+    """
+    p50, p99 = np.percentile(latency, [50, 99]) / 1e3
+    jumps = np.abs(np.diff(angles, axis=0)).max(axis=1)
+    positions = robot.forward_kinematics_batch(angles)[:, -1]
+    errors = np.linalg.norm(positions - targets, axis=1)
+    print(f'{name:12s}: p50 {p50:8.2f} us, p99 {p99:8.2f} us, '
+          f'max jump {math.degrees(jumps.max()):7.2f} deg, '
+          f'jumps > 10 deg {np.count_nonzero(jumps > math.radians(10)):4d}, '
+          f'max error {errors.max():.2e} mm')
+    return jumps.max()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--samples', type=int, default=20000,
+                        help='目標の数(1周あたり), デフォルト: 20000')
+    parser.add_argument('--radius', type=float, default=120.0,
+                        help='円の半径 [mm], デフォルト: 120')
+    parser.add_argument('--max_step', type=float, default=0.05,
+                        help='tracker+max の1サンプルあたりの関節角度の'
+                             '変化の上限 [rad], デフォルト: 0.05')
+    args = parser.parse_args()
+
+    robot = ThreeAxisKinematics()
+    targets = circle(args.samples, args.radius)
+    print(f'samples: {args.samples}, radius: {args.radius:g} mm')
+
+    def independent(x, y, z):
+        angles, _, _ = robot.inverse_kinematics_select_batch([[x, y, z]])
+        return angles[0]
+
+    previous = [robot.inverse_kinematics_select_batch(targets[:1])[0][0]]
+
+    def nearest(x, y, z):
+        angles, _, _ = robot.inverse_kinematics_select_batch(
+            [[x, y, z]], current=previous[0])
+        previous[0] = angles[0]
+        return angles[0]
+
+    tracker = IKTracker(robot, initial=previous[0])
+    limited = IKTracker(robot, initial=previous[0], max_step=args.max_step)
+
+    for name, solve in (('independent', independent), ('nearest', nearest),
+                        ('tracker', tracker.update),
+                        ('tracker+max', limited.update)):
+        angles, latency = run(solve, targets)
+        max_jump = report(name, robot, targets, angles, latency)
+    print(tracker)
+    print(limited)
+    # 丸め誤差は許容する
+    if max_jump > args.max_step + 1e-9:
+        print(f'[ERROR] tracker+max jumps {max_jump:.4f} rad '
+              f'(max_step {args.max_step:g} rad)')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
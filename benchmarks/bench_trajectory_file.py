@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+"""
+軌道の保存形式の計測
+同じ軌道を、タプルのリストの pickle と軌道のバイナリファイル
+(圧縮なし / zlib) で保存し、保存・読み込み(開く)・全フレームの走査に
+要する時間、ファイルサイズ、読み込み後のピークメモリを比較する
+
+使い方:
+    python benchmarks/bench_trajectory_file.py [--frames N]
+                                              [--dtype float32|float64]
+"""
+
+import argparse
+import os
+import pickle
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# リポジトリの src ディレクトリ(未インストールでも計測できるようにする)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, 'src'))
+
+import numpy as np  # noqa: E402
+from robot_arm_simulator.kinematics import (  # noqa: E402
+    ThreeAxisKinematics)
+from robot_arm_simulator.trajectory_file import (  # noqa: E402
+    DTYPES, TrajectoryFile, TrajectoryWriter)
+
+
+def make_trajectory(frames):
+    """1 kHz でゆっくり動く軌道(時刻 [s] と関節角度 [rad])"""
+    times = np.arange(frames) * 1e-3
+    angles = np.stack([np.sin(0.5 * times),
+                       1.0 + 0.5 * np.sin(0.3 * times),
+                       1.0 + 0.5 * np.cos(0.2 * times),
+                       np.zeros(frames)], axis=1)
+    return times, angles
+
+
+def measure(name, path, save, load):
+    """保存・読み込み・走査の時間とピークメモリを表示"""
+    start = time.perf_counter()
+    save()
+    saved = time.perf_counter() - start
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    trajectory = load()
+    opened = time.perf_counter() - start
+    start = time.perf_counter()
+    count = 0
+    for _ in trajectory:
+        count += 1
+    scanned = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f'{name:10s}: size {os.path.getsize(path) / 2 ** 20:8.1f} MiB, '
+          f'save {saved:7.3f} s, open {opened * 1e3:9.2f} ms, '
+          f'scan {scanned:7.3f} s ({count} frames), '
+          f'peak {peak / 2 ** 20:8.1f} MiB')
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--frames', type=int, default=2000000,
+                        help='フレーム数, デフォルト: 2000000')
+    parser.add_argument('--dtype', choices=DTYPES, default='float32',
+                        help='関節角度の数値型, デフォルト: float32')
+    args = parser.parse_args()
+
+    robot = ThreeAxisKinematics()
+    times, angles = make_trajectory(args.frames)
+    print(f'frames: {args.frames}, dtype: {args.dtype}')
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'trajectory.pickle')
+        trajectory = [tuple(row) for row in angles.tolist()]
+
+        def save_pickle():
+            with open(path, 'wb') as file:
+                pickle.dump(trajectory, file,
+                            protocol=pickle.HIGHEST_PROTOCOL)
+
+        def load_pickle():
+            with open(path, 'rb') as file:
+                return pickle.load(file)
+
+        measure('pickle', path, save_pickle, load_pickle)
+
+        for compression in (None, 'zlib'):
+            path = os.path.join(directory, f'trajectory_{compression}.rtraj')
+
+            def save_file():
+                with TrajectoryWriter(path, robot, dtype=args.dtype,
+                                      compression=compression) as writer:
+                    writer.write(times, angles)
+
+            measure(compression or 'rtraj', path, save_file,
+                    lambda: TrajectoryFile(path))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
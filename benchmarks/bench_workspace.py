@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+"""
+到達可能領域(ReachabilityMap)の計測
+ボクセルマップの計算・キャッシュの読み込み・到達可能の判定の時間を計測し、
+角度制限内のランダムな関節角度の順運動学による手先位置が全て到達可能と
+判定されることを確認する(1点でも外れた場合は終了コード 1 を返す)
+
+使い方:
+    python benchmarks/bench_workspace.py [--resolution MM] [--samples N]
+                                        [--seed N]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+# リポジトリの src ディレクトリ(未インストールでも計測できるようにする)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, 'src'))
+
+import numpy as np  # noqa: E402
+from robot_arm_simulator.kinematics import ThreeAxisKinematics  # noqa: E402
+from robot_arm_simulator.workspace import ReachabilityMap  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--resolution', type=float, default=5.0,
+                        help='ボクセルの一辺 [mm], デフォルト: 5')
+    parser.add_argument('--samples', type=int, default=200000,
+                        help='確認する関節角度の数, デフォルト: 200000')
+    parser.add_argument('--seed', type=int, default=1,
+                        help='乱数のシード, デフォルト: 1')
+    args = parser.parse_args()
+
+    robot = ThreeAxisKinematics()
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        ReachabilityMap.load(robot, args.resolution, cache_dir=directory)
+        built = time.perf_counter() - start
+        start = time.perf_counter()
+        reach = ReachabilityMap.load(robot, args.resolution,
+                                     cache_dir=directory)
+        loaded = time.perf_counter() - start
+        print(f'grid   : {reach.grid.shape}, '
+              f'{np.count_nonzero(reach.grid)} reachable voxels')
+        print(f'build  : {built:.3f} s (including save)')
+        print(f'load   : {loaded * 1e3:.2f} ms (cached)')
+
+        lower, upper = robot.joint_limits()
+        rng = np.random.default_rng(args.seed)
+        angles = rng.uniform(lower, upper, (args.samples, 4))
+        points = robot.forward_kinematics_batch(angles)[:, -1]
+        start = time.perf_counter()
+        reachable = reach.is_reachable(points)
+        elapsed = time.perf_counter() - start
+        missed = np.count_nonzero(~reachable)
+        print(f'query  : {args.samples} points, {elapsed * 1e3:.2f} ms, '
+              f'missed {missed}')
+        del reach
+    if missed:
+        distance = np.linalg.norm(points[~reachable], axis=1)
+        print(f'[ERROR] {missed} reachable FK points test as unreachable '
+              f'(|p| = {distance.min():.2f} - {distance.max():.2f} mm)')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+"""
+import 時間の計測
+python -X importtime で運動学のみの import と描画機能の import を計測し、
+運動学のみの import で matplotlib が読み込まれていないかを確認する
+
+使い方:
+    python benchmarks/import_time.py [--repeat N] [--max-kinematics-ms MS]
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+# リポジトリの src ディレクトリ(未インストールでも計測できるようにする)
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                       os.pardir, 'src')
+
+# 計測する import 文
+IMPORT_PATHS = {
+    'kinematics': 'import robot_arm_simulator.kinematics',
+    'robot_plot': 'import robot_arm_simulator.robot_plot',
+    'render': ('import robot_arm_simulator.robot_plot as RS; '
+               'RS.pyplot()'),
+}
+
+_IMPORTTIME_LINE = re.compile(
+    r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$')
+
+
+def measure(statement):
+    """
+    1回分の import 時間を計測
+
+    パラメータ:
+        statement: 実行する import 文
+
+    戻り値:
+        total_us: 全モジュールの import 時間の合計 [us]
+        modules: 読み込まれたモジュール名の集合
+    """
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [os.path.abspath(SRC_DIR)] +
+        ([env['PYTHONPATH']] if env.get('PYTHONPATH') else []))
+    env['MPLBACKEND'] = 'Agg'
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        env=env, capture_output=True, text=True, check=True)
+    total_us = 0
+    modules = set()
+    for line in completed.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match is None:
+            continue
+        self_us, _, indent, name = match.groups()
+        total_us += int(self_us)
+        modules.add(name)
+    return total_us, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description='import 時間の計測')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='計測回数(最小値を採用), デフォルト: 5')
+    parser.add_argument('--max-kinematics-ms', type=float, default=None,
+                        help='運動学のみの import 時間の上限 [ms]')
+    args = parser.parse_args()
+
+    failed = False
+    results = {}
+    for name, statement in IMPORT_PATHS.items():
+        best_us = None
+        for _ in range(args.repeat):
+            total_us, modules = measure(statement)
+            best_us = total_us if best_us is None else min(best_us, total_us)
+        uses_matplotlib = any(module.split('.')[0] == 'matplotlib'
+                              for module in modules)
+        results[name] = best_us
+        print(f'{name:12s} {best_us / 1000:8.1f} ms  '
+              f'matplotlib={"yes" if uses_matplotlib else "no"}')
+        if name == 'kinematics' and uses_matplotlib:
+            print('[ERROR] kinematics import loads matplotlib')
+            failed = True
+        if name == 'robot_plot' and uses_matplotlib:
+            print('[ERROR] robot_plot import loads matplotlib')
+            failed = True
+
+    if args.max_kinematics_ms is not None and \
+            results['kinematics'] / 1000 > args.max_kinematics_ms:
+        print(f'[ERROR] kinematics import is slower than '
+              f'{args.max_kinematics_ms} ms')
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,386 @@
+#!/usr/bin/env python
+"""
+性能の回帰確認用のベンチマーク一式
+画面を開かずに(Agg バックエンド)、決まった目標・軌道で次を計測し、
+結果を JSON で出力して保存済みの基準値と比較する
+
+    fk_scalar / fk_batch:       順運動学の1秒あたりの計算数
+    ik_scalar / ik_batch:       逆運動学の1秒あたりの計算数
+    render_plot_robot:          plot_robot による1フレームの描画時間
+    render_update:              アニメーションの更新(描画要素のデータのみ
+                                更新)による1フレームの描画時間
+    import_kinematics / import_robot_plot: import 時間 (import_time.py)
+    export_peak_rss:            軌道(決まったフレーム数)の書き出しによる
+                                プロセスのピーク RSS の増分(子プロセスで
+                                計測、Agg の描画バッファなど C のメモリを含む。
+                                resource モジュールを使うため Unix のみ)
+
+基準値より tolerance(割合)を超えて悪化した項目があれば終了コード 1 を返す。
+基準値は計測するマシンごとに --update-baseline で作り直す
+
+使い方:
+    python benchmarks/suite.py [--output results.json]
+                               [--baseline benchmarks/baseline.json]
+                               [--tolerance 0.3] [--update-baseline]
+                               [--only NAME[,NAME...]] [--quick]
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+# リポジトリの src ディレクトリ(未インストールでも計測できるようにする)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, 'src'))
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+import numpy as np  # noqa: E402
+from import_time import IMPORT_PATHS, measure as measure_import  # noqa: E402
+from robot_arm_simulator.kinematics import (  # noqa: E402
+    ThreeAxisKinematics, inverse_kinematics, inverse_kinematics_batch)
+
+# 基準値の既定のパス
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             'baseline.json')
+
+# 標準の目標数・軌道のフレーム数・書き出しのフレーム数
+# (書き出しのフレーム数は --quick でも変えない)
+TARGET_COUNT = 10000
+TRAJECTORY_FRAMES = 200
+EXPORT_FRAMES = 20
+
+
+def standard_angles(count, seed=0):
+    """角度制限内の決まった関節角度 [rad] 形状 (count, 4)"""
+    robot = ThreeAxisKinematics()
+    lower, upper = robot.joint_limits()
+    rng = np.random.default_rng(seed)
+    return lower + (upper - lower) * rng.random((count, 4))
+
+
+def standard_targets(count, seed=0):
+    """
+    到達できる決まった目標位置 [mm] 形状 (count, 3)
+    (theta4 = 0 の姿勢の手先位置、逆運動学が必ず解ける)
+    """
+    robot = ThreeAxisKinematics()
+    angles = standard_angles(count, seed)
+    angles[:, 3] = 0.0
+    return robot.forward_kinematics_batch(angles)[:, -1]
+
+
+def standard_trajectory(frames):
+    """全ての関節をゆっくり動かす決まった軌道 [rad] 形状 (frames, 4)"""
+    phase = np.linspace(0.0, 2.0 * np.pi, frames)
+    return np.stack([np.sin(phase), 1.0 + 0.5 * np.sin(phase),
+                     1.2 + 0.4 * np.cos(phase), 0.5 * np.sin(2.0 * phase)],
+                    axis=1)
+
+
+def best_time(function, number, repeat):
+    """function を number 回呼び出す時間の repeat 回中の最小値 [s]"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def bench_fk_scalar(scale):
+    robot = ThreeAxisKinematics()
+    angles = standard_angles(1000).tolist()
+    items = iter(angles * 1000)
+
+    def call():
+        robot.forward_kinematics(*next(items))
+    number = int(1000 * scale)
+    return number / best_time(call, number, 5)
+
+
+def bench_fk_batch(scale):
+    robot = ThreeAxisKinematics()
+    angles = standard_angles(TARGET_COUNT)
+    number = max(1, int(20 * scale))
+    return number * TARGET_COUNT / best_time(
+        lambda: robot.forward_kinematics_batch(angles), number, 5)
+
+
+def bench_ik_scalar(scale):
+    robot = ThreeAxisKinematics()
+    link2 = robot.link2 + robot.link3
+    targets = standard_targets(1000).tolist()
+    items = iter(targets * 1000)
+
+    def call():
+        x, y, z = next(items)
+        inverse_kinematics(x, y, z, robot.link1, link2)
+    number = int(1000 * scale)
+    return number / best_time(call, number, 5)
+
+
+def bench_ik_batch(scale):
+    robot = ThreeAxisKinematics()
+    link2 = robot.link2 + robot.link3
+    targets = standard_targets(TARGET_COUNT)
+    number = max(1, int(20 * scale))
+    return number * TARGET_COUNT / best_time(
+        lambda: inverse_kinematics_batch(targets, robot.link1, link2),
+        number, 5)
+
+
+def _render_setup():
+    """描画用のロボットと画面を開かない Figure・3D軸"""
+    from robot_arm_simulator.export import create_headless_axes
+    from robot_arm_simulator.robot_plot import ThreeAxisRobot
+
+    fig, ax = create_headless_axes(dpi=50)
+    return ThreeAxisRobot(), fig, ax
+
+
+def bench_render_plot_robot(scale):
+    robot, fig, ax = _render_setup()
+    frames = iter(standard_trajectory(TRAJECTORY_FRAMES).tolist() * 10)
+
+    def frame():
+        ax.clear()
+        robot.plot_robot(*next(frames), ax=ax)
+        fig.canvas.draw()
+    frame()
+    number = max(1, int(20 * scale))
+    return 1000.0 * best_time(frame, number, 3) / number
+
+
+def bench_render_update(scale):
+    robot, fig, ax = _render_setup()
+    trajectory = standard_trajectory(TRAJECTORY_FRAMES).tolist()
+    frames = iter(trajectory * 10)
+    artists = robot.create_plot_artists(ax, *trajectory[0])
+    fig.canvas.draw()
+
+    def frame():
+        robot.update_plot_artists(artists, *next(frames))
+        fig.canvas.draw()
+    number = max(1, int(40 * scale))
+    return 1000.0 * best_time(frame, number, 3) / number
+
+
+def _bench_import(name):
+    def bench(scale):
+        repeat = max(1, int(3 * scale))
+        return min(measure_import(IMPORT_PATHS[name])[0]
+                   for _ in range(repeat)) / 1000.0
+    return bench
+
+
+def _proc_status_kib(field):
+    """/proc/self/status の項目 (VmRSS, VmHWM など) [KiB]"""
+    with open('/proc/self/status', encoding='ascii') as file:
+        for line in file:
+            if line.startswith(field + ':'):
+                return int(line.split()[1])
+    raise KeyError(field)
+
+
+def export_rss_growth():
+    """
+    軌道を書き出し、ピーク RSS の増分 [MiB] を返す
+
+    tracemalloc は Python のヒープのみを数え、Agg の描画バッファ
+    (C++ で確保)を含まないため、OS が記録するピーク RSS を使う。
+    Linux の ru_maxrss は fork + exec で親プロセスのピークを引き継ぐため、
+    /proc/self/clear_refs でこのプロセスのピーク (VmHWM) を現在の RSS に
+    戻してから書き出し、VmHWM の増分を返す。/proc がない環境では
+    ru_maxrss の増分を使う(親プロセスのピークより小さいと 0 になる)。
+    bench_export_peak_rss から新しい子プロセスで呼び出す
+    """
+    import importlib
+    import resource
+    from robot_arm_simulator.export import export_trajectory
+    from robot_arm_simulator.robot_plot import ThreeAxisRobot
+
+    # 書き出しの中で遅延 import されるモジュールは先に読み込む
+    # (import によるメモリは含めない)
+    for name in ('matplotlib.backends.backend_agg', 'PIL.GifImagePlugin'):
+        importlib.import_module(name)
+    robot = ThreeAxisRobot()
+    trajectory = standard_trajectory(EXPORT_FRAMES)
+    try:
+        with open('/proc/self/clear_refs', 'w', encoding='ascii') as file:
+            file.write('5')
+    except OSError:
+        def peak():
+            # ru_maxrss の単位は macOS では byte、Linux では KiB
+            maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return maxrss if sys.platform == 'darwin' else maxrss * 1024
+        before = peak()
+    else:
+        def peak():
+            return _proc_status_kib('VmHWM') * 1024
+        before = _proc_status_kib('VmRSS') * 1024
+    with tempfile.TemporaryDirectory() as directory:
+        export_trajectory(robot, trajectory,
+                          os.path.join(directory, 'trajectory.gif'),
+                          figsize=(4, 4), dpi=50)
+        after = peak()
+    return (after - before) / 2 ** 20
+
+
+def bench_export_peak_rss(scale):
+    output = subprocess.run(
+        [sys.executable, '-c',
+         'import suite; print(suite.export_rss_growth())'],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        check=True, capture_output=True, text=True).stdout
+    return float(output.split()[-1])
+
+
+# 計測項目: 名前 -> (計測関数, 単位, 大きいほど良いか)
+BENCHMARKS = {
+    'fk_scalar': (bench_fk_scalar, 'calls/s', True),
+    'fk_batch': (bench_fk_batch, 'poses/s', True),
+    'ik_scalar': (bench_ik_scalar, 'calls/s', True),
+    'ik_batch': (bench_ik_batch, 'targets/s', True),
+    'render_plot_robot': (bench_render_plot_robot, 'ms/frame', False),
+    'render_update': (bench_render_update, 'ms/frame', False),
+    'import_kinematics': (_bench_import('kinematics'), 'ms', False),
+    'import_robot_plot': (_bench_import('robot_plot'), 'ms', False),
+    'export_peak_rss': (bench_export_peak_rss, 'MiB', False),
+}
+
+
+def run(names, scale):
+    """
+    計測を実行
+
+    戻り値:
+        results: {名前: {'value': 値, 'unit': 単位,
+                         'higher_is_better': 大きいほど良いか}}
+    """
+    results = {}
+    for name in names:
+        function, unit, higher_is_better = BENCHMARKS[name]
+        value = float(function(scale))
+        results[name] = {'value': value, 'unit': unit,
+                         'higher_is_better': higher_is_better}
+        print(f'{name:20s} {value:14.3f} {unit}')
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    基準値と比較
+
+    基準値の項目に 'tolerance' があればその値を優先する
+
+    戻り値:
+        regressions: 許容範囲を超えて悪化した項目名のリスト
+    """
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            print(f'{name:20s} (no baseline)')
+            continue
+        limit = reference.get('tolerance', tolerance)
+        # 計測できなかった値(0 以下・非有限)は改善ではなく失敗とする
+        if not np.isfinite(result['value']) or result['value'] <= 0:
+            print(f'{name:20s} {reference["value"]:14.3f} -> '
+                  f'{result["value"]:14.3f} {result["unit"]:10s} '
+                  f'{"":7s} INVALID')
+            regressions.append(name)
+            continue
+        # 悪化の割合(正の値が悪化)
+        if result['higher_is_better']:
+            change = reference['value'] / result['value'] - 1.0
+        else:
+            change = result['value'] / reference['value'] - 1.0
+        failed = change > limit
+        print(f'{name:20s} {reference["value"]:14.3f} -> '
+              f'{result["value"]:14.3f} {result["unit"]:10s} '
+              f'{-change:+7.1%} {"REGRESSION" if failed else "ok"}')
+        if failed:
+            regressions.append(name)
+    return regressions
+
+
+def environment():
+    """計測環境の情報"""
+    return {'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'machine': platform.machine(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S%z')}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--output', '-o',
+                        help='結果の JSON の保存先(省略時は保存しない)')
+    parser.add_argument('--baseline', default=BASELINE_PATH,
+                        help=f'基準値の JSON, デフォルト: {BASELINE_PATH}')
+    parser.add_argument('--tolerance', type=float, default=0.3,
+                        help='許容する悪化の割合, デフォルト: 0.3')
+    parser.add_argument('--update-baseline', action='store_true',
+                        help='結果で基準値を上書きする(比較しない)')
+    parser.add_argument('--only',
+                        help='計測する項目(カンマ区切り), デフォルト: 全て')
+    parser.add_argument('--quick', action='store_true',
+                        help='計測回数を減らす(精度は下がる)')
+    args = parser.parse_args()
+
+    names = list(BENCHMARKS) if args.only is None else \
+        [name.strip() for name in args.only.split(',')]
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f'unknown benchmark: {", ".join(unknown)} '
+                     f'(choose from {", ".join(BENCHMARKS)})')
+
+    results = run(names, 0.2 if args.quick else 1.0)
+    report = {'environment': environment(), 'results': results}
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+
+    if args.update_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding='utf-8') as file:
+                baseline = json.load(file)
+        # 項目ごとの tolerance は残す
+        previous = baseline.get('results', {})
+        for name, result in results.items():
+            if 'tolerance' in previous.get(name, {}):
+                result['tolerance'] = previous[name]['tolerance']
+        baseline['environment'] = report['environment']
+        baseline['results'] = {**previous, **results}
+        with open(args.baseline, 'w', encoding='utf-8') as file:
+            json.dump(baseline, file, indent=2)
+            file.write('\n')
+        print(f'Baseline updated: {args.baseline}')
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f'[ERROR] baseline not found: {args.baseline} '
+              '(create it with --update-baseline)')
+        return 1
+    with open(args.baseline, encoding='utf-8') as file:
+        baseline = json.load(file)
+    print(f'\nbaseline: {baseline.get("environment", {}).get("time", "-")}')
+    regressions = compare(results, baseline['results'], args.tolerance)
+    if regressions:
+        print(f'[ERROR] regressions: {", ".join(regressions)}')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
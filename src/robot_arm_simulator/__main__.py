@@ -15,7 +15,7 @@ import argparse
 import sys
 import time
 import logging
-import robot_arm_simulator.robot_plot as RS
+from robot_arm_simulator.config import RobotConfig
 from robot_arm_simulator.__init__ import __version__
 
 parser = argparse.ArgumentParser(
@@ -26,65 +26,208 @@ parser = argparse.ArgumentParser(
 
 parser.add_argument('--version', action='version',
                     version='%(prog)s : ' + __version__)
-parser.add_argument('-x', type=int, help='X軸座標, デフォルト: 0', default=0)
-parser.add_argument('-y', type=int, help='Y軸座標, デフォルト: 0', default=0)
-parser.add_argument('-z', type=int, help='Z軸座標, デフォルト: 0', default=0)
+parser.add_argument('-x', type=float, help='X軸座標, デフォルト: 0', default=0)
+parser.add_argument('-y', type=float, help='Y軸座標, デフォルト: 0', default=0)
+parser.add_argument('-z', type=float, help='Z軸座標, デフォルト: 0', default=0)
 parser.add_argument('--link_len1', '-l1', type=int,
                     help='リンク1の長さ, デフォルト: 100', default=100)
 parser.add_argument('--link_len2', '-l2', type=int,
                     help='リンク2の長さ, デフォルト: 80', default=80)
 parser.add_argument('--link_len3', '-l3', type=int,
                     help='リンク3の長さ, デフォルト: 20', default=20)
+parser.add_argument('--batch', '-b', metavar='INPUT',
+                    help='目標位置ファイル(CSV/NPY, "-" で標準入力)を'
+                    '画面を開かずに一括計算')
+parser.add_argument('--output', '-o', default='-',
+                    help='一括計算の出力先("-" で標準出力), デフォルト: -')
+parser.add_argument('--format', '-f', choices=('csv', 'npy', 'jsonl'),
+                    help='一括計算の出力形式, デフォルト: 出力先の拡張子(不明なら csv)')
+parser.add_argument('--fk', action='store_true',
+                    help='一括計算で順運動学による手先位置も出力')
+parser.add_argument('--limits', action='store_true',
+                    help='一括計算で角度制限内の解(肘・第1軸の向き)を選択')
+parser.add_argument('--serve', metavar='ADDRESS',
+                    help='制御サーバーを起動(HOST:PORT または Unix ソケットのパス)')
+parser.add_argument('--rate', type=float, default=100.0,
+                    help='制御サーバーの周期の頻度 [Hz], デフォルト: 100')
+parser.add_argument('--no_view', action='store_true',
+                    help='制御サーバーで画面を開かない')
+parser.add_argument('--record', metavar='PATH',
+                    help='インタラクティブ制御の操作をファイルに記録')
+parser.add_argument('--replay', metavar='PATH',
+                    help='記録した操作のファイルを再生')
+parser.add_argument('--interval', type=float, default=50,
+                    help='再生のフレーム間隔 [ms], デフォルト: 50')
+parser.add_argument('--save', metavar='PATH',
+                    help='再生を画面を開かずに保存(.gif / 連番 .png)')
+
+
+def run_batch(args):
+    """
+    一括計算モード(matplotlib を読み込まず、終了時の待ち時間もなし)
+
+    パラメータ:
+        args: コマンドライン引数
+
+    戻り値:
+        result: 終了コード
+    """
+    from robot_arm_simulator import batch
+    batch.run(args.batch, args.output, args.format,
+              args.link_len1, args.link_len2, args.link_len3,
+              forward=args.fk, limits=args.limits)
+    return 0
+
+
+def run_server(args, logger):
+    """
+    制御サーバーモード
+    (画面を開く場合は別スレッドで待ち受け、最新の状態のみを描画する)
+
+    パラメータ:
+        args: コマンドライン引数
+        logger: ロガー
+
+    戻り値:
+        result: 終了コード
+    """
+    import asyncio
+    from robot_arm_simulator.control_server import ControlServer
+    from robot_arm_simulator.kinematics import ThreeAxisKinematics
+
+    host, separator, port = args.serve.rpartition(':')
+    if separator and port.isdigit():
+        address = {'host': host or '127.0.0.1', 'port': int(port)}
+    else:
+        address = {'path': args.serve}
+    robot = ThreeAxisKinematics(
+        args.link_len1, args.link_len2, args.link_len3)
+    server = ControlServer(robot, rate=args.rate)
+
+    if args.no_view:
+        async def serve():
+            logger.info(f"Serving on {await server.start(**address)}")
+            try:
+                await asyncio.Event().wait()
+            finally:
+                await server.close()
+        asyncio.run(serve())
+        return 0
+
+    import robot_arm_simulator.robot_plot as RS
+    logger.info(f"Serving on {server.serve_in_thread(**address)}")
+    try:
+        simulator = RS.RobotSimulator(RS.ThreeAxisRobot(
+            args.link_len1, args.link_len2, args.link_len3))
+        simulator.live_view(
+            lambda: server.latest and server.latest['angles'])
+    finally:
+        server.stop()
+        logger.info(f"{server}")
+    return 0
+
+
+def run_replay(args, logger):
+    """
+    記録した操作の再生モード
+
+    パラメータ:
+        args: コマンドライン引数
+        logger: ロガー
+
+    戻り値:
+        result: 終了コード
+    """
+    from robot_arm_simulator.recorder import load_session
+    import robot_arm_simulator.robot_plot as RS
+
+    trajectory = load_session(args.replay, args.interval)
+    logger.info(f"Replaying {args.replay}: {trajectory}")
+    simulator = RS.RobotSimulator(RS.ThreeAxisRobot(
+        args.link_len1, args.link_len2, args.link_len3))
+    simulator.animate_trajectory(trajectory, interval=args.interval,
+                                 save_path=args.save)
+    return 0
+
+
+def run_interactive(args, logger):
+    """
+    インタラクティブ制御モード
+
+    パラメータ:
+        args: コマンドライン引数
+        logger: ロガー
+    """
+    import robot_arm_simulator.robot_plot as RS
+
+    RobotConfig.TARGET_POINT_X = args.x
+    RobotConfig.TARGET_POINT_Y = args.y
+    RobotConfig.TARGET_POINT_Z = args.z
+    RobotConfig.LINK1_LENGTH = args.link_len1
+    RobotConfig.LINK2_LENGTH = args.link_len2
+    RobotConfig.LINK3_LENGTH = args.link_len3
+    # ロボットアームシミュレータ情報の表示
+    logger.info("# robot_arm_simulator")
+    logger.info("Link Lengths: ( "
+                f"{RobotConfig.LINK1_LENGTH} / "
+                f"{RobotConfig.LINK2_LENGTH} / "
+                f"{RobotConfig.LINK3_LENGTH})")
+    logger.info("Target Point: ( "
+                f"{RobotConfig.TARGET_POINT_X}, "
+                f"{RobotConfig.TARGET_POINT_Y}, "
+                f"{RobotConfig.TARGET_POINT_Z})")
+
+    # ロボットの作成(設定ファイルのパラメータを使用)
+    robot = RS.ThreeAxisRobot(
+        RobotConfig.LINK1_LENGTH,
+        RobotConfig.LINK2_LENGTH,
+        RobotConfig.LINK3_LENGTH)
+
+    # シミュレータの作成
+    simulator = RS.RobotSimulator(robot)
+
+    # 逆運動学による計算
+    inverse_kinematics_result = RS.inverse_kinematics(
+        RobotConfig.TARGET_POINT_X,
+        RobotConfig.TARGET_POINT_Y,
+        RobotConfig.TARGET_POINT_Z,
+        RobotConfig.LINK1_LENGTH,
+        RobotConfig.LINK2_LENGTH + RobotConfig.LINK3_LENGTH
+    )
+    # インタラクティブ制御の開始
+    simulator.interactive_control(inverse_kinematics_result[0],
+                                  inverse_kinematics_result[1],
+                                  inverse_kinematics_result[2],
+                                  0.0, recorder=args.record)
+    if args.record:
+        logger.info(f"Session recorded to: {args.record}")
+
 
 if __name__ == "__main__":
     result = 0
     _detail_formatting = "[%(levelname)s] %(asctime)s\t%(message)s"
     vi = None
+    interactive = True
     try:
         # ロギングの設定
         logging.basicConfig(level=logging.INFO, format=_detail_formatting)
         logger = logging.getLogger(parser.prog)
         # 引数の解析
         args = parser.parse_args()
-        RS.RobotConfig.TARGET_POINT_X = args.x
-        RS.RobotConfig.TARGET_POINT_Y = args.y
-        RS.RobotConfig.TARGET_POINT_Z = args.z
-        RS.RobotConfig.LINK1_LENGTH = args.link_len1
-        RS.RobotConfig.LINK2_LENGTH = args.link_len2
-        RS.RobotConfig.LINK3_LENGTH = args.link_len3
-        # ロボットアームシミュレータ情報の表示
-        logger.info("# robot_arm_simulator")
-        logger.info("Link Lengths: ( "
-                    f"{RS.RobotConfig.LINK1_LENGTH} / "
-                    f"{RS.RobotConfig.LINK2_LENGTH} / "
-                    f"{RS.RobotConfig.LINK3_LENGTH})")
-        logger.info("Target Point: ( "
-                    f"{RS.RobotConfig.TARGET_POINT_X}, "
-                    f"{RS.RobotConfig.TARGET_POINT_Y}, "
-                    f"{RS.RobotConfig.TARGET_POINT_Z})")
-
-        # ロボットの作成(設定ファイルのパラメータを使用)
-        robot = RS.ThreeAxisRobot(
-            RS.RobotConfig.LINK1_LENGTH,
-            RS.RobotConfig.LINK2_LENGTH,
-            RS.RobotConfig.LINK3_LENGTH)
-
-        # シミュレータの作成
-        simulator = RS.RobotSimulator(robot)
-
-        # 逆運動学による計算
-        inverse_kinematics_result = RS.inverse_kinematics(
-            RS.RobotConfig.TARGET_POINT_X,
-            RS.RobotConfig.TARGET_POINT_Y,
-            RS.RobotConfig.TARGET_POINT_Z,
-            RS.RobotConfig.LINK1_LENGTH,
-            RS.RobotConfig.LINK2_LENGTH + RS.RobotConfig.LINK3_LENGTH
-        )
-        # インタラクティブ制御の開始
-        simulator.interactive_control(inverse_kinematics_result[0],
-                                      inverse_kinematics_result[1],
-                                      inverse_kinematics_result[2],
-                                      0.0)
+        if args.batch is not None:
+            # 一括計算モード
+            interactive = False
+            result = run_batch(args)
+        elif args.replay is not None:
+            # 記録した操作の再生モード
+            interactive = False
+            result = run_replay(args, logger)
+        elif args.serve is not None:
+            # 制御サーバーモード
+            interactive = False
+            result = run_server(args, logger)
+        else:
+            run_interactive(args, logger)
     except KeyboardInterrupt:
         logger.error("\nExiting by user request.")
         result = 0
@@ -95,5 +238,6 @@ if __name__ == "__main__":
     finally:
         if vi is not None:
             vi.closing()
-        time.sleep(1)
+        if interactive:
+            time.sleep(1)
         sys.exit(result)
@@ -0,0 +1,205 @@
+"""
+ロボットアーム 一括計算
+目標位置のファイルを読み込み、逆運動学(必要なら順運動学)を一括で計算して
+結果を書き出す。画面を使わないため matplotlib は読み込まない
+"""
+
+import io
+import json
+import math
+import os
+import sys
+
+import numpy as np
+from robot_arm_simulator.kinematics import (
+    IK_STATUS_NAMES, ThreeAxisKinematics, inverse_kinematics_batch)
+
+# 出力形式
+OUTPUT_FORMATS = ('csv', 'npy', 'jsonl')
+
+
+def _load_csv(lines):
+    """
+    x,y,z の CSV の行を読み込む(データ行がない場合は形状 (0, 3))
+
+    空の入力で np.loadtxt が警告を出さないよう、空行・コメント行のみの
+    場合は読み込まずに返す
+    """
+    if not any(line.strip() and not line.lstrip().startswith('#')
+               for line in lines):
+        return np.zeros((0, 3))
+    return np.loadtxt(lines, delimiter=',', ndmin=2)
+
+
+def load_targets(path):
+    """
+    目標位置を読み込む
+
+    パラメータ:
+        path: 入力ファイルのパス ('-' で標準入力)
+              .npy は形状 (N, 3) の配列、それ以外は x,y,z の CSV
+              (CSV の先頭行が数値でない場合はヘッダとして読み飛ばす)
+
+    戻り値:
+        targets: 目標位置 [mm] 形状 (N, 3)
+    """
+    if path == '-':
+        data = sys.stdin.buffer.read()
+    else:
+        with open(path, 'rb') as f:
+            data = f.read()
+
+    if data[:6] == b'\x93NUMPY':
+        targets = np.load(io.BytesIO(data))
+    else:
+        lines = data.decode('utf-8-sig').splitlines()
+        try:
+            targets = _load_csv(lines)
+        except ValueError:
+            targets = _load_csv(lines[1:])
+
+    targets = np.asarray(targets, dtype=float)
+    if targets.size == 0:
+        targets = targets.reshape(0, 3)
+    if targets.ndim != 2 or targets.shape[1] != 3:
+        raise ValueError(
+            f"targets must have shape (N, 3), got {targets.shape}")
+    return targets
+
+
+def solve_targets(targets, link1_length, link2_length, link3_length,
+                  forward=False, limits=False):
+    """
+    目標位置の逆運動学を一括計算
+
+    パラメータ:
+        targets: 目標位置 [mm] 形状 (N, 3)
+        link1_length - link3_length: リンク長 [mm]
+        forward: 求めた角度から順運動学で手先位置も計算するか
+        limits: 角度制限内の解析解の分岐を選ぶか
+                (制限内の分岐がない目標は no_feasible_branch。
+                NaN / inf を含む目標は分岐を選ばず、limits=False と
+                同じ角度・ステータス (nan_clamped など) にする)
+
+    戻り値:
+        angles: 関節角度 (theta1, theta2, theta3) [rad] 形状 (N, 3)
+        status: ステータス (IK_STATUS_*) 形状 (N,)
+        end_positions: 手先位置 [mm] 形状 (N, 3) (forward=False の場合は None)
+    """
+    robot = ThreeAxisKinematics(link1_length, link2_length, link3_length)
+    angles, status = inverse_kinematics_batch(
+        targets, link1_length, link2_length + link3_length)
+    if limits:
+        finite = np.isfinite(targets).all(axis=1)
+        selected, _, selected_status = \
+            robot.inverse_kinematics_select_batch(targets[finite])
+        angles[finite] = selected[:, :3]
+        status[finite] = selected_status
+    end_positions = None
+    if forward:
+        end_positions = robot.forward_kinematics_batch(angles)[:, -1]
+    return angles, status, end_positions
+
+
+def write_results(path, fmt, targets, angles, status, end_positions=None):
+    """
+    計算結果を書き出す
+
+    列は x, y, z, theta1, theta2, theta3, status
+    (順運動学を計算した場合は fk_x, fk_y, fk_z を追加)
+
+    パラメータ:
+        path: 出力ファイルのパス ('-' で標準出力)
+        fmt: 出力形式 ('csv', 'npy', 'jsonl')
+             (jsonl では NaN / inf を null として書き出す)
+        targets: 目標位置 [mm] 形状 (N, 3)
+        angles: 関節角度 [rad] 形状 (N, 3)
+        status: ステータス 形状 (N,)
+        end_positions: 手先位置 [mm] 形状 (N, 3) または None
+    """
+    if fmt not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format: {fmt}")
+
+    names = ['x', 'y', 'z', 'theta1', 'theta2', 'theta3']
+    values = [targets, angles]
+    if end_positions is not None:
+        names += ['fk_x', 'fk_y', 'fk_z']
+        values.append(end_positions)
+    table = np.hstack(values)
+
+    if path == '-':
+        stream = sys.stdout.buffer
+        close = False
+    else:
+        stream = open(path, 'wb')
+        close = True
+    try:
+        if fmt == 'npy':
+            dtype = [(name, 'f8') for name in names] + [('status', 'i1')]
+            records = np.empty(len(table), dtype=dtype)
+            for i, name in enumerate(names):
+                records[name] = table[:, i]
+            records['status'] = status
+            np.save(stream, records)
+        elif fmt == 'csv':
+            text = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+            text.write(','.join(names + ['status']) + '\n')
+            for row, code in zip(table.tolist(), status.tolist()):
+                text.write(','.join(repr(value) for value in row) +
+                           f',{IK_STATUS_NAMES[code]}\n')
+            text.flush()
+            text.detach()
+        else:
+            text = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+            for row, code in zip(table.tolist(), status.tolist()):
+                # NaN / inf は JSON では表せないため null にする
+                record = {name: value if math.isfinite(value) else None
+                          for name, value in zip(names, row)}
+                record['status'] = IK_STATUS_NAMES[code]
+                text.write(json.dumps(record, allow_nan=False) + '\n')
+            text.flush()
+            text.detach()
+    finally:
+        if close:
+            stream.close()
+
+
+def guess_format(path):
+    """
+    出力ファイルの拡張子から出力形式を推定(不明な場合は 'csv')
+
+    パラメータ:
+        path: 出力ファイルのパス
+
+    戻り値:
+        fmt: 出力形式
+    """
+    ext = os.path.splitext(path)[1].lower().lstrip('.')
+    if ext == 'json':
+        return 'jsonl'
+    return ext if ext in OUTPUT_FORMATS else 'csv'
+
+
+def run(input_path, output_path, fmt, link1_length, link2_length,
+        link3_length, forward=False, limits=False):
+    """
+    目標位置ファイルを一括計算して書き出す
+
+    パラメータ:
+        input_path: 入力ファイルのパス ('-' で標準入力)
+        output_path: 出力ファイルのパス ('-' で標準出力)
+        fmt: 出力形式(None の場合は出力ファイルの拡張子から推定)
+        link1_length - link3_length: リンク長 [mm]
+        forward: 順運動学で手先位置も計算するか
+        limits: 角度制限内の解析解の分岐を選ぶか
+
+    戻り値:
+        status: ステータス 形状 (N,)
+    """
+    if fmt is None:
+        fmt = guess_format(output_path)
+    targets = load_targets(input_path)
+    angles, status, end_positions = solve_targets(
+        targets, link1_length, link2_length, link3_length, forward, limits)
+    write_results(output_path, fmt, targets, angles, status, end_positions)
+    return status
@@ -0,0 +1,552 @@
+"""
+ロボットアーム 衝突判定
+各リンクをカプセル(線分 + 半径)で表し、障害物(直方体・球・平面)との衝突と
+リンク同士の衝突(自己衝突)を、関節角度の列 (N, 4) に対して一括で判定する
+"""
+
+import numpy as np
+from robot_arm_simulator.config import RobotConfig
+from robot_arm_simulator.kinematics import ThreeAxisKinematics
+
+# リンクの名前(衝突したペアの表示に使う)
+LINK_NAMES = ('link1', 'link2', 'link3')
+
+# 障害物の種類
+OBSTACLE_KINDS = ('box', 'sphere', 'plane')
+
+# 一度に判定するサンプル数(メモリ使用量の上限)
+_CHECK_CHUNK = 1 << 14
+
+
+class Box:
+    """
+    直方体の障害物(各辺は座標軸に平行)
+
+    パラメータ:
+        center: 中心 [mm] 形状 (3,)
+        size: 各軸方向の辺の長さ [mm] 形状 (3,)
+        name: 名前(省略時は CollisionScene に追加した順に 'box0', ...)
+    """
+
+    kind = 'box'
+
+    def __init__(self, center, size, name=None):
+        """コンストラクタ"""
+        self.center = np.asarray(center, dtype=float)
+        self.size = np.asarray(size, dtype=float)
+        if np.any(self.size < 0):
+            raise ValueError(f"size must be non-negative, got {size}")
+        self.name = name
+
+    def bounds(self):
+        """軸に平行な外接直方体 (lower, upper)"""
+        return self.center - self.size / 2, self.center + self.size / 2
+
+    def __repr__(self):
+        return (f'Box(name={self.name!r}, center={self.center.tolist()}, '
+                f'size={self.size.tolist()})')
+
+
+class Sphere:
+    """
+    球の障害物
+
+    パラメータ:
+        center: 中心 [mm] 形状 (3,)
+        radius: 半径 [mm]
+        name: 名前(省略時は CollisionScene に追加した順に 'sphere0', ...)
+    """
+
+    kind = 'sphere'
+
+    def __init__(self, center, radius, name=None):
+        """コンストラクタ"""
+        self.center = np.asarray(center, dtype=float)
+        self.radius = float(radius)
+        if self.radius < 0:
+            raise ValueError(f"radius must be non-negative, got {radius}")
+        self.name = name
+
+    def bounds(self):
+        """軸に平行な外接直方体 (lower, upper)"""
+        return self.center - self.radius, self.center + self.radius
+
+    def __repr__(self):
+        return (f'Sphere(name={self.name!r}, '
+                f'center={self.center.tolist()}, radius={self.radius})')
+
+
+class Plane:
+    """
+    平面の障害物(normal の向きの側が空間、反対側は全て障害物)
+
+    パラメータ:
+        point: 平面上の点 [mm] 形状 (3,)
+        normal: 法線(空間の側を向く) 形状 (3,)
+        name: 名前(省略時は CollisionScene に追加した順に 'plane0', ...)
+    """
+
+    kind = 'plane'
+
+    def __init__(self, point, normal, name=None):
+        """コンストラクタ"""
+        self.point = np.asarray(point, dtype=float)
+        normal = np.asarray(normal, dtype=float)
+        length = np.linalg.norm(normal)
+        if length == 0:
+            raise ValueError("normal must be non-zero")
+        self.normal = normal / length
+        self.name = name
+
+    def __repr__(self):
+        return (f'Plane(name={self.name!r}, point={self.point.tolist()}, '
+                f'normal={self.normal.tolist()})')
+
+
+class CollisionScene:
+    """
+    障害物の集合
+
+    直方体・球は外接直方体で広域判定(候補の絞り込み)を行うため、
+    障害物が数百個あっても判定時間はほぼ候補の数で決まる
+
+    パラメータ:
+        obstacles: 障害物 (Box, Sphere, Plane) のリスト
+        floor: True の場合は床(z = 0 の平面、z < 0 が障害物)を追加
+    """
+
+    def __init__(self, obstacles=(), floor=True):
+        """コンストラクタ"""
+        self.obstacles = []
+        self._arrays = None
+        if floor:
+            self.add(Plane((0, 0, 0), (0, 0, 1), name='floor'))
+        for obstacle in obstacles:
+            self.add(obstacle)
+
+    def add(self, obstacle):
+        """
+        障害物を追加
+
+        パラメータ:
+            obstacle: Box, Sphere, Plane のいずれか
+
+        戻り値:
+            obstacle: 追加した障害物(名前を省略した場合は付けた名前を設定)
+        """
+        kind = getattr(obstacle, 'kind', None)
+        if kind not in OBSTACLE_KINDS:
+            raise TypeError(f"Unknown obstacle: {obstacle!r}")
+        if obstacle.name is None:
+            count = sum(1 for other in self.obstacles if other.kind == kind)
+            obstacle.name = f'{kind}{count}'
+        self.obstacles.append(obstacle)
+        self._arrays = None
+        return obstacle
+
+    def __len__(self):
+        return len(self.obstacles)
+
+    def __repr__(self):
+        counts = ', '.join(
+            f'{kind}={sum(1 for o in self.obstacles if o.kind == kind)}'
+            for kind in OBSTACLE_KINDS)
+        return f'CollisionScene({counts})'
+
+    def arrays(self):
+        """
+        判定用の配列(障害物を追加するまで使い回す)
+
+        戻り値:
+            arrays: 辞書
+                    'lower', 'upper': 直方体・球の外接直方体 形状 (K, 3)
+                    'bounded': 直方体・球の obstacles での番号 形状 (K,)
+                    'is_sphere': 球か 形状 (K,)
+                    'center', 'radius': 球の中心・半径(直方体は 0)
+                    'plane_point', 'plane_normal': 平面 形状 (P, 3)
+                    'plane': 平面の obstacles での番号 形状 (P,)
+        """
+        if self._arrays is not None:
+            return self._arrays
+        bounded = [i for i, o in enumerate(self.obstacles)
+                   if o.kind != 'plane']
+        planes = [i for i, o in enumerate(self.obstacles)
+                  if o.kind == 'plane']
+        bounds = [self.obstacles[i].bounds() for i in bounded]
+        spheres = [self.obstacles[i] for i in bounded]
+        self._arrays = {
+            'lower': np.array([b[0] for b in bounds]).reshape(-1, 3),
+            'upper': np.array([b[1] for b in bounds]).reshape(-1, 3),
+            'bounded': np.array(bounded, dtype=np.intp),
+            'is_sphere': np.array([o.kind == 'sphere' for o in spheres],
+                                  dtype=bool),
+            'center': np.array([getattr(o, 'center', np.zeros(3))
+                                for o in spheres]).reshape(-1, 3),
+            'radius': np.array([getattr(o, 'radius', 0.0)
+                                for o in spheres]),
+            'plane_point': np.array([self.obstacles[i].point
+                                     for i in planes]).reshape(-1, 3),
+            'plane_normal': np.array([self.obstacles[i].normal
+                                      for i in planes]).reshape(-1, 3),
+            'plane': np.array(planes, dtype=np.intp),
+        }
+        return self._arrays
+
+
+class CollisionResult:
+    """
+    衝突判定の結果
+
+    属性:
+        colliding: 各サンプルが衝突しているか 形状 (N,)
+                   (first_only の場合、最初の衝突を含む判定単位より後は
+                   判定せず False)
+        index: 最初に衝突したサンプル番号(衝突しない場合は -1)
+        pair: index のサンプルで衝突したペア
+              (リンク名, リンク名または障害物名) (衝突しない場合は None)
+    """
+
+    def __init__(self, colliding, index, pair):
+        """コンストラクタ"""
+        self.colliding = colliding
+        self.index = index
+        self.pair = pair
+
+    @property
+    def collided(self):
+        """いずれかのサンプルが衝突しているか"""
+        return self.index >= 0
+
+    def __repr__(self):
+        if not self.collided:
+            return f'CollisionResult(samples={len(self.colliding)}, free)'
+        return (f'CollisionResult(samples={len(self.colliding)}, '
+                f'colliding={int(self.colliding.sum())}, '
+                f'index={self.index}, pair={self.pair})')
+
+
+def segment_distance(start_a, end_a, start_b, end_b):
+    """
+    線分同士の最短距離(バッチ版)
+
+    パラメータ:
+        start_a, end_a: 線分 A の端点 形状 (N, 3)
+        start_b, end_b: 線分 B の端点 形状 (N, 3)
+
+    戻り値:
+        distance: 最短距離 形状 (N,)
+    """
+    direction_a = end_a - start_a
+    direction_b = end_b - start_b
+    offset = start_a - start_b
+    aa = np.einsum('ij,ij->i', direction_a, direction_a)
+    bb = np.einsum('ij,ij->i', direction_b, direction_b)
+    ab = np.einsum('ij,ij->i', direction_a, direction_b)
+    a_offset = np.einsum('ij,ij->i', direction_a, offset)
+    b_offset = np.einsum('ij,ij->i', direction_b, offset)
+    denominator = aa * bb - ab * ab
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # 平行(または長さ 0)の場合は A の始点から求める
+        s = np.where(denominator > 1e-12 * aa * bb,
+                     np.clip((ab * b_offset - a_offset * bb) / denominator,
+                             0.0, 1.0), 0.0)
+        t = np.where(bb > 0, (ab * s + b_offset) / bb, 0.0)
+        # t が範囲外の場合は端に固定して s を求め直す
+        s = np.where(t < 0, np.clip(-a_offset / aa, 0.0, 1.0),
+                     np.where(t > 1, np.clip((ab - a_offset) / aa, 0.0, 1.0),
+                              s))
+        # B の長さが 0 の場合は A 上の B に最も近い点
+        s = np.where(bb > 0, s, np.clip(-a_offset / aa, 0.0, 1.0))
+    s = np.where(aa > 0, s, 0.0)
+    t = np.clip(t, 0.0, 1.0)
+    closest = offset + direction_a * s[:, None] - direction_b * t[:, None]
+    return np.linalg.norm(closest, axis=1)
+
+
+def point_segment_distance(points, start, end):
+    """
+    点と線分の最短距離(バッチ版)
+
+    パラメータ:
+        points: 点 形状 (N, 3)
+        start, end: 線分の端点 形状 (N, 3)
+
+    戻り値:
+        distance: 最短距離 形状 (N,)
+    """
+    direction = end - start
+    length_sq = np.einsum('ij,ij->i', direction, direction)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = np.einsum('ij,ij->i', points - start, direction) / length_sq
+    t = np.where(length_sq > 0, np.clip(t, 0.0, 1.0), 0.0)
+    return np.linalg.norm(start + direction * t[:, None] - points, axis=1)
+
+
+def segment_box_distance(start, end, lower, upper):
+    """
+    線分と軸に平行な直方体の最短距離(バッチ版)
+
+    線分を各座標が直方体の範囲を出入りする点で最大7区間に分けると、
+    区間内では直方体までの距離の2乗が線分上の位置の2次式になるため、
+    区間ごとに最小値を求めてその最小をとる
+
+    パラメータ:
+        start, end: 線分の端点 形状 (N, 3)
+        lower, upper: 直方体の範囲 形状 (N, 3)
+
+    戻り値:
+        distance: 最短距離(交差する場合は 0) 形状 (N,)
+    """
+    direction = end - start
+    with np.errstate(divide='ignore', invalid='ignore'):
+        crossings = (np.concatenate([lower, upper], axis=1) -
+                     np.tile(start, 2)) / np.tile(direction, 2)
+    crossings = np.where(np.isfinite(crossings),
+                         np.clip(crossings, 0.0, 1.0), 0.0)
+    knots = np.sort(np.concatenate(
+        [np.zeros((len(start), 1)), crossings, np.ones((len(start), 1))],
+        axis=1), axis=1)
+    low = knots[:, :-1]
+    high = knots[:, 1:]
+
+    # 区間の中点で、範囲の外にある座標と最も近い面を決める
+    middle = (low + high) / 2
+    points = start[:, None] + middle[:, :, None] * direction[:, None]
+    below = points < lower[:, None]
+    above = points > upper[:, None]
+    bound = np.where(below, lower[:, None], upper[:, None])
+    outside = below | above
+    offset = np.where(outside, start[:, None] - bound, 0.0)
+    slope = np.where(outside, direction[:, None], 0.0)
+
+    # 区間内の |offset + t * slope|^2 を最小にする t
+    curvature = np.einsum('nik,nik->ni', slope, slope)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = -np.einsum('nik,nik->ni', offset, slope) / curvature
+    t = np.clip(np.where(curvature > 0, t, middle), low, high)
+    outside_vector = offset + t[:, :, None] * slope
+    best = np.einsum('nik,nik->ni', outside_vector, outside_vector).min(axis=1)
+    return np.sqrt(best)
+
+
+class CollisionChecker:
+    """
+    関節角度の列に対する衝突判定
+
+    リンク i のカプセルは forward_kinematics の p{i} (リンク1は基点) から
+    次の端点までの線分に半径 radii[i] を付けたもの。
+    隣接するリンクは関節で接しているため、自己衝突は隣接しないリンク同士
+    (リンク1とリンク3)のみ判定する。
+    基点は床に固定されているため、基点を通る平面(既定の床など)との判定
+    ではリンク1の根元を除く(基点を通らない平面は根元も判定する)
+
+    パラメータ:
+        robot: ThreeAxisKinematics インスタンス(省略時は設定ファイルから作成)
+        scene: CollisionScene (省略時は床のみ)
+        radii: リンクの半径 [mm] 形状 (3,)
+               (省略時は RobotConfig.get_link_radii())
+        self_collision: リンク同士の衝突を判定するか
+        block_size: 広域判定で外接直方体をまとめる連続したサンプル数
+    """
+
+    def __init__(self, robot=None, scene=None, radii=None,
+                 self_collision=True, block_size=64):
+        """コンストラクタ"""
+        if robot is None:
+            robot = ThreeAxisKinematics()
+        if scene is None:
+            scene = CollisionScene()
+        if radii is None:
+            radii = RobotConfig.get_link_radii()
+        if block_size < 1:
+            raise ValueError(f"block_size must be positive, got {block_size}")
+        self.robot = robot
+        self.scene = scene
+        self.radii = np.asarray(radii, dtype=float)
+        self.link_names = LINK_NAMES
+        if self.radii.shape != (len(self.link_names),):
+            raise ValueError(
+                f"radii must have shape ({len(self.link_names)},), "
+                f"got {self.radii.shape}")
+        count = len(self.link_names)
+        self.self_pairs = [(i, j) for i in range(count)
+                           for j in range(i + 2, count)] \
+            if self_collision else []
+        self.block_size = int(block_size)
+
+    def link_segments(self, thetas):
+        """
+        各リンクのカプセルの線分
+
+        パラメータ:
+            thetas: 関節角度 [rad] 形状 (N, 4) または (N, 3)
+
+        戻り値:
+            segments: 形状 (N, 3, 2, 3)
+                      segments[:, i, 0] がリンク i の根元、[:, i, 1] が先端
+        """
+        positions = self.robot.forward_kinematics_batch(thetas)
+        return np.stack([positions[:, [0, 2, 3]], positions[:, [2, 3, 4]]],
+                        axis=2)
+
+    def check_pose(self, theta1, theta2, theta3, theta4=0):
+        """
+        1つの姿勢の衝突判定
+
+        パラメータ:
+            theta1, theta2, theta3, theta4: 関節角度 [rad]
+
+        戻り値:
+            CollisionResult (サンプル数 1)
+        """
+        return self.check([[theta1, theta2, theta3, theta4]])
+
+    def check(self, thetas, first_only=False):
+        """
+        関節角度の列(軌道)の衝突判定
+
+        パラメータ:
+            thetas: 関節角度 [rad] 形状 (N, 4) または (N, 3)
+                    (Trajectory も可)
+            first_only: True の場合は最初の衝突が見つかった時点で打ち切る
+                        (経路計画での辺の判定など)
+
+        戻り値:
+            CollisionResult
+        """
+        thetas = np.asarray(getattr(thetas, 'angles', thetas), dtype=float)
+        if thetas.ndim == 1:
+            thetas = thetas[None, :]
+        colliding = np.zeros(len(thetas), dtype=bool)
+        index, pair = -1, None
+        for start in range(0, len(thetas), _CHECK_CHUNK):
+            segments = self.link_segments(thetas[start:start + _CHECK_CHUNK])
+            samples, links, others = self.check_segments(segments)
+            if len(samples) == 0:
+                continue
+            colliding[start + samples] = True
+            if index < 0:
+                index = start + int(samples[0])
+                pair = self._pair_names(links[0], others[0])
+                if first_only:
+                    break
+        return CollisionResult(colliding, index, pair)
+
+    def _pair_names(self, link, other):
+        """衝突したペアの名前(other が負の場合はリンク -other - 1)"""
+        if other < 0:
+            return (self.link_names[-other - 1], self.link_names[link])
+        return (self.link_names[link], self.scene.obstacles[other].name)
+
+    def check_segments(self, segments):
+        """
+        カプセルの線分に対する衝突判定
+
+        パラメータ:
+            segments: 形状 (N, L, 2, 3) (link_segments を参照)
+
+        戻り値:
+            samples: 衝突したサンプル番号 形状 (M,)
+            links: 衝突したリンク番号 形状 (M,)
+            others: 相手の障害物の番号 (scene.obstacles の番号)、
+                    リンク同士の場合は -(相手のリンク番号) - 1 形状 (M,)
+            (同じサンプルでは自己衝突・平面・直方体と球の順)
+        """
+        arrays = self.scene.arrays()
+        radii = self.radii
+        start = segments[:, :, 0]
+        end = segments[:, :, 1]
+        found = []
+
+        # 自己衝突(隣接しないリンク同士)
+        for i, j in self.self_pairs:
+            distance = segment_distance(start[:, i], end[:, i],
+                                        start[:, j], end[:, j])
+            hit = np.flatnonzero(distance < radii[i] + radii[j])
+            found.append((hit, np.full(len(hit), j),
+                          np.full(len(hit), -i - 1)))
+
+        # 平面: 線分の端点の符号付き距離の小さい方が半径未満なら衝突
+        if len(arrays['plane']):
+            signed = np.einsum('nlek,pk->nlep', segments,
+                               arrays['plane_normal']) - \
+                np.einsum('pk,pk->p', arrays['plane_point'],
+                          arrays['plane_normal'])
+            # 基点を通る平面(既定の床など)は基点を取り付けた面とみなし、
+            # その平面に限ってリンク1の根元を除く
+            base = signed[:, 0, 0]
+            base[np.abs(base) <= 1e-9] = np.inf
+            hit = signed.min(axis=2) < radii[None, :, None]
+            samples, links, planes = np.nonzero(hit)
+            found.append((samples, links, arrays['plane'][planes]))
+
+        if len(arrays['bounded']):
+            found.append(self._check_bounded(start, end, arrays))
+
+        samples = np.concatenate([f[0] for f in found]) if found else \
+            np.zeros(0, dtype=np.intp)
+        if len(samples) == 0:
+            empty = np.zeros(0, dtype=np.intp)
+            return empty, empty, empty
+        links = np.concatenate([f[1] for f in found])
+        others = np.concatenate([f[2] for f in found])
+        order = np.argsort(samples, kind='stable')
+        return samples[order], links[order], others[order]
+
+    def _check_bounded(self, start, end, arrays):
+        """直方体・球との判定(連続したサンプルの外接直方体で絞り込む)"""
+        count, link_count = start.shape[:2]
+        radii = self.radii[None, :, None]
+        lower = np.minimum(start, end) - radii
+        upper = np.maximum(start, end) + radii
+
+        # 広域判定: block_size 個の連続したサンプルをまとめた外接直方体と
+        # 障害物の外接直方体が重なる組み合わせのみ残す
+        block = self.block_size
+        first = np.arange(0, count, block)
+        block_lower = np.minimum.reduceat(lower, first, axis=0)
+        block_upper = np.maximum.reduceat(upper, first, axis=0)
+        overlap = \
+            np.all(block_lower[:, :, None] <= arrays['upper'], axis=3) & \
+            np.all(block_upper[:, :, None] >= arrays['lower'], axis=3)
+        block_index, links, obstacles = np.nonzero(overlap)
+
+        # ブロック内の各サンプルに展開し、サンプルの外接直方体で絞り込む
+        samples = (block_index[:, None] * block + np.arange(block)).ravel()
+        links = np.repeat(links, block)
+        obstacles = np.repeat(obstacles, block)
+        keep = samples < count
+        samples, links, obstacles = samples[keep], links[keep], obstacles[keep]
+        keep = np.all(lower[samples, links] <= arrays['upper'][obstacles],
+                      axis=1) & \
+            np.all(upper[samples, links] >= arrays['lower'][obstacles],
+                   axis=1)
+        samples, links, obstacles = samples[keep], links[keep], obstacles[keep]
+
+        # 詳細判定
+        is_sphere = arrays['is_sphere'][obstacles]
+        hit = np.zeros(len(samples), dtype=bool)
+        sphere = np.flatnonzero(is_sphere)
+        if len(sphere):
+            s, li, o = samples[sphere], links[sphere], obstacles[sphere]
+            distance = point_segment_distance(
+                arrays['center'][o], start[s, li], end[s, li])
+            hit[sphere] = distance < self.radii[li] + arrays['radius'][o]
+        box = np.flatnonzero(~is_sphere)
+        if len(box):
+            s, li, o = samples[box], links[box], obstacles[box]
+            lower, upper = arrays['lower'][o], arrays['upper'][o]
+            # 端点が直方体に近い場合は探索せずに衝突とする
+            near = np.zeros(len(box), dtype=bool)
+            for point in (start[s, li], end[s, li]):
+                outside = point - np.clip(point, lower, upper)
+                near |= np.einsum('ij,ij->i', outside, outside) < \
+                    self.radii[li] ** 2
+            rest = np.flatnonzero(~near)
+            distance = segment_box_distance(
+                start[s[rest], li[rest]], end[s[rest], li[rest]],
+                lower[rest], upper[rest])
+            near[rest] = distance < self.radii[li[rest]]
+            hit[box] = near
+        return samples[hit], links[hit], arrays['bounded'][obstacles[hit]]
@@ -18,6 +18,11 @@ class RobotConfig:
     LINK2_LENGTH = 80
     LINK3_LENGTH = 20
 
+    # リンクの太さ(衝突判定でリンクを表すカプセルの半径) [mm]
+    LINK1_RADIUS = 10
+    LINK2_RADIUS = 8
+    LINK3_RADIUS = 5
+
     # 第1軸(根元回転: Z軸周り)の角度制限 [度]
     THETA1_MIN_DEG = -180
     THETA1_MAX_DEG = 180
@@ -34,6 +39,18 @@ class RobotConfig:
     THETA4_MIN_DEG = -90
     THETA4_MAX_DEG = 90
 
+    # 各軸の最大角速度 [度/s]
+    THETA1_MAX_VELOCITY_DEG = 180
+    THETA2_MAX_VELOCITY_DEG = 120
+    THETA3_MAX_VELOCITY_DEG = 150
+    THETA4_MAX_VELOCITY_DEG = 240
+
+    # 各軸の最大角加速度 [度/s^2]
+    THETA1_MAX_ACCELERATION_DEG = 720
+    THETA2_MAX_ACCELERATION_DEG = 480
+    THETA3_MAX_ACCELERATION_DEG = 600
+    THETA4_MAX_ACCELERATION_DEG = 960
+
     # アームの色設定 (RGB or 色名)
     LINK1_COLOR = 'blue'        # 第1リンクの色
     LINK2_COLOR = 'green'       # 第2リンクの色
@@ -41,6 +58,12 @@ class RobotConfig:
     BASE_COLOR = 'red'          # 基点の色
     END_EFFECTOR_COLOR = 'purple'  # 手先の色
 
+    # 日本語フォントの設定(描画機能を初めて使うときに適用)
+    # FONT_FAMILY = 'MS Gothic'  # Windowsの場合
+    # FONT_FAMILY = 'Yu Gothic'  # 游ゴシック
+    FONT_FAMILY = 'Meiryo'     # メイリオ
+    # FONT_FAMILY = 'DejaVu Sans'  # 他のOSの場合
+
     @classmethod
     def get_theta1_range_rad(cls):
         """第1軸の角度範囲をラジアンで取得"""
@@ -61,11 +84,32 @@ class RobotConfig:
         """第4軸の角度範囲をラジアンで取得"""
         return np.radians(cls.THETA4_MIN_DEG), np.radians(cls.THETA4_MAX_DEG)
 
+    @classmethod
+    def get_max_velocity_rad(cls):
+        """各軸の最大角速度 [rad/s] を配列 (theta1, ..., theta4) で取得"""
+        return np.radians([cls.THETA1_MAX_VELOCITY_DEG,
+                           cls.THETA2_MAX_VELOCITY_DEG,
+                           cls.THETA3_MAX_VELOCITY_DEG,
+                           cls.THETA4_MAX_VELOCITY_DEG])
+
+    @classmethod
+    def get_max_acceleration_rad(cls):
+        """各軸の最大角加速度 [rad/s^2] を配列 (theta1, ..., theta4) で取得"""
+        return np.radians([cls.THETA1_MAX_ACCELERATION_DEG,
+                           cls.THETA2_MAX_ACCELERATION_DEG,
+                           cls.THETA3_MAX_ACCELERATION_DEG,
+                           cls.THETA4_MAX_ACCELERATION_DEG])
+
     @classmethod
     def get_link_lengths(cls):
         """リンク長のタプルを取得"""
         return (cls.LINK1_LENGTH, cls.LINK2_LENGTH, cls.LINK3_LENGTH)
 
+    @classmethod
+    def get_link_radii(cls):
+        """リンクの太さ(カプセルの半径)のタプルを取得"""
+        return (cls.LINK1_RADIUS, cls.LINK2_RADIUS, cls.LINK3_RADIUS)
+
     @classmethod
     def get_max_reach(cls):
         """最大到達距離を計算"""
@@ -0,0 +1,513 @@
+"""
+ロボットアーム 制御サーバー
+TCP または Unix ソケットで JSON Lines (1行1メッセージ) の目標を受け付け、
+一定の周期でアームを目標へ動かして状態を購読中のクライアントへ配信する
+(asyncio のみを使用し、matplotlib には依存しない)
+
+クライアントからのメッセージ:
+    {"type": "joints", "angles": [theta1, ..., theta4]}  関節の目標 [rad]
+    {"type": "position", "position": [x, y, z]}          手先の目標 [mm]
+    {"type": "subscribe"} / {"type": "unsubscribe"}      状態の配信の開始・停止
+    {"type": "metrics"}                                  計測値の問い合わせ
+    目標には任意の "id" を付けられる(エラーの応答に含める)
+
+サーバーからのメッセージ:
+    {"type": "state", "tick": ..., "angles": [...], "target": [...],
+     "end_effector": [x, y, z], "settled": ..., "applied_id": ...}
+    (applied_id は最後に反映した目標の "id")
+    {"type": "metrics", ...} / {"type": "error", "message": ..., "id": ...}
+"""
+
+import asyncio
+import collections
+import json
+import os
+import threading
+import time
+
+import numpy as np
+from robot_arm_simulator.fleet import Fleet
+from robot_arm_simulator.kinematics import (
+    IK_STATUS_NAMES, IK_STATUS_OK, ThreeAxisKinematics)
+
+# 受信する1行の最大長 [byte]
+MAX_LINE_LENGTH = 1 << 16
+
+
+def _encode(message):
+    """メッセージを JSON Lines の1行に変換"""
+    return json.dumps(message, separators=(',', ':')).encode() + b'\n'
+
+
+class LatencyStats:
+    """
+    遅延の統計(直近 size 件の分位点)
+
+    パラメータ:
+        size: 保持する件数
+    """
+
+    def __init__(self, size=10000):
+        """コンストラクタ"""
+        self._samples = collections.deque(maxlen=size)
+        self.count = 0
+
+    def add(self, seconds):
+        """遅延 [s] を追加"""
+        self._samples.append(seconds)
+        self.count += 1
+
+    def summary(self):
+        """
+        統計の辞書
+
+        戻り値:
+            {'count': 件数, 'p50_ms', 'p99_ms', 'max_ms': 直近の分位点 [ms]}
+        """
+        if not self._samples:
+            return {'count': self.count, 'p50_ms': None, 'p99_ms': None,
+                    'max_ms': None}
+        samples = np.fromiter(self._samples, dtype=float) * 1e3
+        p50, p99 = np.percentile(samples, [50, 99])
+        return {'count': self.count, 'p50_ms': float(p50),
+                'p99_ms': float(p99), 'max_ms': float(samples.max())}
+
+    def __repr__(self):
+        summary = self.summary()
+        if summary['p50_ms'] is None:
+            return f'LatencyStats(count={self.count})'
+        return (f'LatencyStats(count={self.count}, '
+                f'p50={summary["p50_ms"]:.3f} ms, '
+                f'p99={summary["p99_ms"]:.3f} ms)')
+
+
+class _Client:
+    """
+    接続中のクライアント
+
+    inbox: 受信した目標のキュー(満杯のときは受信を止め、
+           TCP のフロー制御で送信側を待たせる)
+    outbox: 送信するメッセージのキュー(状態は満杯のとき古いものを捨てる)
+    """
+
+    def __init__(self, reader, writer, inbox_size, outbox_size):
+        """コンストラクタ"""
+        self.reader = reader
+        self.writer = writer
+        self.name = str(writer.get_extra_info('peername') or 'local')
+        self.inbox = asyncio.Queue(inbox_size)
+        self.outbox = asyncio.Queue(outbox_size)
+        self.subscribed = False
+        self.received = 0
+        self.dropped = 0
+        self.errors = 0
+
+    def send(self, message):
+        """
+        メッセージを送信キューへ追加
+
+        満杯の場合は最も古いメッセージを捨てて追加する
+        (遅いクライアントがサーバーの周期を遅らせないようにする)
+        """
+        if self.outbox.full():
+            self.outbox.get_nowait()
+            self.dropped += 1
+        self.outbox.put_nowait(message)
+
+    def metrics(self):
+        """クライアントごとの計測値"""
+        return {'name': self.name, 'received': self.received,
+                'dropped': self.dropped, 'errors': self.errors,
+                'inbox': self.inbox.qsize(), 'outbox': self.outbox.qsize(),
+                'subscribed': self.subscribed}
+
+
+class ControlServer:
+    """
+    目標を受け付けてアームを一定周期で動かす制御サーバー
+
+    関節の目標は角度制限でクリップし、手先の目標は現在の目標の姿勢に
+    最も近い角度制限内の逆運動学の解へ変換する。アームは Fleet.step で
+    最大角速度・最大角加速度を守って目標へ動く。
+    周期に間に合わなかった場合は遅れを取り戻そうとせず、次の周期から
+    再開する(遅れた周期の数は metrics の overruns)
+
+    パラメータ:
+        robot: ThreeAxisKinematics インスタンス
+               (リンク長・角度制限を使用、省略時は設定ファイルから取得)
+        rate: 周期の頻度 [Hz]
+        inbox_size: クライアントごとの受信キューの長さ
+        outbox_size: クライアントごとの送信キューの長さ
+
+    属性:
+        latest: 最新の状態のメッセージ(描画用、別スレッドから読んでよい)
+    """
+
+    def __init__(self, robot=None, rate=100.0, inbox_size=64, outbox_size=8):
+        """コンストラクタ"""
+        if rate <= 0:
+            raise ValueError(f"rate must be positive, got {rate}")
+        self.robot = ThreeAxisKinematics() if robot is None else robot
+        self.fleet = Fleet.from_robots([self.robot])
+        self.rate = rate
+        self.inbox_size = inbox_size
+        self.outbox_size = outbox_size
+        self.tick = 0
+        self.overruns = 0
+        self.latest = None
+        self.applied_id = None
+        self.target_latency = LatencyStats()
+        self.tick_duration = LatencyStats()
+        self._clients = set()
+        self._handlers = set()
+        self._server = None
+        self._ticker = None
+        self._path = None
+        # serve_in_thread で使用
+        self._thread = None
+        self._loop = None
+        self._stopped = None
+
+    async def start(self, host='127.0.0.1', port=0, path=None):
+        """
+        待ち受けと周期処理を開始
+
+        パラメータ:
+            host, port: TCP の待ち受けアドレス (port=0 で空いている番号)
+            path: Unix ソケットのパス(指定時は TCP の代わりに使用)
+
+        戻り値:
+            address: 待ち受けアドレス ((host, port) または path)
+        """
+        if path is not None:
+            self._server = await asyncio.start_unix_server(
+                self._handle_client, path, limit=MAX_LINE_LENGTH)
+            address = self._path = path
+        else:
+            self._server = await asyncio.start_server(
+                self._handle_client, host, port, limit=MAX_LINE_LENGTH)
+            address = self._server.sockets[0].getsockname()[:2]
+        self._ticker = asyncio.create_task(self._run())
+        return address
+
+    async def close(self):
+        """待ち受けと周期処理を停止し、全クライアントを切断"""
+        if self._ticker is not None:
+            self._ticker.cancel()
+            try:
+                await self._ticker
+            except asyncio.CancelledError:
+                pass
+            self._ticker = None
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        for client in list(self._clients):
+            client.writer.close()
+        # 受信処理の終了を待つ(未完了のままイベントループが終わらないよう)
+        if self._handlers:
+            await asyncio.wait(self._handlers)
+        if self._path is not None:
+            try:
+                os.unlink(self._path)
+            except FileNotFoundError:
+                pass
+            self._path = None
+
+    def serve_in_thread(self, host='127.0.0.1', port=0, path=None):
+        """
+        別スレッドのイベントループで待ち受けを開始
+        (メインスレッドで描画する場合に使用、stop で停止)
+
+        パラメータ:
+            start と同じ
+
+        戻り値:
+            address: 待ち受けアドレス
+        """
+        started = threading.Event()
+        result = {}
+
+        async def serve():
+            self._stopped = asyncio.Event()
+            self._loop = asyncio.get_running_loop()
+            try:
+                result['address'] = await self.start(host, port, path)
+            except OSError as e:
+                result['error'] = e
+                return
+            finally:
+                started.set()
+            await self._stopped.wait()
+            await self.close()
+
+        self._thread = threading.Thread(
+            target=asyncio.run, args=(serve(),), daemon=True)
+        self._thread.start()
+        started.wait()
+        if 'error' in result:
+            raise result['error']
+        return result['address']
+
+    def stop(self):
+        """serve_in_thread で開始した待ち受けを停止"""
+        if self._thread is None:
+            return
+        self._loop.call_soon_threadsafe(self._stopped.set)
+        self._thread.join()
+        self._thread = None
+
+    async def _handle_client(self, reader, writer):
+        """クライアントごとの受信処理"""
+        client = _Client(reader, writer, self.inbox_size, self.outbox_size)
+        handler = asyncio.current_task()
+        self._clients.add(client)
+        self._handlers.add(handler)
+        sender = asyncio.create_task(self._send_loop(client))
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ValueError, asyncio.LimitOverrunError):
+                    self._error(client, 'line too long')
+                    break
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                    if not isinstance(message, dict):
+                        raise ValueError('message must be an object')
+                except ValueError as e:
+                    self._error(client, f'invalid message: {e}')
+                    continue
+                await self._receive(client, message)
+        except ConnectionError:
+            pass
+        finally:
+            self._clients.discard(client)
+            self._handlers.discard(handler)
+            sender.cancel()
+            writer.close()
+
+    async def _receive(self, client, message):
+        """受信したメッセージの処理"""
+        kind = message.get('type')
+        client.received += 1
+        if kind in ('joints', 'position'):
+            # 満杯の場合はここで待つ(このクライアントの受信が止まる)
+            await client.inbox.put((time.perf_counter(), message))
+        elif kind == 'subscribe':
+            client.subscribed = True
+        elif kind == 'unsubscribe':
+            client.subscribed = False
+        elif kind == 'metrics':
+            client.send(self.metrics())
+        else:
+            self._error(client, f'unknown message type: {kind!r}',
+                        message.get('id'))
+
+    @staticmethod
+    async def _send_loop(client):
+        """クライアントごとの送信処理(遅いクライアントは待つのみ)"""
+        try:
+            while True:
+                message = await client.outbox.get()
+                client.writer.write(_encode(message))
+                await client.writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+
+    @staticmethod
+    def _error(client, text, message_id=None):
+        """エラーを送信"""
+        client.errors += 1
+        client.send({'type': 'error', 'message': text, 'id': message_id})
+
+    async def _run(self):
+        """一定周期の処理(遅れた周期は飛ばす)"""
+        loop = asyncio.get_running_loop()
+        period = 1.0 / self.rate
+        next_time = loop.time()
+        while True:
+            start = time.perf_counter()
+            self._tick(period)
+            self.tick_duration.add(time.perf_counter() - start)
+            next_time += period
+            delay = next_time - loop.time()
+            if delay < 0:
+                missed = int(-delay // period) + 1
+                self.overruns += missed
+                next_time += missed * period
+                delay = next_time - loop.time()
+            await asyncio.sleep(delay)
+
+    def _tick(self, dt):
+        """受信した目標を反映し、アームを dt だけ動かして状態を配信"""
+        now = time.perf_counter()
+        for client in self._clients:
+            while not client.inbox.empty():
+                received, message = client.inbox.get_nowait()
+                self._apply(client, message)
+                self.target_latency.add(now - received)
+
+        fleet = self.fleet
+        fleet.step(dt)
+        self.tick += 1
+        state = {'type': 'state', 'tick': self.tick,
+                 'angles': fleet.angles[:, 0].tolist(),
+                 'target': fleet.targets[:, 0].tolist(),
+                 'end_effector': fleet.end_effector()[:, 0].tolist(),
+                 'settled': bool(fleet.settled()[0]),
+                 'applied_id': self.applied_id}
+        self.latest = state
+        for client in self._clients:
+            if client.subscribed:
+                client.send(state)
+
+    def _apply(self, client, message):
+        """目標のメッセージを Fleet の目標に反映"""
+        message_id = message.get('id')
+        key = 'angles' if message['type'] == 'joints' else 'position'
+        try:
+            values = np.asarray(message.get(key), dtype=float)
+        except (TypeError, ValueError):
+            values = np.empty(0)
+        size = 4 if key == 'angles' else 3
+        if values.shape != (size,) or not np.all(np.isfinite(values)):
+            self._error(client, f'{key} must be {size} finite numbers',
+                        message_id)
+            return
+        if key == 'position':
+            angles, status = self.fleet.inverse_kinematics(
+                values[:, None], current=self.fleet.targets)
+            if status[0] != IK_STATUS_OK:
+                self._error(client, IK_STATUS_NAMES[int(status[0])],
+                            message_id)
+                return
+            values = angles[:, 0]
+        self.fleet.set_targets(values)
+        self.applied_id = message_id
+
+    def metrics(self):
+        """
+        計測値の辞書
+
+        戻り値:
+            tick: 周期の回数、overruns: 遅れて飛ばした周期の数、
+            target_latency: 受信から反映までの遅延、
+            tick_duration: 1周期の処理時間、clients: クライアントごとの計測値
+        """
+        return {'type': 'metrics', 'tick': self.tick,
+                'overruns': self.overruns,
+                'target_latency': self.target_latency.summary(),
+                'tick_duration': self.tick_duration.summary(),
+                'clients': [client.metrics() for client in self._clients]}
+
+    def __repr__(self):
+        return (f'ControlServer(rate={self.rate:g} Hz, tick={self.tick}, '
+                f'clients={len(self._clients)}, overruns={self.overruns})')
+
+
+class ControlClient:
+    """
+    制御サーバーのクライアント(動作確認・テスト用)
+
+    状態のメッセージは states キュー(満杯のときは古いものを捨てる)へ、
+    それ以外の応答は replies キューへ振り分ける
+
+    パラメータ:
+        state_queue_size: 受信した状態を保持する数
+    """
+
+    def __init__(self, state_queue_size=256):
+        """コンストラクタ"""
+        self.states = asyncio.Queue(state_queue_size)
+        self.replies = asyncio.Queue()
+        self._reader = None
+        self._writer = None
+        self._receiver = None
+
+    async def connect(self, address):
+        """
+        サーバーへ接続
+
+        パラメータ:
+            address: (host, port) または Unix ソケットのパス
+        """
+        if isinstance(address, str):
+            self._reader, self._writer = await asyncio.open_unix_connection(
+                address, limit=MAX_LINE_LENGTH)
+        else:
+            self._reader, self._writer = await asyncio.open_connection(
+                *address, limit=MAX_LINE_LENGTH)
+        self._receiver = asyncio.create_task(self._receive_loop())
+        return self
+
+    async def _receive_loop(self):
+        """受信したメッセージの振り分け"""
+        while True:
+            line = await self._reader.readline()
+            if not line:
+                break
+            message = json.loads(line)
+            if message.get('type') == 'state':
+                if self.states.full():
+                    self.states.get_nowait()
+                self.states.put_nowait(message)
+            else:
+                self.replies.put_nowait(message)
+
+    async def send(self, message):
+        """メッセージを送信(サーバーの受信が止まっている間は待つ)"""
+        self._writer.write(_encode(message))
+        await self._writer.drain()
+
+    async def send_joints(self, angles, message_id=None):
+        """関節の目標 [rad] を送信"""
+        await self.send({'type': 'joints', 'angles': list(map(float, angles)),
+                         'id': message_id})
+
+    async def send_position(self, position, message_id=None):
+        """手先の目標 [mm] を送信"""
+        await self.send({'type': 'position',
+                         'position': list(map(float, position)),
+                         'id': message_id})
+
+    async def subscribe(self):
+        """状態の配信を開始"""
+        await self.send({'type': 'subscribe'})
+
+    async def metrics(self):
+        """サーバーの計測値を取得"""
+        await self.send({'type': 'metrics'})
+        while True:
+            reply = await self.replies.get()
+            if reply.get('type') == 'metrics':
+                return reply
+
+    async def wait_settled(self, message_id, timeout=10.0):
+        """
+        id が message_id の目標が反映され、アームが到達するまで待つ
+        (subscribe が必要)
+
+        戻り値:
+            到達した時点の状態のメッセージ
+        """
+        async def wait():
+            while True:
+                state = await self.states.get()
+                if state['applied_id'] == message_id and state['settled']:
+                    return state
+        return await asyncio.wait_for(wait(), timeout)
+
+    async def close(self):
+        """切断"""
+        if self._receiver is not None:
+            self._receiver.cancel()
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except ConnectionError:
+                pass
@@ -0,0 +1,402 @@
+"""
+ロボットアーム 軌道の書き出し
+画面を開かずに(Agg バックエンド)1フレームずつ描画し、
+ファイルへ逐次書き出す
+"""
+
+import collections
+import os
+import queue
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+from robot_arm_simulator.config import RobotConfig
+from robot_arm_simulator.trajectory_file import open_trajectory
+
+# ワーカープロセスごとの描画状態(Figure と描画要素を使い回す)
+_worker_state = {}
+
+
+class ExportStats:
+    """
+    書き出し結果の統計
+
+    属性:
+        frames: 書き出したフレーム数
+        elapsed: 描画と書き出しに要した時間 [s]
+        frames_per_second: 1秒あたりの書き出しフレーム数
+        peak_python_heap: 書き出し中の Python のヒープのピーク [byte]
+                          (measure_memory=True の場合のみ、それ以外は None。
+                          tracemalloc による値で、Agg の描画バッファなど
+                          C/C++ で確保したメモリと描画プロセスの分は含まない)
+    """
+
+    def __init__(self, frames, elapsed, peak_python_heap=None):
+        """コンストラクタ"""
+        self.frames = frames
+        self.elapsed = elapsed
+        self.frames_per_second = frames / elapsed if elapsed > 0 else 0.0
+        self.peak_python_heap = peak_python_heap
+
+    def __repr__(self):
+        peak = ('-' if self.peak_python_heap is None
+                else f'{self.peak_python_heap / (1024 * 1024):.1f} MiB')
+        return (f'ExportStats(frames={self.frames}, '
+                f'elapsed={self.elapsed:.3f} s, '
+                f'fps={self.frames_per_second:.1f}, '
+                f'peak_python_heap={peak})')
+
+
+class GifWriter:
+    """
+    GIF の逐次書き出し
+
+    Pillow の PillowWriter は全フレームをメモリに保持してから保存するため、
+    フレームごとに減色してそのままファイルへ書き込む
+
+    パラメータ:
+        path: 保存先パス
+        fps: フレームレート
+        loop: ループ回数(0 で無限ループ)
+    """
+
+    def __init__(self, path, fps, loop=0):
+        """コンストラクタ"""
+        self.path = path
+        self.duration = 1000.0 / fps
+        self.loop = loop
+        self._file = None
+
+    def write(self, frame):
+        """
+        1フレームを書き込む
+
+        パラメータ:
+            frame: RGBA 画像 形状 (高さ, 幅, 4) の uint8 配列
+        """
+        from PIL import Image, GifImagePlugin
+
+        image = Image.fromarray(frame[:, :, :3]).quantize(
+            colors=256, method=Image.Quantize.FASTOCTREE)
+        if self._file is None:
+            self._file = open(self.path, 'wb')
+            header, _ = GifImagePlugin.getheader(
+                image, info={'loop': self.loop, 'duration': self.duration})
+            for block in header:
+                self._file.write(block)
+        # フレームごとに減色しているため、ローカルカラーテーブルを付ける
+        for block in GifImagePlugin.getdata(image, duration=self.duration,
+                                            include_color_table=True):
+            self._file.write(block)
+
+    def close(self):
+        """終端を書き込んでファイルを閉じる"""
+        if self._file is not None:
+            self._file.write(b';')
+            self._file.close()
+            self._file = None
+
+
+class PngSequenceWriter:
+    """
+    連番 PNG の書き出し
+
+    パラメータ:
+        path: 保存先パス
+              'frames/frame_{:05d}.png' のように書式を含む場合はその書式、
+              'frames/frame.png' の場合は 'frames/frame_00000.png' の形式で保存
+    """
+
+    def __init__(self, path):
+        """コンストラクタ"""
+        if '{' not in path:
+            root, ext = os.path.splitext(path)
+            path = root + '_{:05d}' + ext
+        self.pattern = path
+        self.count = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def write(self, frame):
+        """
+        1フレームを書き込む
+
+        パラメータ:
+            frame: RGBA 画像 形状 (高さ, 幅, 4) の uint8 配列
+        """
+        from PIL import Image
+
+        Image.fromarray(frame).save(self.pattern.format(self.count))
+        self.count += 1
+
+    def close(self):
+        """何もしない(フレームごとに保存済み)"""
+
+
+# 書き出しに対応する拡張子
+SUPPORTED_FORMATS = ('.gif', '.png')
+
+
+def create_writer(path, fps):
+    """
+    保存先パスの拡張子に応じた書き出しクラスを作成
+
+    パラメータ:
+        path: 保存先パス (.gif または .png)
+        fps: フレームレート
+
+    戻り値:
+        writer: GifWriter または PngSequenceWriter
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.gif':
+        return GifWriter(path, fps)
+    if ext == '.png':
+        return PngSequenceWriter(path)
+    raise ValueError(f"Unsupported export format: {path}")
+
+
+def create_headless_axes(figsize=(10, 10), dpi=100):
+    """
+    画面を開かずに描画する Figure と 3D軸を作成
+
+    pyplot を経由しないため、GUI バックエンドは初期化されない
+
+    パラメータ:
+        figsize: 図のサイズ [inch]
+        dpi: 解像度 [dot/inch]
+
+    戻り値:
+        (fig, ax): Figure と 3D軸
+    """
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from robot_arm_simulator.plot_setup import setup_font
+
+    setup_font()
+    fig = Figure(figsize=figsize, dpi=dpi)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot(111, projection='3d')
+    return fig, ax
+
+
+def split_angles(angles):
+    """
+    軌道の1要素を描画関数の引数に変換
+
+    パラメータ:
+        angles: (theta1, theta2, theta3) または (theta1, theta2, theta3, theta4)
+                (SerialChainRobot の場合は関節数分の角度)
+
+    戻り値:
+        3要素の場合は (theta1, theta2, theta3, 0)、
+        それ以外は各要素のタプル [rad]
+    """
+    if len(angles) == 3:
+        theta1, theta2, theta3 = angles
+        return theta1, theta2, theta3, 0
+    return tuple(angles)
+
+
+def render_frames(robot, trajectory, indices, figsize=(10, 10), dpi=100):
+    """
+    軌道の指定フレームを1枚ずつ描画して返すジェネレータ
+
+    パラメータ:
+        robot: ThreeAxisRobot インスタンス
+        trajectory: [(theta1, theta2, theta3[, theta4]), ...] の軌道
+        indices: 描画するフレーム番号の列
+        figsize: 図のサイズ [inch]
+        dpi: 解像度 [dot/inch]
+
+    戻り値:
+        RGBA 画像 形状 (高さ, 幅, 4) の uint8 配列を順に返す
+    """
+    fig, ax = create_headless_axes(figsize, dpi)
+    artists = None
+    for index in indices:
+        angles = split_angles(trajectory[index])
+        if artists is None:
+            artists = robot.create_plot_artists(ax, *angles)
+        else:
+            robot.update_plot_artists(artists, *angles)
+        fig.canvas.draw()
+        # 描画バッファは次の描画で上書きされるためコピーする
+        yield np.array(fig.canvas.buffer_rgba())
+
+
+def _config_snapshot():
+    """RobotConfig の設定値(大文字の属性)を辞書で取得"""
+    return {key: value for key, value in vars(RobotConfig).items()
+            if key.isupper()}
+
+
+def _init_render_worker(robot, config, figsize, dpi):
+    """
+    描画ワーカープロセスの初期化
+
+    spawn で起動したプロセスでは RobotConfig が既定値に戻るため、
+    親プロセスの設定値を反映してから Figure を作成する
+    """
+    for key, value in config.items():
+        setattr(RobotConfig, key, value)
+    fig, ax = create_headless_axes(figsize, dpi)
+    _worker_state.update(robot=robot, fig=fig, ax=ax, artists=None)
+
+
+def _render_chunk(chunk):
+    """
+    ワーカープロセスで軌道の一部を描画
+
+    パラメータ:
+        chunk: [(theta1, theta2, theta3, theta4), ...] の関節角度のリスト
+
+    戻り値:
+        frames: RGBA 画像のリスト
+    """
+    robot = _worker_state['robot']
+    fig = _worker_state['fig']
+    frames = []
+    for angles in chunk:
+        if _worker_state['artists'] is None:
+            _worker_state['artists'] = robot.create_plot_artists(
+                _worker_state['ax'], *angles)
+        else:
+            robot.update_plot_artists(_worker_state['artists'], *angles)
+        fig.canvas.draw()
+        frames.append(np.array(fig.canvas.buffer_rgba()))
+    return frames
+
+
+def render_frames_parallel(robot, trajectory, indices, figsize=(10, 10),
+                           dpi=100, workers=None, chunk_size=16):
+    """
+    軌道の指定フレームをプロセスプールで並列に描画して順に返すジェネレータ
+
+    軌道を chunk_size フレームごとに分割し、各ワーカーは専用の
+    Agg の Figure で描画する。結果は元の順序に並べ直して返すため、
+    ワーカー数によらず render_frames と同じフレーム列になる
+
+    パラメータ:
+        robot: ThreeAxisRobot インスタンス
+        trajectory: [(theta1, theta2, theta3[, theta4]), ...] の軌道
+        indices: 描画するフレーム番号の列
+        figsize: 図のサイズ [inch]
+        dpi: 解像度 [dot/inch]
+        workers: ワーカープロセス数(省略時は CPU 数)
+        chunk_size: 1回の依頼で描画するフレーム数
+
+    戻り値:
+        RGBA 画像 形状 (高さ, 幅, 4) の uint8 配列を順に返す
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    indices = list(indices)
+
+    with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_render_worker,
+            initargs=(robot, _config_snapshot(), figsize, dpi)) as executor:
+        # 先行して依頼するチャンク数を制限し、メモリ使用量を抑える
+        pending = collections.deque()
+        for start in range(0, len(indices), chunk_size):
+            chunk = [tuple(float(angle)
+                           for angle in split_angles(trajectory[index]))
+                     for index in indices[start:start + chunk_size]]
+            pending.append(executor.submit(_render_chunk, chunk))
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def export_trajectory(robot, trajectory, path, fps=None, interval=50,
+                      figsize=(10, 10), dpi=100, stride=1, buffer_frames=8,
+                      measure_memory=False, workers=1, chunk_size=16):
+    """
+    軌道を画面を開かずにファイルへ書き出す
+
+    フレームは1枚ずつ描画し、最大 buffer_frames 枚のバッファを介して
+    別スレッドで逐次書き出すため、メモリ使用量はフレーム数に依存しない
+
+    パラメータ:
+        robot: ThreeAxisRobot インスタンス
+        trajectory: [(theta1, theta2, theta3[, theta4]), ...] の軌道
+                    (TrajectoryFile またはそのパスの場合はフレームを
+                    メモリマップから順に読む)
+        path: 保存先パス (.gif または連番 .png)
+        fps: フレームレート(省略時は interval から計算)
+        interval: フレーム間隔 [ms] (animate_trajectory と同じ意味)
+        figsize: 図のサイズ [inch]
+        dpi: 解像度 [dot/inch] (画像サイズは figsize * dpi)
+        stride: 何フレームごとに書き出すか
+        buffer_frames: 描画済みで書き出し待ちのフレームの最大数
+        measure_memory: Python のヒープのピークを計測するか
+                        (tracemalloc を使用、ExportStats.peak_python_heap
+                        を参照)
+        workers: 描画プロセス数(1 で現在のプロセスのみ、None で CPU 数)
+        chunk_size: 並列描画時に1回の依頼で描画するフレーム数
+
+    戻り値:
+        stats: ExportStats
+    """
+    if stride < 1:
+        raise ValueError(f"stride must be >= 1, got {stride}")
+    if fps is None:
+        fps = 1000.0 / interval / stride
+    trajectory = open_trajectory(trajectory)
+    writer = create_writer(path, fps)
+
+    if measure_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+
+    # 描画と書き出しを並行させる(キューの大きさでメモリ使用量を制限)
+    frames = queue.Queue(maxsize=buffer_frames)
+    errors = []
+
+    def consume():
+        """キューのフレームを順に書き出す"""
+        try:
+            while True:
+                frame = frames.get()
+                if frame is None:
+                    break
+                writer.write(frame)
+        except Exception as e:
+            errors.append(e)
+            # 描画側が詰まらないようにキューを空にする
+            while frames.get() is not None:
+                pass
+
+    consumer = threading.Thread(target=consume, daemon=True)
+    consumer.start()
+    count = 0
+    try:
+        indices = range(0, len(trajectory), stride)
+        if workers == 1:
+            rendered = render_frames(robot, trajectory, indices, figsize, dpi)
+        else:
+            rendered = render_frames_parallel(
+                robot, trajectory, indices, figsize, dpi, workers, chunk_size)
+        for frame in rendered:
+            frames.put(frame)
+            count += 1
+            if errors:
+                break
+    finally:
+        frames.put(None)
+        consumer.join()
+        writer.close()
+        elapsed = time.perf_counter() - start
+        peak_python_heap = None
+        if measure_memory:
+            peak_python_heap = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    if errors:
+        raise errors[0]
+    return ExportStats(count, elapsed, peak_python_heap)
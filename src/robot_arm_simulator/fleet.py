@@ -0,0 +1,399 @@
+"""
+ロボットアーム 複数台の一括シミュレーション
+台ごとのリンク長・角度制限・関節の状態を関節ごとに連続した配列
+(struct of arrays、形状 (関節, 台数)) で保持し、全台の1周期の更新・
+順運動学・逆運動学・角度制限の判定を1回の呼び出しで計算する
+(RobotConfig のクラス属性は初期値の取得にのみ使用し、変更しない)
+"""
+
+import numpy as np
+from robot_arm_simulator.config import RobotConfig
+from robot_arm_simulator.kinematics import (
+    IK_STATUS_OK, IK_STATUS_OUT_OF_REACH_LENGTH, IK_STATUS_OUT_OF_REACH_ANGLE,
+    IK_STATUS_NO_FEASIBLE_BRANCH, ThreeAxisKinematics)
+
+
+def _per_arm(values, count, rows, name, dtype=np.float64):
+    """
+    台ごとの設定を形状 (rows, count) の連続した配列に揃える
+
+    パラメータ:
+        values: 全台共通の値 形状 (rows,)、または台ごとの値 形状 (count, rows)
+        count: 台数
+        rows: 1台あたりの値の数
+        name: エラーメッセージに使う名前
+        dtype: 配列の型
+
+    戻り値:
+        配列 形状 (rows, count)
+    """
+    values = np.asarray(values, dtype=dtype)
+    if values.shape == (rows,):
+        values = np.broadcast_to(values[:, None], (rows, count))
+    elif values.shape == (count, rows):
+        values = values.T
+    else:
+        raise ValueError(
+            f"{name} must have shape ({rows},) or ({count}, {rows}), "
+            f"got {values.shape}")
+    return np.ascontiguousarray(values)
+
+
+class Fleet:
+    """
+    複数台のロボットアーム
+
+    各配列は形状 (関節, 台数) で、1つの関節の全台分が連続している。
+    step で全台を目標の関節角度へ、関節ごとの最大角速度・最大角加速度を
+    守って動かす(角度制限の外には出ない)
+
+    パラメータ:
+        count: 台数
+        link_lengths: リンク長 [mm] 形状 (3,) (全台共通) または (count, 3)
+                      (省略時は設定ファイルから取得)
+        lower, upper: 角度制限 [rad] 形状 (4,) または (count, 4)
+                      (省略時は設定ファイルから取得)
+        max_velocity: 最大角速度 [rad/s] 形状 (4,) または (count, 4)
+                      (省略時は設定ファイルから取得)
+        max_acceleration: 最大角加速度 [rad/s^2] 形状 (4,) または (count, 4)
+                          (省略時は設定ファイルから取得)
+        angles: 初期の関節角度 [rad] 形状 (4,) または (count, 4)
+                (省略時は角度制限の中央、角度制限でクリップする)
+        dtype: 配列の型 (np.float32 にすると三角関数が大幅に速くなる。
+               手先位置の精度は 1e-4 mm 程度)。既定の np.float64 では
+               10000 台の1周期が 1 ms に収まらないため、1 kHz で
+               数千台以上を動かす場合は np.float32 が必要
+               (benchmarks/bench_fleet.py で確認できる)
+
+    属性:
+        links: リンク長 [mm] 形状 (3, count)
+        lower, upper: 角度制限 [rad] 形状 (4, count)
+        max_velocity, max_acceleration: 形状 (4, count)
+        angles: 関節角度 [rad] 形状 (4, count)
+        velocities: 関節の角速度 [rad/s] 形状 (4, count)
+        targets: 目標の関節角度 [rad] 形状 (4, count)
+    """
+
+    def __init__(self, count, link_lengths=None, lower=None, upper=None,
+                 max_velocity=None, max_acceleration=None, angles=None,
+                 dtype=np.float64):
+        """コンストラクタ"""
+        if count < 1:
+            raise ValueError(f"count must be positive, got {count}")
+        self.count = count
+        self.dtype = np.dtype(dtype)
+        default_lower, default_upper = ThreeAxisKinematics().joint_limits()
+        self.links = _per_arm(
+            RobotConfig.get_link_lengths() if link_lengths is None
+            else link_lengths, count, 3, 'link_lengths', dtype)
+        self.lower = _per_arm(
+            default_lower if lower is None else lower, count, 4, 'lower',
+            dtype)
+        self.upper = _per_arm(
+            default_upper if upper is None else upper, count, 4, 'upper',
+            dtype)
+        if np.any(self.lower > self.upper):
+            raise ValueError("lower must not exceed upper")
+        self.max_velocity = _per_arm(
+            RobotConfig.get_max_velocity_rad() if max_velocity is None
+            else max_velocity, count, 4, 'max_velocity', dtype)
+        self.max_acceleration = _per_arm(
+            RobotConfig.get_max_acceleration_rad() if max_acceleration is None
+            else max_acceleration, count, 4, 'max_acceleration', dtype)
+        if np.any(self.max_velocity <= 0) or \
+                np.any(self.max_acceleration <= 0):
+            raise ValueError(
+                "max_velocity and max_acceleration must be positive")
+
+        if angles is None:
+            self.angles = (self.lower + self.upper) / 2
+        else:
+            self.angles = np.clip(
+                _per_arm(angles, count, 4, 'angles', dtype),
+                self.lower, self.upper)
+        self.velocities = np.zeros((4, count), dtype)
+        self.targets = self.angles.copy()
+
+        # step の作業領域(周期ごとのメモリ確保を避ける)
+        self._error = np.empty((4, count), dtype)
+        self._limit = np.empty((4, count), dtype)
+        self._scratch = np.empty((4, count), dtype)
+        self._keep = np.empty((4, count), dtype=bool)
+        self._step_dt = None
+
+    @classmethod
+    def from_robots(cls, robots, **kwargs):
+        """
+        ThreeAxisKinematics のリストから作成
+
+        パラメータ:
+            robots: ThreeAxisKinematics (または ThreeAxisRobot) のリスト
+                    (リンク長・角度制限を台ごとに使用)
+            kwargs: Fleet のその他の引数
+
+        戻り値:
+            Fleet
+        """
+        limits = [robot.joint_limits() for robot in robots]
+        return cls(len(robots),
+                   link_lengths=[(robot.link1, robot.link2, robot.link3)
+                                 for robot in robots],
+                   lower=[lower for lower, _ in limits],
+                   upper=[upper for _, upper in limits], **kwargs)
+
+    def robot(self, index):
+        """
+        1台分の ThreeAxisKinematics を作成(描画・詳細な計算用)
+
+        パラメータ:
+            index: 台の番号
+
+        戻り値:
+            ThreeAxisKinematics
+        """
+        robot = ThreeAxisKinematics(*self.links[:, index])
+        robot.theta1_min, robot.theta2_min, robot.theta3_min, \
+            robot.theta4_min = self.lower[:, index]
+        robot.theta1_max, robot.theta2_max, robot.theta3_max, \
+            robot.theta4_max = self.upper[:, index]
+        return robot
+
+    def set_targets(self, angles, indices=None):
+        """
+        目標の関節角度を設定(角度制限でクリップする)
+
+        パラメータ:
+            angles: 目標の関節角度 [rad] 形状 (4,) または (len(indices), 4)
+                    (indices を省略した場合は (count, 4))
+            indices: 設定する台の番号の配列(省略時は全台)
+        """
+        if indices is None:
+            angles = _per_arm(angles, self.count, 4, 'angles', self.dtype)
+            np.clip(angles, self.lower, self.upper, out=self.targets)
+            return
+        indices = np.asarray(indices)
+        angles = np.asarray(angles, dtype=float)
+        if angles.ndim == 2:
+            angles = angles.T
+        else:
+            angles = angles[:, None]
+        self.targets[:, indices] = np.clip(
+            angles, self.lower[:, indices], self.upper[:, indices])
+
+    def step(self, dt):
+        """
+        全台を1周期 dt だけ目標へ動かす
+
+        関節ごとに、目標で止まれる速度と最大角速度の小さい方へ、
+        角加速度の制限内で速度を変える。止まれる速度は周期ごとに
+        a dt ずつ減速して誤差 e を進み切る速度
+        sqrt(2 a e + (a dt / 2)^2) - a dt / 2 (dt → 0 で sqrt(2 a e))。
+        目標を通り過ぎる場合は目標で止める。このとき速度は一度に 0 に
+        なるため、この周期に限り速度の変化は最大角加速度の制限を超え、
+        最大で 2 a dt になる
+
+        パラメータ:
+            dt: 周期 [s]
+        """
+        if self._step_dt != dt:
+            # dt ごとに変わらない係数 (2 a, (a dt / 2)^2, a dt / 2, ±a dt)
+            half = self.max_acceleration * (dt / 2)
+            self._step_constants = (2 * self.max_acceleration, half * half,
+                                    half, 2 * half, -2 * half)
+            self._step_dt = dt
+        two_acceleration, half_square, half, change_max, change_min = \
+            self._step_constants
+        error, limit, scratch, keep = \
+            self._error, self._limit, self._scratch, self._keep
+        angles, velocities, targets = \
+            self.angles, self.velocities, self.targets
+
+        # 配列の一部だけを書き換える where= は、台ごとに条件がばらつくと
+        # 分岐予測が外れて非常に遅くなるため、条件は全て bool 配列の
+        # 掛け算で表す
+
+        # 目標の速度: sign(誤差) * min(止まれる速度, 最大角速度)
+        # (誤差が 0 のとき止まれる速度も 0 なので、符号は 2 (誤差 > 0) - 1)
+        np.subtract(targets, angles, out=error)
+        np.abs(error, out=limit)
+        limit *= two_acceleration
+        limit += half_square
+        np.sqrt(limit, out=limit)
+        limit -= half
+        np.minimum(limit, self.max_velocity, out=limit)
+        np.greater(error, 0.0, out=keep)
+        np.multiply(limit, keep, out=scratch)
+        scratch *= 2.0
+        np.subtract(scratch, limit, out=limit)
+        # 速度の変化を a * dt に制限する
+        limit -= velocities
+        np.minimum(limit, change_max, out=limit)
+        np.maximum(limit, change_min, out=limit)
+        velocities += limit
+
+        # 位置の更新(目標を通り過ぎた関節は目標で止める)
+        np.multiply(velocities, dt, out=limit)
+        angles += limit
+        np.subtract(targets, angles, out=limit)
+        np.multiply(limit, error, out=error)
+        np.greater(error, 0.0, out=keep)
+        velocities *= keep
+        limit *= keep
+        np.subtract(targets, limit, out=angles)
+        np.minimum(angles, self.upper, out=angles)
+        np.maximum(angles, self.lower, out=angles)
+
+    def settled(self, tolerance=1e-6):
+        """
+        目標に到達して止まった台
+
+        パラメータ:
+            tolerance: 角度 [rad] と角速度 [rad/s] の許容誤差
+
+        戻り値:
+            settled: 形状 (count,) の bool 配列
+        """
+        return np.all((np.abs(self.targets - self.angles) <= tolerance) &
+                      (np.abs(self.velocities) <= tolerance), axis=0)
+
+    def end_effector(self, angles=None, out=None):
+        """
+        手先位置(順運動学の手先のみ)
+
+        ThreeAxisKinematics.forward_kinematics_batch の p4 と同じ計算を
+        台ごとのリンク長で行う(angles は角度制限でクリップしない)
+
+        パラメータ:
+            angles: 関節角度 [rad] 形状 (4, count) (省略時は現在の角度)
+            out: 結果を書き込む配列 形状 (3, count) (省略時は新規作成)
+
+        戻り値:
+            positions: 手先位置 [mm] 形状 (3, count)
+        """
+        angles = self.angles if angles is None else angles
+        if out is None:
+            out = np.empty((3, self.count), self.dtype)
+        total_angle1 = angles[1]
+        total_angle2 = total_angle1 + angles[2]
+        total_angle3 = total_angle2 + angles[3]
+        link1, link2, link3 = self.links
+        radius = link1 * np.sin(total_angle1)
+        radius += link2 * np.sin(total_angle2)
+        radius += link3 * np.sin(total_angle3)
+        np.multiply(link1, np.cos(total_angle1), out=out[2])
+        out[2] += link2 * np.cos(total_angle2)
+        out[2] += link3 * np.cos(total_angle3)
+        np.multiply(radius, np.cos(angles[0]), out=out[0])
+        np.multiply(radius, np.sin(angles[0]), out=out[1])
+        return out
+
+    def forward_kinematics(self, angles=None):
+        """
+        順運動学: 全台の各リンクの端点位置
+
+        パラメータ:
+            angles: 関節角度 [rad] 形状 (4, count) (省略時は現在の角度、
+                    角度制限でクリップする)
+
+        戻り値:
+            positions: リンクの端点位置 [mm] 形状 (5, 3, count)
+                       positions[i] が forward_kinematics の p{i} に対応
+        """
+        angles = self.angles if angles is None else \
+            np.clip(angles, self.lower, self.upper)
+        cos_theta1 = np.cos(angles[0])
+        sin_theta1 = np.sin(angles[0])
+        total_angle = np.cumsum(angles[1:], axis=0)
+        radius = np.cumsum(self.links * np.sin(total_angle), axis=0)
+        height = np.cumsum(self.links * np.cos(total_angle), axis=0)
+
+        positions = np.zeros((5, 3, self.count), self.dtype)
+        positions[2:, 0] = radius * cos_theta1
+        positions[2:, 1] = radius * sin_theta1
+        positions[2:, 2] = height
+        return positions
+
+    def inverse_kinematics(self, targets, current=None):
+        """
+        逆運動学: 全台の目標位置の関節角度
+
+        ThreeAxisKinematics.inverse_kinematics_select_batch と同じく
+        第2・第3リンクを1本とみなし (theta4 = 0)、4通りの解析解のうち
+        台ごとの角度制限内で current に最も近い分岐を選ぶ
+
+        パラメータ:
+            targets: 目標位置 [mm] 形状 (3, count)
+            current: 現在の関節角度 [rad] 形状 (4, count)
+                     (省略時は現在の角度)
+
+        戻り値:
+            angles: 関節角度 [rad] 形状 (4, count) (解がない台は現在の角度)
+            status: 台ごとのステータス (IK_STATUS_*) 形状 (count,)
+        """
+        targets = np.asarray(targets, dtype=float)
+        if targets.shape != (3, self.count):
+            raise ValueError(
+                f"targets must have shape (3, {self.count}), "
+                f"got {targets.shape}")
+        current = self.angles if current is None else current
+        len_1 = self.links[0]
+        len_2 = self.links[1] + self.links[2]
+        x, y, z = targets
+        azimuth = np.arctan2(y, x)
+        rho = np.hypot(x, y)
+
+        middle = (self.lower + self.upper) / 2
+        best = np.full(self.count, np.inf)
+        angles = current.copy()
+        branch_angles = np.empty((4, self.count), self.dtype)
+        branch_angles[3] = 0.0
+        for theta1, radius in ((azimuth, rho), (azimuth + np.pi, -rho)):
+            for elbow in (1.0, -1.0):
+                branch_angles[0] = theta1
+                planar, cos_theta3 = ThreeAxisKinematics._planar_two_link(
+                    radius, z, len_1, len_2, elbow)
+                branch_angles[1:3] = planar.T
+                # 2π ずれた角度を角度制限の中央 ±π に収める
+                wrapped = middle + np.mod(
+                    branch_angles - middle + np.pi, 2*np.pi) - np.pi
+                feasible = np.all((wrapped >= self.lower - 1e-9) &
+                                  (wrapped <= self.upper + 1e-9), axis=0)
+                difference = np.mod(wrapped - current + np.pi,
+                                    2*np.pi) - np.pi
+                cost = np.where(feasible,
+                                np.sum(difference ** 2, axis=0), np.inf)
+                better = cost < best
+                best[better] = cost[better]
+                angles[:, better] = np.clip(
+                    wrapped[:, better], self.lower[:, better],
+                    self.upper[:, better])
+
+        # 範囲チェック(距離の判定を優先する)
+        status = np.full(self.count, IK_STATUS_OK, dtype=np.int8)
+        out_of_length = np.sqrt(np.sum(targets ** 2, axis=0)) > len_1 + len_2
+        out_of_angle = ~out_of_length & (np.abs(cos_theta3) > 1.0)
+        status[np.isinf(best)] = IK_STATUS_NO_FEASIBLE_BRANCH
+        status[out_of_length] = IK_STATUS_OUT_OF_REACH_LENGTH
+        status[out_of_angle] = IK_STATUS_OUT_OF_REACH_ANGLE
+        failed = status != IK_STATUS_OK
+        angles[:, failed] = current[:, failed]
+        return angles, status
+
+    def within_limits(self, angles=None, tolerance=0.0):
+        """
+        角度制限の判定
+
+        パラメータ:
+            angles: 関節角度 [rad] 形状 (4, count) (省略時は目標の角度)
+            tolerance: 許容する超過量 [rad]
+
+        戻り値:
+            within: 全関節が制限内の台 形状 (count,) の bool 配列
+        """
+        angles = self.targets if angles is None else angles
+        return np.all((angles >= self.lower - tolerance) &
+                      (angles <= self.upper + tolerance), axis=0)
+
+    def __repr__(self):
+        moving = self.count - int(np.count_nonzero(self.settled()))
+        return f'Fleet(count={self.count}, moving={moving})'
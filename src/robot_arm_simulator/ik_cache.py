@@ -0,0 +1,185 @@
+"""
+ロボットアーム 逆運動学のキャッシュ
+同じ目標位置・リンク長で繰り返し呼ばれる inverse_kinematics の結果を
+LRU 方式で保持する(複数スレッドから共有可能)
+"""
+
+import collections
+import math
+import threading
+
+import numpy as np
+from robot_arm_simulator.kinematics import (
+    IK_STATUS_OUT_OF_REACH_ANGLE, IK_STATUS_OUT_OF_REACH_LENGTH,
+    inverse_kinematics, inverse_kinematics_batch)
+
+
+class IKCacheStats:
+    """
+    キャッシュの統計
+
+    属性:
+        hits: キャッシュから結果を返した回数
+        misses: 逆運動学を計算した回数
+        evictions: 上限を超えて破棄したエントリ数
+        size: 現在のエントリ数
+        maxsize: エントリ数の上限
+        hit_rate: ヒット率 (0 - 1)
+    """
+
+    def __init__(self, hits, misses, evictions, size, maxsize):
+        """コンストラクタ"""
+        self.hits = hits
+        self.misses = misses
+        self.evictions = evictions
+        self.size = size
+        self.maxsize = maxsize
+        lookups = hits + misses
+        self.hit_rate = hits / lookups if lookups > 0 else 0.0
+
+    def __repr__(self):
+        return (f'IKCacheStats(hits={self.hits}, misses={self.misses}, '
+                f'evictions={self.evictions}, '
+                f'size={self.size}/{self.maxsize}, '
+                f'hit_rate={self.hit_rate:.3f})')
+
+
+class IKCache:
+    """
+    逆運動学の LRU キャッシュ
+
+    目標位置を quantum [mm] 単位に丸めた値とリンク長をキーとし、
+    丸めた目標位置で計算した結果を保持する
+    (丸めによる目標位置のずれは最大で quantum / 2)
+
+    パラメータ:
+        maxsize: エントリ数の上限(超えた場合は最も古く使われたものを破棄)
+        quantum: 目標位置の丸め単位 [mm]
+    """
+
+    def __init__(self, maxsize=1024, quantum=0.01):
+        """コンストラクタ"""
+        if maxsize < 1:
+            raise ValueError(f"maxsize must be positive, got {maxsize}")
+        if quantum <= 0:
+            raise ValueError(f"quantum must be positive, got {quantum}")
+        self.maxsize = int(maxsize)
+        self.quantum = float(quantum)
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def _key(self, px, py, pz, len_1, len_2):
+        """キャッシュのキー(丸めた目標位置の格子番号とリンク長)"""
+        return (round(px / self.quantum), round(py / self.quantum),
+                round(pz / self.quantum), float(len_1), float(len_2))
+
+    def _store(self, key, result):
+        """エントリを追加し、上限を超えた分を破棄(ロック取得済みで呼ぶ)"""
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    def inverse_kinematics(self, px, py, pz, len_1, len_2):
+        """
+        キャッシュ付きの逆運動学
+
+        パラメータ・戻り値は inverse_kinematics と同じ
+        (計算するのはキャッシュにない場合のみで、エラー表示もその時だけ)
+        NaN / inf を含む場合は丸められないため、キャッシュを使わずに
+        inverse_kinematics をそのまま呼ぶ(ミスとして数え、登録はしない)
+        """
+        if not all(map(math.isfinite, (px, py, pz, len_1, len_2))):
+            with self._lock:
+                self._misses += 1
+            return inverse_kinematics(px, py, pz, len_1, len_2)
+        key = self._key(px, py, pz, len_1, len_2)
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return result
+            self._misses += 1
+
+        # 計算中はロックを解放する(同じキーを同時に計算しても結果は同じ)
+        result = inverse_kinematics(
+            key[0] * self.quantum, key[1] * self.quantum,
+            key[2] * self.quantum, len_1, len_2)
+        with self._lock:
+            self._store(key, result)
+        return result
+
+    def warm(self, targets, len_1, len_2):
+        """
+        目標位置をまとめて計算し、キャッシュに登録(ヒット・ミスは数えない)
+
+        パラメータ:
+            targets: 目標位置 [mm] 形状 (N, 3)
+            len_1: 第1リンク長 [mm]
+            len_2: 第2リンク長 [mm] (第2・第3リンクの合計)
+
+        戻り値:
+            status: inverse_kinematics_batch のステータス 形状 (N,)
+            (NaN / inf を含む目標は計算のみで登録しない)
+        """
+        targets = np.asarray(targets, dtype=float).reshape(-1, 3)
+        cells = np.round(targets / self.quantum)
+        angles, status = inverse_kinematics_batch(
+            cells * self.quantum, len_1, len_2)
+        if not (math.isfinite(len_1) and math.isfinite(len_2)):
+            return status
+        finite = np.isfinite(cells).all(axis=1)
+        with self._lock:
+            # 要素を inverse_kinematics と同じ numpy のスカラーにする
+            for cell, angle, code in zip(cells[finite].tolist(),
+                                         angles[finite],
+                                         status[finite].tolist()):
+                key = (int(cell[0]), int(cell[1]), int(cell[2]),
+                       float(len_1), float(len_2))
+                # 到達できない目標は inverse_kinematics と同じく (0, 0, 0)
+                unreachable = code in (IK_STATUS_OUT_OF_REACH_LENGTH,
+                                       IK_STATUS_OUT_OF_REACH_ANGLE)
+                self._store(key, (0, 0, 0) if unreachable else tuple(angle))
+        return status
+
+    def invalidate(self, len_1=None, len_2=None):
+        """
+        エントリを破棄(RobotConfig のリンク長を変更した場合など)
+
+        パラメータ:
+            len_1, len_2: 指定した場合はそのリンク長のエントリのみ破棄
+
+        戻り値:
+            count: 破棄したエントリ数
+        """
+        with self._lock:
+            if len_1 is None and len_2 is None:
+                count = len(self._entries)
+                self._entries.clear()
+                return count
+            stale = [key for key in self._entries
+                     if (len_1 is None or key[3] == float(len_1)) and
+                     (len_2 is None or key[4] == float(len_2))]
+            for key in stale:
+                del self._entries[key]
+            return len(stale)
+
+    def stats(self):
+        """
+        キャッシュの統計を取得
+
+        戻り値:
+            IKCacheStats
+        """
+        with self._lock:
+            return IKCacheStats(self._hits, self._misses, self._evictions,
+                                len(self._entries), self.maxsize)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
@@ -0,0 +1,691 @@
+"""
+ロボットアーム 運動学
+順運動学・逆運動学の計算(numpy のみを使用し、matplotlib には依存しない)
+"""
+
+import numpy as np
+from robot_arm_simulator.config import RobotConfig
+
+
+class ThreeAxisKinematics:
+    """
+    3軸ロボットアームの運動学クラス(描画機能なし)
+
+    パラメータ:
+        link1_length: 第1リンク長 [mm] (省略時は設定ファイルから取得)
+        link2_length: 第2リンク長 [mm] (省略時は設定ファイルから取得)
+        link3_length: 第3リンク長 [mm] (省略時は設定ファイルから取得)
+    """
+
+    def __init__(self, link1_length=None, link2_length=None, link3_length=None):
+        """コンストラクタ"""
+        # 設定ファイルから値を取得(引数が指定されていない場合)
+        if link1_length is None:
+            link1_length = RobotConfig.LINK1_LENGTH
+        if link2_length is None:
+            link2_length = RobotConfig.LINK2_LENGTH
+        if link3_length is None:
+            link3_length = RobotConfig.LINK3_LENGTH
+
+        self.link1 = link1_length
+        self.link2 = link2_length
+        self.link3 = link3_length
+
+        # 角度制限を設定ファイルから取得 [rad]
+        self.theta1_min, self.theta1_max = RobotConfig.get_theta1_range_rad()
+        self.theta2_min, self.theta2_max = RobotConfig.get_theta2_range_rad()
+        self.theta3_min, self.theta3_max = RobotConfig.get_theta3_range_rad()
+        self.theta4_min, self.theta4_max = RobotConfig.get_theta4_range_rad()
+
+    def forward_kinematics(self, theta1, theta2, theta3, theta4=0):
+        """
+        順運動学: 関節角度から各リンクの端点位置を計算
+
+        パラメータ:
+            theta1: 根元回転角度 [rad] (Z軸周り)
+            theta2: 根元モーター角度 [rad] (Y軸周り)
+            theta3: 関節モーター角度 [rad] (Y軸周り)
+            theta4: Link3の角度 [rad] (Y軸周り)
+
+        戻り値:
+            positions: リンクの端点位置のリスト [(x, y, z), ...]
+        """
+        # 角度制限のチェック
+        theta1 = np.clip(theta1, self.theta1_min, self.theta1_max)
+        theta2 = np.clip(theta2, self.theta2_min, self.theta2_max)
+        theta3 = np.clip(theta3, self.theta3_min, self.theta3_max)
+        theta4 = np.clip(theta4, self.theta4_min, self.theta4_max)
+
+        # 基点(原点)
+        p0 = np.array([0, 0, 0])
+
+        # 第1関節(Z軸回転のみ、高さ方向には動かない)
+        # この時点では回転のみで、リンクはまだ伸びていない
+        p1 = np.array([0, 0, 0])
+
+        # 共通の三角関数はここで一度だけ計算する
+        cos_theta1 = np.cos(theta1)
+        sin_theta1 = np.sin(theta1)
+
+        # 第2関節(Z軸回転 + Y軸回転後のリンク1端点)
+        # Z軸回転とY軸回転の組み合わせ
+        r1 = self.link1 * np.sin(theta2)
+        x1 = r1 * cos_theta1
+        y1 = r1 * sin_theta1
+        z1 = self.link1 * np.cos(theta2)
+        p2 = np.array([x1, y1, z1])
+
+        # 第3関節(リンク2端点)
+        # theta2 + theta3 の合成角度でリンク2が伸びる
+        total_angle2 = theta2 + theta3
+        r2 = self.link2 * np.sin(total_angle2)
+        x2 = x1 + r2 * cos_theta1
+        y2 = y1 + r2 * sin_theta1
+        z2 = z1 + self.link2 * np.cos(total_angle2)
+        p3 = np.array([x2, y2, z2])
+
+        # 手先(リンク3端点) - theta4で独立して動く
+        total_angle3 = total_angle2 + theta4
+        r3 = self.link3 * np.sin(total_angle3)
+        x3 = x2 + r3 * cos_theta1
+        y3 = y2 + r3 * sin_theta1
+        z3 = z2 + self.link3 * np.cos(total_angle3)
+        p4 = np.array([x3, y3, z3])
+
+        return [p0, p1, p2, p3, p4]
+
+    def forward_kinematics_batch(self, thetas):
+        """
+        順運動学(バッチ版): 複数姿勢の関節角度から各リンクの端点位置を一括計算
+
+        forward_kinematics と同じ角度制限・同じ計算順序で処理するため、
+        各姿勢の結果は forward_kinematics の戻り値と一致する
+
+        パラメータ:
+            thetas: 関節角度の配列 [rad] 形状 (N, 3) または (N, 4)
+                    (N, 3) の場合は theta4 = 0 として扱う
+
+        戻り値:
+            positions: リンクの端点位置 形状 (N, 5, 3)
+                       positions[:, i] が forward_kinematics の p{i} に対応
+        """
+        thetas = np.asarray(thetas, dtype=float)
+        if thetas.ndim != 2 or thetas.shape[1] not in (3, 4):
+            raise ValueError(
+                "thetas must have shape (N, 3) or (N, 4), "
+                f"got {thetas.shape}")
+
+        # 角度制限のチェック
+        theta1 = np.clip(thetas[:, 0], self.theta1_min, self.theta1_max)
+        theta2 = np.clip(thetas[:, 1], self.theta2_min, self.theta2_max)
+        theta3 = np.clip(thetas[:, 2], self.theta3_min, self.theta3_max)
+        if thetas.shape[1] == 4:
+            theta4 = thetas[:, 3]
+        else:
+            theta4 = np.zeros(thetas.shape[0])
+        theta4 = np.clip(theta4, self.theta4_min, self.theta4_max)
+
+        # 共通の三角関数は姿勢ごとに一度だけ計算する
+        cos_theta1 = np.cos(theta1)
+        sin_theta1 = np.sin(theta1)
+        total_angle2 = theta2 + theta3
+        total_angle3 = total_angle2 + theta4
+
+        # p0, p1 は常に原点
+        positions = np.zeros((thetas.shape[0], 5, 3))
+
+        # 第2関節(リンク1端点)
+        r1 = self.link1 * np.sin(theta2)
+        positions[:, 2, 0] = r1 * cos_theta1
+        positions[:, 2, 1] = r1 * sin_theta1
+        positions[:, 2, 2] = self.link1 * np.cos(theta2)
+
+        # 第3関節(リンク2端点)
+        r2 = self.link2 * np.sin(total_angle2)
+        positions[:, 3, 0] = positions[:, 2, 0] + r2 * cos_theta1
+        positions[:, 3, 1] = positions[:, 2, 1] + r2 * sin_theta1
+        positions[:, 3, 2] = (positions[:, 2, 2] +
+                              self.link2 * np.cos(total_angle2))
+
+        # 手先(リンク3端点)
+        r3 = self.link3 * np.sin(total_angle3)
+        positions[:, 4, 0] = positions[:, 3, 0] + r3 * cos_theta1
+        positions[:, 4, 1] = positions[:, 3, 1] + r3 * sin_theta1
+        positions[:, 4, 2] = (positions[:, 3, 2] +
+                              self.link3 * np.cos(total_angle3))
+
+        return positions
+
+    def joint_limits(self):
+        """
+        関節の角度制限を配列で取得
+
+        戻り値:
+            lower: 下限 [rad] 形状 (4,)
+            upper: 上限 [rad] 形状 (4,)
+        """
+        lower = np.array([self.theta1_min, self.theta2_min,
+                          self.theta3_min, self.theta4_min])
+        upper = np.array([self.theta1_max, self.theta2_max,
+                          self.theta3_max, self.theta4_max])
+        return lower, upper
+
+    def jacobian_batch(self, thetas):
+        """
+        手先位置のヤコビ行列(バッチ版)
+
+        角度制限によるクリップは行わない(数値計算で使用するため)
+
+        パラメータ:
+            thetas: 関節角度の配列 [rad] 形状 (N, 4)
+
+        戻り値:
+            jacobian: d(x, y, z) / d(theta1, ..., theta4) 形状 (N, 3, 4)
+        """
+        thetas = np.asarray(thetas, dtype=float)
+        theta1 = thetas[:, 0]
+        total_angle1 = thetas[:, 1]
+        total_angle2 = total_angle1 + thetas[:, 2]
+        total_angle3 = total_angle2 + thetas[:, 3]
+
+        # 各リンクの半径方向・高さ方向の成分
+        r1 = self.link1 * np.sin(total_angle1)
+        r2 = self.link2 * np.sin(total_angle2)
+        r3 = self.link3 * np.sin(total_angle3)
+        z1 = self.link1 * np.cos(total_angle1)
+        z2 = self.link2 * np.cos(total_angle2)
+        z3 = self.link3 * np.cos(total_angle3)
+        radius = r1 + r2 + r3
+        cos_theta1 = np.cos(theta1)
+        sin_theta1 = np.sin(theta1)
+
+        # 第2〜4軸は、その関節より先のリンクの半径・高さが変化する
+        dr = np.stack([z1 + z2 + z3, z2 + z3, z3], axis=1)
+        dz = -np.stack([radius, r2 + r3, r3], axis=1)
+
+        jacobian = np.zeros((thetas.shape[0], 3, 4))
+        jacobian[:, 0, 0] = -radius * sin_theta1
+        jacobian[:, 1, 0] = radius * cos_theta1
+        jacobian[:, 0, 1:] = dr * cos_theta1[:, None]
+        jacobian[:, 1, 1:] = dr * sin_theta1[:, None]
+        jacobian[:, 2, 1:] = dz
+        return jacobian
+
+    def inverse_kinematics_pitch_batch(self, targets, pitch,
+                                       max_iterations=20, tolerance=1e-6,
+                                       damping=1e-3, pitch_weight=None):
+        """
+        手先位置と第3リンクの傾き(ピッチ)の逆運動学(4軸・バッチ版)
+
+        ピッチは Z軸からの第3リンクの傾き theta2 + theta3 + theta4 [rad]
+        (0 で真上、π/2 で水平)。手首(第3リンクの根元)の位置を
+        inverse_kinematics_batch で解いた結果を初期値とし、角度制限を
+        守りながら減衰最小二乗法で位置とピッチの誤差を小さくする
+
+        パラメータ:
+            targets: 目標位置 [mm] 形状 (N, 3)
+            pitch: 目標ピッチ [rad] 形状 (N,) またはスカラー
+            max_iterations: 最大反復回数
+            tolerance: 収束判定の位置誤差 [mm]
+                       (ピッチ誤差は tolerance / pitch_weight [rad])
+            damping: 減衰係数の最小値 [mm]
+            pitch_weight: ピッチ誤差 1 rad を何 mm とみなすか
+                          (省略時はリンク長の合計)
+
+        戻り値:
+            PitchIKResult
+        """
+        targets = np.asarray(targets, dtype=float)
+        if targets.ndim != 2 or targets.shape[1] != 3:
+            raise ValueError(
+                f"targets must have shape (N, 3), got {targets.shape}")
+        count = targets.shape[0]
+        pitch = np.broadcast_to(np.asarray(pitch, dtype=float), (count,))
+        if pitch_weight is None:
+            pitch_weight = self.link1 + self.link2 + self.link3
+        lower, upper = self.joint_limits()
+
+        angles = self._pitch_seed(targets, pitch, pitch_weight)
+        error = self._pitch_error(angles, targets, pitch, pitch_weight)
+        error_sq = np.sum(error ** 2, axis=1)
+        # 1回の変化量の上限 [rad] (誤差が増えたら狭め、減ったら広げる)
+        limit = np.full(count, 0.5)
+        iterations = np.zeros(count, dtype=np.int32)
+        active = np.flatnonzero(error_sq > tolerance ** 2)
+
+        for _ in range(max_iterations):
+            if len(active) == 0:
+                break
+            current = angles[active]
+            jacobian = np.zeros((len(active), 4, 4))
+            jacobian[:, :3] = self.jacobian_batch(current)
+            jacobian[:, 3, 1:] = pitch_weight
+            # 目標から遠いほど減衰を強める(到達できない目標で振動しないよう)
+            damping_sq = (damping ** 2 + error_sq[active] / 4)[:, None, None] \
+                * np.eye(4)
+            step = damped_least_squares_step(
+                jacobian, error[active], damping_sq)
+            # 角度制限に張り付いて外側へ動こうとする関節を固定して解き直す
+            blocked = ((current <= lower) & (step < 0)) | \
+                ((current >= upper) & (step > 0))
+            if blocked.any():
+                jacobian[blocked[:, None, :].repeat(4, axis=1)] = 0.0
+                step = damped_least_squares_step(
+                    jacobian, error[active], damping_sq)
+            largest = np.maximum(np.max(np.abs(step), axis=1), 1e-12)
+            step *= np.minimum(1.0, limit[active] / largest)[:, None]
+            candidate = np.clip(current + step, lower, upper)
+
+            new_error = self._pitch_error(
+                candidate, targets[active], pitch[active], pitch_weight)
+            new_error_sq = np.sum(new_error ** 2, axis=1)
+            better = new_error_sq < error_sq[active]
+            improved = active[better]
+            angles[improved] = candidate[better]
+            error[improved] = new_error[better]
+            # 改善量が誤差に比べて十分小さくなったものは停止する
+            stalled = better & (error_sq[active] - new_error_sq <
+                                1e-4 * error_sq[active])
+            error_sq[improved] = new_error_sq[better]
+            limit[active] = np.where(better, limit[active] * 2,
+                                     limit[active] / 2)
+            iterations[active] += 1
+            done = (error_sq[active] <= tolerance ** 2) | stalled | \
+                (limit[active] < 1e-12)
+            active = active[~done]
+
+        position_error = np.linalg.norm(error[:, :3], axis=1)
+        pitch_error = np.abs(error[:, 3]) / pitch_weight
+        converged = (position_error <= tolerance) & \
+            (pitch_error * pitch_weight <= tolerance)
+        return PitchIKResult(angles, converged, position_error, pitch_error,
+                             iterations)
+
+    def _pitch_seed(self, targets, pitch, pitch_weight):
+        """
+        手首(第3リンクの根元)の位置を解析的に解いた初期値
+
+        inverse_kinematics_batch の解(肘が上向き、第1軸が手首の方位)に加え、
+        肘の向きの反対側と第1軸を反転(手首が Z軸の反対側)した解も
+        同じ余弦定理で求め、角度制限でクリップしたうえで誤差が最小のものを選ぶ
+        (手首に届かない場合は手首の方向へ伸ばした姿勢)
+        """
+        lower, upper = self.joint_limits()
+        azimuth = np.arctan2(targets[:, 1], targets[:, 0])
+        rho = np.hypot(targets[:, 0], targets[:, 1])
+
+        # 既存の解析解(第1軸 = 目標の方位)
+        tool = self.link3 * np.stack([np.sin(pitch) * np.cos(azimuth),
+                                      np.sin(pitch) * np.sin(azimuth),
+                                      np.cos(pitch)], axis=1)
+        solution, status = inverse_kinematics_batch(
+            targets - tool, self.link1, self.link2)
+        seed = np.zeros((len(targets), 4))
+        seed[:, :3] = solution
+        seed[:, 3] = pitch - seed[:, 1] - seed[:, 2]
+        unreachable = (status == IK_STATUS_OUT_OF_REACH_LENGTH) | \
+            (status == IK_STATUS_OUT_OF_REACH_ANGLE)
+        seeds = [np.where(unreachable[:, None], np.nan, seed)]
+
+        # 第1軸の向き(方位 / 方位 + π)と肘の向きの組み合わせ
+        wrist_z = targets[:, 2] - self.link3 * np.cos(pitch)
+        for theta1, radius in ((azimuth, rho), (azimuth + np.pi, -rho)):
+            wrist_r = radius - self.link3 * np.sin(pitch)
+            for elbow in (1.0, -1.0):
+                seed = np.empty((len(targets), 4))
+                seed[:, 0] = np.arctan2(np.sin(theta1), np.cos(theta1))
+                seed[:, 1:3], _ = self._planar_two_link(
+                    wrist_r, wrist_z, self.link1, self.link2, elbow)
+                seed[:, 3] = pitch - seed[:, 1] - seed[:, 2]
+                seeds.append(seed)
+
+        best = None
+        best_sq = np.full(len(targets), np.inf)
+        for seed in seeds:
+            valid = ~np.isnan(seed[:, 0])
+            seed = np.clip(np.where(valid[:, None],
+                                    self._wrap_to_limits(seed), 0.0),
+                           lower, upper)
+            error_sq = np.sum(self._pitch_error(
+                seed, targets, pitch, pitch_weight) ** 2, axis=1)
+            better = valid & (error_sq < best_sq)
+            if best is None:
+                best = seed.copy()
+            best[better] = seed[better]
+            best_sq[better] = error_sq[better]
+        return best
+
+    @staticmethod
+    def _planar_two_link(r, z, len_1, len_2, elbow):
+        """
+        2リンクの平面逆運動学(余弦定理)
+
+        パラメータ:
+            r, z: 先端の位置(第1軸の向きの半径方向・高さ) [mm] 形状 (N,)
+            len_1, len_2: リンク長 [mm]
+            elbow: 肘の向き (1.0 / -1.0)
+
+        戻り値:
+            angles: (theta2, theta3) [rad] 形状 (N, 2)
+                    (届かない場合は先端の方向へ伸ばす・畳む)
+            cos_theta3: theta3 の余弦(クリップ前、絶対値が 1 を超えると届かない)
+        """
+        cos_theta3 = (r*r + z*z - len_1*len_1 - len_2*len_2) / \
+            (2 * len_1 * len_2)
+        theta3 = elbow * np.arccos(np.clip(cos_theta3, -1.0, 1.0))
+        theta2 = np.arctan2(r, z) - np.arctan2(
+            len_2 * np.sin(theta3), len_1 + len_2 * np.cos(theta3))
+        return np.stack([theta2, theta3], axis=1), cos_theta3
+
+    def _wrap_to_limits(self, angles):
+        """2π ずれた角度を角度制限の中央 ±π に収める 形状 (..., 4)"""
+        lower, upper = self.joint_limits()
+        middle = (lower + upper) / 2
+        return middle + np.mod(angles - middle + np.pi, 2*np.pi) - np.pi
+
+    def inverse_kinematics_branches_batch(self, targets):
+        """
+        逆運動学の全ての解析解(バッチ版)
+
+        inverse_kinematics と同じく第2・第3リンクを1本とみなし (theta4 = 0)、
+        第1軸の向き(目標の方位 / 方位 + π)と肘の向き(theta3 の正負)の
+        4通りを求める。分岐の順番は IK_BRANCH_NAMES の通りで、
+        0 番は inverse_kinematics と同じ解
+
+        パラメータ:
+            targets: 目標位置の配列 [mm] 形状 (N, 3)
+
+        戻り値:
+            angles: 関節角度 [rad] 形状 (N, 4, 4) (目標, 分岐, 関節)
+                    2π ずれた角度は角度制限の中央 ±π に収める
+                    (角度制限外の分岐もクリップしない値を返す)
+            feasible: 到達可能かつ角度制限内の分岐か 形状 (N, 4)
+            status: 目標ごとのステータス 形状 (N,)
+                    (IK_STATUS_OK / IK_STATUS_OUT_OF_REACH_LENGTH /
+                     IK_STATUS_OUT_OF_REACH_ANGLE)
+        """
+        targets = np.asarray(targets, dtype=float)
+        if targets.ndim != 2 or targets.shape[1] != 3:
+            raise ValueError(
+                f"targets must have shape (N, 3), got {targets.shape}")
+        len_1 = self.link1
+        len_2 = self.link2 + self.link3
+        azimuth = np.arctan2(targets[:, 1], targets[:, 0])
+        rho = np.hypot(targets[:, 0], targets[:, 1])
+        reach = np.sqrt(np.sum(targets ** 2, axis=1))
+
+        angles = np.zeros((len(targets), len(IK_BRANCH_NAMES), 4))
+        branch = 0
+        for theta1, radius in ((azimuth, rho), (azimuth + np.pi, -rho)):
+            for elbow in (1.0, -1.0):
+                angles[:, branch, 0] = theta1
+                angles[:, branch, 1:3], cos_theta3 = self._planar_two_link(
+                    radius, targets[:, 2], len_1, len_2, elbow)
+                branch += 1
+        angles = self._wrap_to_limits(angles)
+
+        # 範囲チェック(距離の判定を優先する)
+        status = np.full(len(targets), IK_STATUS_OK, dtype=np.int8)
+        out_of_length = reach > len_1 + len_2
+        out_of_angle = ~out_of_length & (np.abs(cos_theta3) > 1.0)
+        status[out_of_length] = IK_STATUS_OUT_OF_REACH_LENGTH
+        status[out_of_angle] = IK_STATUS_OUT_OF_REACH_ANGLE
+
+        # 丸め誤差の分だけ角度制限を広げて判定し、制限内の分岐は制限内に収める
+        lower, upper = self.joint_limits()
+        tolerance = 1e-9
+        feasible = np.all((angles >= lower - tolerance) &
+                          (angles <= upper + tolerance), axis=2)
+        feasible &= (status == IK_STATUS_OK)[:, None]
+        angles = np.where(feasible[:, :, None],
+                          np.clip(angles, lower, upper), angles)
+        return angles, feasible, status
+
+    def inverse_kinematics_select_batch(self, targets, current=None,
+                                        weights=None, cost=None):
+        """
+        角度制限内の解析解からコストが最小の分岐を選ぶ逆運動学(バッチ版)
+
+        角度制限の外の分岐は除外する(順運動学でクリップされて目標から
+        ずれた姿勢になるのを防ぐ)。どの分岐も制限外の場合は
+        IK_STATUS_NO_FEASIBLE_BRANCH を返す
+
+        パラメータ:
+            targets: 目標位置の配列 [mm] 形状 (N, 3)
+            current: 現在の関節角度 [rad] 形状 (4,) または (N, 4)
+                     指定した場合は現在の姿勢からの重み付き二乗距離をコストとする
+            weights: current からの距離の関節ごとの重み 形状 (4,)
+                     (省略時は全て 1)
+            cost: コスト関数 cost(angles) -> 形状 (N, 4) のコスト
+                  (angles は形状 (N, 4, 4)、指定した場合は current より優先)
+            current・cost とも省略した場合は分岐の番号順
+            (inverse_kinematics と同じ解を優先)
+
+        戻り値:
+            angles: 関節角度 (theta1, ..., theta4) [rad] 形状 (N, 4)
+                    解がない目標は (0, 0, 0, 0)
+            branch: 選んだ分岐の番号 (解がない目標は -1) 形状 (N,)
+            status: 目標ごとのステータス (IK_STATUS_*) 形状 (N,)
+        """
+        branches, feasible, status = \
+            self.inverse_kinematics_branches_batch(targets)
+        count = len(branches)
+
+        if cost is not None:
+            costs = np.asarray(cost(branches), dtype=float)
+        elif current is not None:
+            current = np.broadcast_to(
+                np.asarray(current, dtype=float), (count, 4))
+            weights = np.ones(4) if weights is None else np.asarray(weights)
+            # 角度の差は 2π の周期を考慮して -π - π にする
+            difference = np.mod(branches - current[:, None, :] + np.pi,
+                                2*np.pi) - np.pi
+            costs = np.sum(weights * difference ** 2, axis=2)
+        else:
+            costs = np.broadcast_to(
+                np.arange(branches.shape[1], dtype=float), feasible.shape)
+        costs = np.where(feasible, costs, np.inf)
+
+        branch = np.argmin(costs, axis=1).astype(np.int8)
+        found = feasible.any(axis=1)
+        branch[~found] = -1
+        angles = branches[np.arange(count), np.maximum(branch, 0)]
+        angles[~found] = 0.0
+        status = status.copy()
+        status[~found & (status == IK_STATUS_OK)] = \
+            IK_STATUS_NO_FEASIBLE_BRANCH
+        return angles, branch, status
+
+    def _pitch_error(self, angles, targets, pitch, pitch_weight):
+        """位置の誤差 [mm] とピッチの誤差 (pitch_weight 倍) 形状 (N, 4)"""
+        error = np.empty((len(angles), 4))
+        error[:, :3] = targets - self.forward_kinematics_batch(angles)[:, -1]
+        # ピッチの差は 2π の周期を考慮して -π - π にする
+        difference = pitch - angles[:, 1:].sum(axis=1)
+        error[:, 3] = pitch_weight * (
+            np.mod(difference + np.pi, 2*np.pi) - np.pi)
+        return error
+
+
+class PitchIKResult:
+    """
+    位置とピッチの逆運動学の結果
+
+    属性:
+        angles: 関節角度 (theta1, ..., theta4) [rad] 形状 (N, 4)
+        converged: 位置・ピッチとも許容誤差内に収束したか 形状 (N,)
+        position_error: 手先位置の誤差 [mm] 形状 (N,)
+        pitch_error: ピッチの誤差の絶対値 [rad] 形状 (N,)
+        iterations: 反復回数 形状 (N,)
+    """
+
+    def __init__(self, angles, converged, position_error, pitch_error,
+                 iterations):
+        """コンストラクタ"""
+        self.angles = angles
+        self.converged = converged
+        self.position_error = position_error
+        self.pitch_error = pitch_error
+        self.iterations = iterations
+
+    def __repr__(self):
+        count = len(self.angles)
+        rate = self.converged.mean() if count else 0.0
+        mean_iterations = self.iterations.mean() if count else 0.0
+        return (f'PitchIKResult(targets={count}, converged={rate:.3f}, '
+                f'mean_iterations={mean_iterations:.2f})')
+
+
+def damped_least_squares_step(jacobian, error, damping_sq):
+    """
+    減衰最小二乗法の関節角度の変化量 J^T (J J^T + λ^2 I)^-1 e
+
+    パラメータ:
+        jacobian: ヤコビ行列 形状 (N, M, 4)
+        error: 誤差 形状 (N, M)
+        damping_sq: λ^2 I 形状 (M, M) または (N, M, M)
+
+    戻り値:
+        step: 関節角度の変化量 [rad] 形状 (N, 4)
+    """
+    jacobian_t = jacobian.transpose(0, 2, 1)
+    step = np.linalg.solve(jacobian @ jacobian_t + damping_sq,
+                           error[:, :, None])
+    return (jacobian_t @ step)[:, :, 0]
+
+
+def inverse_kinematics(px: int, py: int, pz: int, len_1: int, len_2: int):
+    try:
+        # XY平面上の距離
+        dxy = np.sqrt(px*px + py*py)
+        # 目標位置までの3D距離
+        pow_reach = px*px + py*py + pz*pz
+        arm_reach = np.sqrt(pow_reach)
+        pow_l1 = len_1*len_1
+        pow_l2 = len_2*len_2
+
+        # ベース回転角（Z軸周り）
+        theta0 = np.arctan2(py, px)
+        # 余弦定理で肘関節の角度を計算
+        cos_theta1 = (pow_l1 + pow_l2 - pow_reach) / (2*len_1*len_2)
+        # 範囲チェック
+        if arm_reach > (len_1 + len_2):
+            print("[ERROR] Target is out of reach! Len:", arm_reach)
+            return (0, 0, 0)
+        elif abs(cos_theta1) > 1.0:
+            print("[ERROR] Target is out of reach! angle:", cos_theta1)
+            return (0, 0, 0)
+        else:
+            theta2 = np.pi - np.arccos(cos_theta1)
+            if np.isnan(theta2):
+                print("[ERROR] theta2 is NaN:", theta2)
+                theta2 = 0.0
+
+            # 角度計算
+            alpha = np.arctan2(pz, dxy)
+            if 0 == arm_reach:
+                beta = 0.0
+            else:
+                beta = np.arccos(
+                    (pow_reach + pow_l1 - pow_l2) / (2*len_1*arm_reach))
+            theta1 = np.pi/2 - (alpha + beta)
+
+            if np.isnan(theta0):
+                print("[ERROR] theta0 is NaN:", theta0)
+                theta0 = 0.0
+            if np.isnan(theta1):
+                print("[ERROR] theta1 is NaN:", theta1)
+                theta1 = 0.0
+            return (theta0, theta1, theta2)
+    except Exception as e:
+        print("[ERROR] Inverse Kinematics Error:", e)
+        return (0, 0, 0)
+
+
+# inverse_kinematics_batch の結果ステータス
+IK_STATUS_OK = 0                    # 正常に解が得られた
+IK_STATUS_OUT_OF_REACH_LENGTH = 1   # 目標までの距離がリンク長の合計を超えている
+IK_STATUS_OUT_OF_REACH_ANGLE = 2    # 余弦定理の値が [-1, 1] の範囲外
+IK_STATUS_NAN_CLAMPED = 3           # NaN になった角度を 0 に置き換えた
+IK_STATUS_NO_FEASIBLE_BRANCH = 4    # 到達可能だが全ての分岐が角度制限外
+
+# ステータスの名称(ファイル出力用)
+IK_STATUS_NAMES = {
+    IK_STATUS_OK: 'ok',
+    IK_STATUS_OUT_OF_REACH_LENGTH: 'out_of_reach_length',
+    IK_STATUS_OUT_OF_REACH_ANGLE: 'out_of_reach_angle',
+    IK_STATUS_NAN_CLAMPED: 'nan_clamped',
+    IK_STATUS_NO_FEASIBLE_BRANCH: 'no_feasible_branch',
+}
+
+# inverse_kinematics_branches_batch の分岐(第1軸の向き・肘の向き)
+IK_BRANCH_NAMES = ('elbow_up', 'elbow_down',
+                   'flipped_elbow_up', 'flipped_elbow_down')
+
+
+def inverse_kinematics_batch(targets, len_1, len_2):
+    """
+    逆運動学(バッチ版): 複数の目標位置の関節角度を一括計算
+
+    inverse_kinematics と同じ判定・同じ NaN の扱いで処理するが、
+    目標ごとの標準出力への出力は行わず、結果をステータス配列で返す
+
+    パラメータ:
+        targets: 目標位置の配列 [mm] 形状 (N, 3)
+        len_1: 第1リンク長 [mm]
+        len_2: 第2リンク長 [mm]
+
+    戻り値:
+        angles: 関節角度 (theta0, theta1, theta2) [rad] 形状 (N, 3)
+                到達不能な目標は (0, 0, 0)
+        status: 目標ごとのステータス (IK_STATUS_*) 形状 (N,)
+    """
+    targets = np.asarray(targets, dtype=float)
+    if targets.ndim != 2 or targets.shape[1] != 3:
+        raise ValueError(
+            f"targets must have shape (N, 3), got {targets.shape}")
+    px = targets[:, 0]
+    py = targets[:, 1]
+    pz = targets[:, 2]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # XY平面上の距離
+        dxy = np.sqrt(px*px + py*py)
+        # 目標位置までの3D距離
+        pow_reach = px*px + py*py + pz*pz
+        arm_reach = np.sqrt(pow_reach)
+        pow_l1 = len_1*len_1
+        pow_l2 = len_2*len_2
+
+        # ベース回転角（Z軸周り）
+        theta0 = np.arctan2(py, px)
+        # 余弦定理で肘関節の角度を計算
+        cos_theta1 = (pow_l1 + pow_l2 - pow_reach) / (2*len_1*len_2)
+
+        # 範囲チェック(距離の判定を優先する)
+        status = np.full(targets.shape[0], IK_STATUS_OK, dtype=np.int8)
+        out_of_length = arm_reach > (len_1 + len_2)
+        out_of_angle = ~out_of_length & (np.abs(cos_theta1) > 1.0)
+        status[out_of_length] = IK_STATUS_OUT_OF_REACH_LENGTH
+        status[out_of_angle] = IK_STATUS_OUT_OF_REACH_ANGLE
+
+        theta2 = np.pi - np.arccos(cos_theta1)
+
+        # 角度計算(arm_reach == 0 のときは beta = 0)
+        alpha = np.arctan2(pz, dxy)
+        beta = np.arccos(
+            (pow_reach + pow_l1 - pow_l2) / (2*len_1*arm_reach))
+        beta = np.where(arm_reach == 0, 0.0, beta)
+        theta1 = np.pi/2 - (alpha + beta)
+
+    angles = np.stack([theta0, theta1, theta2], axis=1)
+
+    # NaN になった角度は 0 に置き換える
+    nan_mask = np.isnan(angles)
+    angles[nan_mask] = 0.0
+    reachable = status == IK_STATUS_OK
+    status[reachable & nan_mask.any(axis=1)] = IK_STATUS_NAN_CLAMPED
+
+    # 到達不能な目標は (0, 0, 0)
+    angles[~reachable] = 0.0
+    return angles, status
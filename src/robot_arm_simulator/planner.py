@@ -0,0 +1,628 @@
+"""
+ロボットアーム 経路計画
+関節空間(THETA1 - THETA4 の角度制限内)で障害物を避ける経路を求める
+1回だけの問い合わせには RRT-Connect、同じ障害物で繰り返し問い合わせる場合は
+PRM(ロードマップはプロセスプールで並列に作成し、ディスクにキャッシュ)を使う
+"""
+
+import hashlib
+import heapq
+import json
+import os
+import time
+
+import numpy as np
+from robot_arm_simulator.collision import CollisionChecker
+from robot_arm_simulator.trajectory import Trajectory, joint_trajectory
+from robot_arm_simulator.workspace import DEFAULT_CACHE_DIR, robot_parameters
+
+# ロードマップのキャッシュ形式のバージョン(作成方法を変えたら上げる)
+ROADMAP_VERSION = 1
+
+# ワーカープロセスごとの衝突判定の状態
+_worker_state = {}
+
+
+class PlanResult:
+    """
+    経路計画の結果
+
+    属性:
+        waypoints: 経由点の関節角度 [rad] 形状 (M, 4) (失敗した場合は (0, 4))
+                   隣り合う経由点の間は直線補間で衝突しないことを確認済み
+        success: 経路が見つかったか
+        nodes: 探索で作成したノード数(PRM はロードマップのノード数)
+        elapsed: 計画に要した時間 [s]
+    """
+
+    def __init__(self, waypoints, success, nodes, elapsed):
+        """コンストラクタ"""
+        self.waypoints = waypoints
+        self.success = success
+        self.nodes = nodes
+        self.elapsed = elapsed
+
+    @property
+    def length(self):
+        """関節空間での経路長 [rad]"""
+        if len(self.waypoints) < 2:
+            return 0.0
+        return float(np.linalg.norm(np.diff(self.waypoints, axis=0),
+                                    axis=1).sum())
+
+    def trajectory(self, speed=1.0, dt=0.02):
+        """
+        経路を一定の速さで進む軌道に変換
+
+        経由点の間は直線補間(衝突判定と同じ経路)とする。
+        関節の速度・加速度制限を守る場合は trajectory.retime に渡す
+
+        パラメータ:
+            speed: 関節空間での速さ [rad/s]
+            dt: サンプル間隔 [s]
+
+        戻り値:
+            Trajectory (animate_trajectory にそのまま渡せる)
+        """
+        if not self.success:
+            raise ValueError("no path to convert")
+        if len(self.waypoints) == 1:
+            return Trajectory([0.0], self.waypoints)
+        step = np.linalg.norm(np.diff(self.waypoints, axis=0), axis=1)
+        times = np.concatenate([[0.0], np.cumsum(step)]) / speed
+        # 同じ点が続く場合は時刻が増えないので除く
+        keep = np.concatenate([[True], step > 0])
+        return joint_trajectory(self.waypoints[keep], times[keep],
+                                method='linear', dt=dt)
+
+    def __repr__(self):
+        if not self.success:
+            return (f'PlanResult(failed, nodes={self.nodes}, '
+                    f'elapsed={self.elapsed:.3f} s)')
+        return (f'PlanResult(waypoints={len(self.waypoints)}, '
+                f'length={self.length:.3f} rad, nodes={self.nodes}, '
+                f'elapsed={self.elapsed:.3f} s)')
+
+
+def edge_samples(starts, ends, resolution):
+    """
+    辺(関節空間の線分)を等間隔に分割した関節角度
+
+    各辺は端点を含み、隣り合うサンプルの各関節の差が resolution 以下になる
+    最小の数に分割する
+
+    パラメータ:
+        starts, ends: 辺の端点 [rad] 形状 (E, 4)
+        resolution: サンプル間の最大の角度差 [rad]
+
+    戻り値:
+        samples: 関節角度 形状 (S, 4)
+        offsets: 各辺の最初のサンプル番号 形状 (E,)
+        counts: 各辺のサンプル数 形状 (E,)
+    """
+    starts = np.asarray(starts, dtype=float).reshape(-1, 4)
+    ends = np.asarray(ends, dtype=float).reshape(-1, 4)
+    span = np.abs(ends - starts).max(axis=1)
+    counts = np.ceil(span / resolution).astype(np.intp) + 1
+    offsets = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    owner = np.repeat(np.arange(len(counts)), counts)
+    position = np.arange(owner.size) - offsets[owner]
+    fraction = position / np.maximum(counts[owner] - 1, 1)
+    samples = starts[owner] + (ends - starts)[owner] * fraction[:, None]
+    return samples, offsets, counts
+
+
+def edges_free(checker, starts, ends, resolution):
+    """
+    辺ごとに衝突しないかを判定(全ての辺のサンプルをまとめて順運動学で判定)
+
+    パラメータ:
+        checker: CollisionChecker
+        starts, ends: 辺の端点 [rad] 形状 (E, 4)
+        resolution: サンプル間の最大の角度差 [rad]
+
+    戻り値:
+        free: 衝突しないか 形状 (E,)
+    """
+    samples, offsets, _ = edge_samples(starts, ends, resolution)
+    if len(offsets) == 0:
+        return np.zeros(0, dtype=bool)
+    colliding = checker.check(samples).colliding
+    return ~np.logical_or.reduceat(colliding, offsets)
+
+
+def free_fraction(checker, start, end, resolution):
+    """
+    start から end へ直線で進むとき、衝突せずに進める割合
+
+    戻り値:
+        fraction: 0 - 1 (1 なら end まで衝突しない)
+    """
+    samples, _, counts = edge_samples(start, end, resolution)
+    result = checker.check(samples, first_only=True)
+    if not result.collided:
+        return 1.0
+    return max(result.index - 1, 0) / max(counts[0] - 1, 1)
+
+
+def shortcut(checker, waypoints, resolution):
+    """
+    経由点を間引いて経路を短くする
+
+    各経由点から、直線で衝突せずに結べる最も先の経由点へ進む
+    (ある経由点から先の全ての経由点への辺をまとめて判定する)
+
+    パラメータ:
+        checker: CollisionChecker
+        waypoints: 経由点 [rad] 形状 (M, 4)
+        resolution: サンプル間の最大の角度差 [rad]
+
+    戻り値:
+        waypoints: 間引いた経由点 形状 (M', 4)
+    """
+    waypoints = np.asarray(waypoints, dtype=float)
+    kept = [0]
+    current = 0
+    last = len(waypoints) - 1
+    while current < last:
+        candidates = np.arange(current + 2, last + 1)
+        farthest = current + 1
+        if len(candidates):
+            free = edges_free(
+                checker, np.repeat(waypoints[current:current + 1],
+                                   len(candidates), axis=0),
+                waypoints[candidates], resolution)
+            if free.any():
+                farthest = int(candidates[np.flatnonzero(free)[-1]])
+        kept.append(farthest)
+        current = farthest
+    return waypoints[kept]
+
+
+class _Tree:
+    """RRT の木(ノードは容量を倍にしながら配列に追加)"""
+
+    def __init__(self, root):
+        """コンストラクタ"""
+        self.nodes = np.empty((64, 4))
+        self.parents = np.empty(64, dtype=np.intp)
+        self.nodes[0] = root
+        self.parents[0] = -1
+        self.count = 1
+
+    def add(self, node, parent):
+        """ノードを追加して番号を返す"""
+        if self.count == len(self.nodes):
+            self.nodes = np.concatenate(
+                [self.nodes, np.empty_like(self.nodes)])
+            self.parents = np.concatenate(
+                [self.parents, np.empty_like(self.parents)])
+        self.nodes[self.count] = node
+        self.parents[self.count] = parent
+        self.count += 1
+        return self.count - 1
+
+    def nearest(self, point):
+        """point に最も近いノードの番号"""
+        difference = self.nodes[:self.count] - point
+        return int(np.argmin(np.einsum('ij,ij->i', difference, difference)))
+
+    def path(self, index):
+        """根から index までのノード 形状 (K, 4)"""
+        indices = []
+        while index >= 0:
+            indices.append(index)
+            index = self.parents[index]
+        return self.nodes[indices[::-1]]
+
+
+def _validate_endpoint(checker, angles, name):
+    """始点・終点が角度制限内で衝突しないかを確認"""
+    angles = np.asarray(angles, dtype=float)
+    if angles.shape == (3,):
+        angles = np.append(angles, 0.0)
+    if angles.shape != (4,):
+        raise ValueError(f"{name} must have 3 or 4 joint angles, "
+                         f"got shape {angles.shape}")
+    lower, upper = checker.robot.joint_limits()
+    if np.any(angles < lower) or np.any(angles > upper):
+        raise ValueError(f"{name} is outside the joint limits: {angles}")
+    result = checker.check(angles)
+    if result.collided:
+        raise ValueError(f"{name} is in collision: {result.pair}")
+    return angles
+
+
+class RRTConnectPlanner:
+    """
+    RRT-Connect による経路計画(1回だけの問い合わせ向け)
+
+    始点と終点から木を交互に伸ばし、一方の木に追加したノードへ
+    もう一方の木を直線で伸ばして(辺のサンプルをまとめて判定)つなぐ
+
+    パラメータ:
+        checker: CollisionChecker (省略時は床のみの障害物で作成)
+        step: 1回に木を伸ばす最大の距離(関節空間) [rad]
+        resolution: 辺の衝突判定のサンプル間の最大の角度差 [rad]
+        max_iterations: 最大反復回数
+        seed: 乱数のシード
+    """
+
+    def __init__(self, checker=None, step=0.5, resolution=0.02,
+                 max_iterations=5000, seed=None):
+        """コンストラクタ"""
+        self.checker = CollisionChecker() if checker is None else checker
+        self.step = float(step)
+        self.resolution = float(resolution)
+        self.max_iterations = int(max_iterations)
+        self.rng = np.random.default_rng(seed)
+
+    def plan(self, start, goal, smooth=True):
+        """
+        始点から終点までの衝突しない経路を求める
+
+        パラメータ:
+            start, goal: 関節角度 [rad] 形状 (4,) または (3,)
+            smooth: 経由点を間引いて経路を短くするか
+
+        戻り値:
+            PlanResult
+        """
+        begin = time.perf_counter()
+        start = _validate_endpoint(self.checker, start, 'start')
+        goal = _validate_endpoint(self.checker, goal, 'goal')
+        lower, upper = self.checker.robot.joint_limits()
+        trees = [_Tree(start), _Tree(goal)]
+
+        path = None
+        if free_fraction(self.checker, start, goal, self.resolution) == 1.0:
+            path = np.stack([start, goal])
+        for iteration in range(self.max_iterations):
+            if path is not None:
+                break
+            grow, other = trees[iteration % 2], trees[1 - iteration % 2]
+            new = self._extend(grow, self.rng.uniform(lower, upper),
+                               self.step)
+            if new is None:
+                continue
+            reached = self._extend(other, grow.nodes[new], np.inf)
+            if reached is not None and np.array_equal(
+                    other.nodes[reached], grow.nodes[new]):
+                joined = [grow.path(new), other.path(reached)[::-1][1:]]
+                if grow is trees[1]:
+                    joined = [other.path(reached), grow.path(new)[::-1][1:]]
+                path = np.concatenate(joined)
+
+        nodes = trees[0].count + trees[1].count
+        if path is None:
+            return PlanResult(np.zeros((0, 4)), False, nodes,
+                              time.perf_counter() - begin)
+        if smooth:
+            path = shortcut(self.checker, path, self.resolution)
+        return PlanResult(path, True, nodes, time.perf_counter() - begin)
+
+    def _extend(self, tree, target, step):
+        """
+        木の target に最も近いノードから target へ最大 step だけ伸ばす
+
+        途中で衝突する場合は衝突しない所まで伸ばす
+
+        戻り値:
+            index: 追加したノードの番号(伸ばせなかった場合は None)
+        """
+        near = tree.nearest(target)
+        origin = tree.nodes[near]
+        difference = target - origin
+        distance = np.linalg.norm(difference)
+        if distance == 0:
+            return None
+        if distance > step:
+            target = origin + difference * (step / distance)
+        fraction = free_fraction(self.checker, origin, target,
+                                 self.resolution)
+        if fraction == 1.0:
+            return tree.add(target, near)
+        # 衝突しない所まで(サンプル間隔より進める場合のみ)
+        if fraction * min(distance, step) <= self.resolution:
+            return None
+        return tree.add(origin + (target - origin) * fraction, near)
+
+
+class Roadmap:
+    """
+    PRM のロードマップ
+
+    属性:
+        nodes: ノードの関節角度 [rad] 形状 (M, 4)
+        edges: 衝突しない辺のノード番号 形状 (E, 2)
+        costs: 辺の長さ(関節空間) [rad] 形状 (E,)
+    """
+
+    def __init__(self, nodes, edges, costs):
+        """コンストラクタ"""
+        self.nodes = np.asarray(nodes, dtype=float)
+        self.edges = np.asarray(edges, dtype=np.intp).reshape(-1, 2)
+        self.costs = np.asarray(costs, dtype=float)
+
+    def save(self, path):
+        """
+        .npz ファイルに保存
+
+        書き込み途中のファイルを読み込まないよう、一時ファイルに
+        書き込んでから置き換える
+        """
+        temp_path = f'{path}.{os.getpid()}.tmp.npz'
+        np.savez(temp_path, nodes=self.nodes, edges=self.edges,
+                 costs=self.costs)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """save で保存したファイルを読み込む"""
+        with np.load(path) as data:
+            return cls(data['nodes'], data['edges'], data['costs'])
+
+    def __repr__(self):
+        return f'Roadmap(nodes={len(self.nodes)}, edges={len(self.edges)})'
+
+
+def scene_parameters(scene):
+    """
+    障害物の集合を JSON に変換できる形で取得(キャッシュのキーに使う)
+
+    パラメータ:
+        scene: CollisionScene
+
+    戻り値:
+        params: 障害物ごとの種類と形状の辞書のリスト
+    """
+    params = []
+    for obstacle in scene.obstacles:
+        entry = {'kind': obstacle.kind}
+        for key, value in vars(obstacle).items():
+            if key != 'name':
+                entry[key] = np.asarray(value, dtype=float).tolist()
+        params.append(entry)
+    return params
+
+
+def _init_edge_worker(checker, resolution):
+    """辺の判定ワーカープロセスの初期化"""
+    _worker_state.update(checker=checker, resolution=resolution)
+
+
+def _check_edge_chunk(chunk):
+    """ワーカープロセスで辺の一部を判定(戻り値は edges_free と同じ)"""
+    starts, ends = chunk
+    return edges_free(_worker_state['checker'], starts, ends,
+                      _worker_state['resolution'])
+
+
+class PRMPlanner:
+    """
+    PRM (Probabilistic Roadmap) による経路計画(繰り返しの問い合わせ向け)
+
+    衝突しない姿勢をノードとし、近傍 neighbors 個のノードとの辺のうち
+    衝突しないものをロードマップとする。辺の判定はプロセスプールで並列に行い、
+    ロードマップはロボット・障害物・作成条件のハッシュをキーとして
+    ディスクにキャッシュする(障害物が変わるとキーが変わり、作り直される)
+
+    パラメータ:
+        checker: CollisionChecker (省略時は床のみの障害物で作成)
+        nodes: ロードマップのノード数
+        neighbors: 各ノードから辺を張る近傍のノード数
+        resolution: 辺の衝突判定のサンプル間の最大の角度差 [rad]
+        seed: ノードを作る乱数のシード
+    """
+
+    def __init__(self, checker=None, nodes=1000, neighbors=10,
+                 resolution=0.02, seed=0):
+        """コンストラクタ"""
+        self.checker = CollisionChecker() if checker is None else checker
+        self.node_count = int(nodes)
+        self.neighbors = int(neighbors)
+        self.resolution = float(resolution)
+        self.seed = seed
+        self.roadmap = None
+
+    def cache_key(self):
+        """
+        ロードマップのキャッシュのキー
+
+        戻り値:
+            key: 16進文字列
+        """
+        params = robot_parameters(self.checker.robot)
+        params['radii'] = self.checker.radii.tolist()
+        params['self_collision'] = bool(self.checker.self_pairs)
+        params['scene'] = scene_parameters(self.checker.scene)
+        params['roadmap'] = [self.node_count, self.neighbors,
+                             self.resolution, self.seed]
+        params['version'] = ROADMAP_VERSION
+        text = json.dumps(params, sort_keys=True)
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+
+    def build(self, workers=None, chunk_size=2048):
+        """
+        ロードマップを作成
+
+        パラメータ:
+            workers: 辺を判定するプロセス数
+                     (1 で現在のプロセスのみ、None で CPU 数)
+            chunk_size: 1回の依頼で判定する辺の数
+
+        戻り値:
+            Roadmap
+        """
+        nodes = self._sample_nodes()
+        starts, ends = self._candidate_edges(nodes)
+        if workers is None:
+            workers = os.cpu_count() or 1
+        chunks = [(nodes[starts[i:i + chunk_size]],
+                   nodes[ends[i:i + chunk_size]])
+                  for i in range(0, len(starts), chunk_size)]
+        if workers == 1 or len(chunks) <= 1:
+            free = [edges_free(self.checker, a, b, self.resolution)
+                    for a, b in chunks]
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+
+            with ProcessPoolExecutor(
+                    max_workers=workers, initializer=_init_edge_worker,
+                    initargs=(self.checker, self.resolution)) as executor:
+                free = list(executor.map(_check_edge_chunk, chunks))
+        free = np.concatenate(free) if free else np.zeros(0, dtype=bool)
+        edges = np.stack([starts, ends], axis=1)[free]
+        costs = np.linalg.norm(nodes[edges[:, 1]] - nodes[edges[:, 0]],
+                               axis=1)
+        self.roadmap = Roadmap(nodes, edges, costs)
+        return self.roadmap
+
+    def load(self, workers=None, cache_dir=None):
+        """
+        キャッシュからロードマップを読み込む(なければ作成して保存)
+
+        パラメータ:
+            workers: build を参照
+            cache_dir: キャッシュディレクトリ(省略時は DEFAULT_CACHE_DIR)
+
+        戻り値:
+            Roadmap
+        """
+        if cache_dir is None:
+            cache_dir = DEFAULT_CACHE_DIR
+        path = os.path.join(cache_dir, f'roadmap_{self.cache_key()}.npz')
+        if os.path.exists(path):
+            self.roadmap = Roadmap.load(path)
+        else:
+            self.build(workers)
+            os.makedirs(cache_dir, exist_ok=True)
+            self.roadmap.save(path)
+        return self.roadmap
+
+    def _sample_nodes(self):
+        """角度制限内で衝突しない姿勢を node_count 個作成"""
+        rng = np.random.default_rng(self.seed)
+        lower, upper = self.checker.robot.joint_limits()
+        found = []
+        count = 0
+        for _ in range(100):
+            batch = rng.uniform(lower, upper, (2 * self.node_count, 4))
+            batch = batch[~self.checker.check(batch).colliding]
+            found.append(batch[:self.node_count - count])
+            count += len(found[-1])
+            if count == self.node_count:
+                break
+        return np.concatenate(found)
+
+    def _candidate_edges(self, nodes):
+        """各ノードから近傍 neighbors 個への辺(重複なし、番号の小さい方が先)"""
+        neighbors = min(self.neighbors, len(nodes) - 1)
+        if neighbors < 1:
+            empty = np.zeros(0, dtype=np.intp)
+            return empty, empty
+        squared = np.einsum('ij,ij->i', nodes, nodes)
+        pairs = []
+        for start in range(0, len(nodes), 1024):
+            block = nodes[start:start + 1024]
+            distance = squared[start:start + 1024, None] + squared - \
+                2 * block @ nodes.T
+            distance[np.arange(len(block)), start + np.arange(len(block))] = \
+                np.inf
+            nearest = np.argpartition(distance, neighbors - 1,
+                                      axis=1)[:, :neighbors]
+            owner = np.repeat(start + np.arange(len(block)), neighbors)
+            pairs.append(np.stack([owner, nearest.ravel()], axis=1))
+        pairs = np.sort(np.concatenate(pairs), axis=1)
+        pairs = np.unique(pairs, axis=0)
+        return pairs[:, 0], pairs[:, 1]
+
+    def plan(self, start, goal, smooth=True, connect=None):
+        """
+        ロードマップを使って始点から終点までの衝突しない経路を求める
+
+        パラメータ:
+            start, goal: 関節角度 [rad] 形状 (4,) または (3,)
+            smooth: 経由点を間引いて経路を短くするか
+            connect: 始点・終点からつなぐロードマップのノード数
+                     (省略時は neighbors)
+
+        戻り値:
+            PlanResult
+        """
+        begin = time.perf_counter()
+        if self.roadmap is None:
+            self.load()
+        roadmap = self.roadmap
+        start = _validate_endpoint(self.checker, start, 'start')
+        goal = _validate_endpoint(self.checker, goal, 'goal')
+        if connect is None:
+            connect = self.neighbors
+
+        # 始点・終点を番号 M, M + 1 のノードとしてロードマップにつなぐ
+        count = len(roadmap.nodes)
+        nodes = np.concatenate([roadmap.nodes, [start, goal]])
+        edges = [roadmap.edges]
+        for index, point in ((count, start), (count + 1, goal)):
+            distance = np.linalg.norm(roadmap.nodes - point, axis=1)
+            nearest = np.argsort(distance)[:connect]
+            free = edges_free(self.checker,
+                              np.repeat(point[None], len(nearest), axis=0),
+                              roadmap.nodes[nearest], self.resolution)
+            edges.append(np.stack([np.full(int(free.sum()), index),
+                                   nearest[free]], axis=1))
+        if free_fraction(self.checker, start, goal, self.resolution) == 1.0:
+            edges.append(np.array([[count, count + 1]]))
+        edges = np.concatenate(edges).astype(np.intp)
+        costs = np.linalg.norm(nodes[edges[:, 1]] - nodes[edges[:, 0]],
+                               axis=1)
+
+        route = _shortest_path(len(nodes), edges, costs, count, count + 1)
+        if route is None:
+            return PlanResult(np.zeros((0, 4)), False, count,
+                              time.perf_counter() - begin)
+        path = nodes[route]
+        if smooth:
+            path = shortcut(self.checker, path, self.resolution)
+        return PlanResult(path, True, count, time.perf_counter() - begin)
+
+
+def _shortest_path(count, edges, costs, source, target):
+    """
+    ダイクストラ法による最短経路
+
+    戻り値:
+        route: ノード番号のリスト(到達できない場合は None)
+    """
+    # 無向グラフの隣接リスト(CSR 形式)
+    heads = np.concatenate([edges[:, 0], edges[:, 1]])
+    tails = np.concatenate([edges[:, 1], edges[:, 0]])
+    weights = np.concatenate([costs, costs])
+    order = np.argsort(heads, kind='stable')
+    tails = tails[order].tolist()
+    weights = weights[order].tolist()
+    starts = np.searchsorted(heads[order], np.arange(count + 1)).tolist()
+
+    best = [np.inf] * count
+    previous = [-1] * count
+    best[source] = 0.0
+    queue = [(0.0, source)]
+    while queue:
+        cost, node = heapq.heappop(queue)
+        if node == target:
+            break
+        if cost > best[node]:
+            continue
+        for k in range(starts[node], starts[node + 1]):
+            other = tails[k]
+            candidate = cost + weights[k]
+            if candidate < best[other]:
+                best[other] = candidate
+                previous[other] = node
+                heapq.heappush(queue, (candidate, other))
+    if best[target] == np.inf:
+        return None
+    route = [target]
+    while route[-1] != source:
+        route.append(previous[route[-1]])
+    return route[::-1]
@@ -0,0 +1,41 @@
+"""
+ロボットアーム 描画の初期設定
+matplotlib は読み込みに時間がかかるため、描画機能を初めて使うときに
+読み込んでフォントを設定する
+"""
+
+from robot_arm_simulator.config import RobotConfig
+
+_font_configured = False
+
+
+def setup_font():
+    """
+    RobotConfig.FONT_FAMILY を matplotlib のフォントに設定(初回のみ)
+
+    フォントがインストールされていない環境(Linux など)では
+    警告が出ないよう既定のフォントのままにする
+    """
+    global _font_configured
+    if _font_configured:
+        return
+    import matplotlib
+    from matplotlib import font_manager
+
+    installed = {font.name for font in font_manager.fontManager.ttflist}
+    if RobotConfig.FONT_FAMILY in installed:
+        matplotlib.rcParams['font.family'] = RobotConfig.FONT_FAMILY
+    _font_configured = True
+
+
+def pyplot():
+    """
+    フォントを設定した matplotlib.pyplot を取得
+
+    戻り値:
+        plt: matplotlib.pyplot モジュール
+    """
+    import matplotlib.pyplot as plt
+
+    setup_font()
+    return plt
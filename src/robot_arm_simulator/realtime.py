@@ -0,0 +1,190 @@
+"""
+ロボットアーム 制御周期用の運動学
+ThreeAxisKinematics.forward_kinematics は呼び出しごとに numpy 配列と
+リストを作成するため、1 kHz 程度の制御周期ではメモリ確保と GC が
+遅延のばらつきの原因になる。
+ここでは結果を事前に確保したバッファ(RealtimeState)へ書き込み、
+準備後は1周期あたりのメモリ確保を行わない
+(三角関数は math モジュールでスカラーのまま計算する)
+"""
+
+import math
+
+import numpy as np
+from robot_arm_simulator.kinematics import ThreeAxisKinematics
+
+# RealtimeState.pose の要素
+POSE_FIELDS = ('x', 'y', 'z', 'yaw', 'pitch')
+
+
+class RealtimeState:
+    """
+    制御周期ごとに上書きする状態のバッファ
+
+    RealtimeKinematics.forward / step がこのバッファへ書き込む。
+    配列は作成時に一度だけ確保し、以降は中身のみ更新する
+
+    属性:
+        angles: 関節角度 (theta1, ..., theta4) [rad] 形状 (4,)
+                (角度制限でクリップした値)
+        positions: リンクの端点位置 [mm] 形状 (5, 3)
+                   (forward_kinematics の p0 〜 p4)
+        pose: 手先の位置と向き (x, y, z [mm], yaw, pitch [rad]) 形状 (5,)
+              (yaw は theta1、pitch は Z軸からの第3リンクの傾き
+              theta2 + theta3 + theta4)
+    """
+
+    __slots__ = ('angles', 'positions', 'pose',
+                 '_angles', '_positions', '_pose')
+
+    def __init__(self):
+        """コンストラクタ"""
+        self.angles = np.zeros(4)
+        self.positions = np.zeros((5, 3))
+        self.pose = np.zeros(len(POSE_FIELDS))
+        # 要素ごとの書き込みは numpy の添字より memoryview の方が速い
+        self._angles = memoryview(self.angles)
+        self._positions = memoryview(self.positions).cast('B').cast('d')
+        self._pose = memoryview(self.pose)
+
+    def __repr__(self):
+        x, y, z, yaw, pitch = self._pose
+        return (f'RealtimeState(end_effector=({x:.3f}, {y:.3f}, {z:.3f}), '
+                f'yaw={math.degrees(yaw):.1f}°, '
+                f'pitch={math.degrees(pitch):.1f}°)')
+
+
+class RealtimeKinematics:
+    """
+    制御周期用の順運動学と関節の速度指令による更新
+
+    ThreeAxisKinematics.forward_kinematics と同じ角度制限・同じ計算順序の
+    ため、positions はその戻り値と一致する
+
+    パラメータ:
+        robot: ThreeAxisKinematics インスタンス
+               (リンク長・角度制限を使用、省略時は設定ファイルから取得)
+    """
+
+    __slots__ = ('link1', 'link2', 'link3', 'lower', 'upper')
+
+    def __init__(self, robot=None):
+        """コンストラクタ"""
+        if robot is None:
+            robot = ThreeAxisKinematics()
+        self.link1 = float(robot.link1)
+        self.link2 = float(robot.link2)
+        self.link3 = float(robot.link3)
+        lower, upper = robot.joint_limits()
+        self.lower = tuple(float(value) for value in lower)
+        self.upper = tuple(float(value) for value in upper)
+
+    def forward(self, theta1, theta2, theta3, theta4=0.0, out=None):
+        """
+        順運動学を out へ書き込む
+
+        パラメータ:
+            theta1 - theta4: 関節角度 [rad] (角度制限でクリップする)
+            out: 書き込み先の RealtimeState
+                 (省略時は新規作成、制御周期では事前に作成して渡す)
+
+        戻り値:
+            out
+        """
+        if out is None:
+            out = RealtimeState()
+        lower, upper = self.lower, self.upper
+        # 組み込みの min / max は呼び出しごとに引数のタプルを確保するため
+        # 条件式でクリップする
+        theta1 = lower[0] if theta1 < lower[0] else \
+            upper[0] if theta1 > upper[0] else theta1
+        theta2 = lower[1] if theta2 < lower[1] else \
+            upper[1] if theta2 > upper[1] else theta2
+        theta3 = lower[2] if theta3 < lower[2] else \
+            upper[2] if theta3 > upper[2] else theta3
+        theta4 = lower[3] if theta4 < lower[3] else \
+            upper[3] if theta4 > upper[3] else theta4
+        angles = out._angles
+        angles[0] = theta1
+        angles[1] = theta2
+        angles[2] = theta3
+        angles[3] = theta4
+        self._write(out, theta1, theta2, theta3, theta4)
+        return out
+
+    def step(self, state, velocities, dt):
+        """
+        関節の角速度の指令で1周期 dt だけ動かし、順運動学を書き込む
+
+        パラメータ:
+            state: 現在の状態(この RealtimeState を上書きする)
+            velocities: 関節の角速度 [rad/s] (4要素のシーケンス)
+            dt: 周期 [s]
+
+        戻り値:
+            state
+        """
+        lower, upper = self.lower, self.upper
+        angles = state._angles
+        theta1 = angles[0] + velocities[0] * dt
+        theta2 = angles[1] + velocities[1] * dt
+        theta3 = angles[2] + velocities[2] * dt
+        theta4 = angles[3] + velocities[3] * dt
+        theta1 = lower[0] if theta1 < lower[0] else \
+            upper[0] if theta1 > upper[0] else theta1
+        theta2 = lower[1] if theta2 < lower[1] else \
+            upper[1] if theta2 > upper[1] else theta2
+        theta3 = lower[2] if theta3 < lower[2] else \
+            upper[2] if theta3 > upper[2] else theta3
+        theta4 = lower[3] if theta4 < lower[3] else \
+            upper[3] if theta4 > upper[3] else theta4
+        angles[0] = theta1
+        angles[1] = theta2
+        angles[2] = theta3
+        angles[3] = theta4
+        self._write(state, theta1, theta2, theta3, theta4)
+        return state
+
+    def _write(self, state, theta1, theta2, theta3, theta4):
+        """クリップ済みの角度の順運動学を state のバッファへ書き込む"""
+        cos_theta1 = math.cos(theta1)
+        sin_theta1 = math.sin(theta1)
+        total_angle2 = theta2 + theta3
+        total_angle3 = total_angle2 + theta4
+
+        # p0, p1 は常に原点(作成時の 0 のまま)
+        positions = state._positions
+        r1 = self.link1 * math.sin(theta2)
+        x1 = r1 * cos_theta1
+        y1 = r1 * sin_theta1
+        z1 = self.link1 * math.cos(theta2)
+        positions[6] = x1
+        positions[7] = y1
+        positions[8] = z1
+
+        r2 = self.link2 * math.sin(total_angle2)
+        x2 = x1 + r2 * cos_theta1
+        y2 = y1 + r2 * sin_theta1
+        z2 = z1 + self.link2 * math.cos(total_angle2)
+        positions[9] = x2
+        positions[10] = y2
+        positions[11] = z2
+
+        r3 = self.link3 * math.sin(total_angle3)
+        x3 = x2 + r3 * cos_theta1
+        y3 = y2 + r3 * sin_theta1
+        z3 = z2 + self.link3 * math.cos(total_angle3)
+        positions[12] = x3
+        positions[13] = y3
+        positions[14] = z3
+
+        pose = state._pose
+        pose[0] = x3
+        pose[1] = y3
+        pose[2] = z3
+        pose[3] = theta1
+        pose[4] = total_angle3
+
+    def __repr__(self):
+        return (f'RealtimeKinematics(links=({self.link1:g}, {self.link2:g}, '
+                f'{self.link3:g}))')
@@ -0,0 +1,177 @@
+"""
+ロボットアーム 操作の記録と再生
+interactive_control でスライダー・テキストボックスから変更した関節角度を
+時刻とともに事前に確保したリングバッファへ記録し、別スレッドで
+まとめて軌道のバイナリファイル(trajectory_file)へ書き出す。
+記録したファイルは load_session で一定間隔の Trajectory に変換し、
+animate_trajectory や export_trajectory で再生できる
+"""
+
+import threading
+import time
+
+import numpy as np
+from robot_arm_simulator.trajectory_file import (
+    TrajectoryFile, TrajectoryWriter)
+
+
+class SessionRecorder:
+    """
+    関節角度の変更を記録するリングバッファ
+
+    record() は確保済みの配列へ書き込むのみで、ファイルへの書き込みは
+    バッファに flush_frames 個溜まったとき、または flush_interval ごとに
+    別スレッドでまとめて行う。書き出しが追いつかずバッファが一杯の場合は
+    UI を止めないよう新しい記録を捨て、dropped に数える
+
+    パラメータ:
+        path: 保存先パス(軌道のバイナリファイル)
+        joints: 関節数
+        robot: リンク長・角度制限をヘッダーに記録するロボット(省略可)
+        capacity: リングバッファのフレーム数
+        flush_frames: 書き出しを始めるフレーム数
+        flush_interval: 溜まったフレーム数によらず書き出す間隔 [s]
+        compression: 圧縮方式 (trajectory_file.COMPRESSIONS のいずれか)
+        clock: 時刻を返す関数 [s]
+
+    属性:
+        frames: 記録したフレーム数
+        flushed: ファイルへ書き出したフレーム数
+        dropped: バッファが一杯で捨てたフレーム数
+    """
+
+    def __init__(self, path, joints=4, robot=None, capacity=65536,
+                 flush_frames=8192, flush_interval=1.0, compression=None,
+                 clock=time.perf_counter):
+        """コンストラクタ"""
+        if not 0 < flush_frames <= capacity:
+            raise ValueError(
+                f"flush_frames must be in (0, capacity], got {flush_frames}")
+        self.path = path
+        self.joints = joints
+        self.capacity = capacity
+        self.flush_frames = flush_frames
+        self.flush_interval = flush_interval
+        self.clock = clock
+        self.frames = 0
+        self.flushed = 0
+        self.dropped = 0
+
+        self._times = np.zeros(capacity)
+        self._angles = np.zeros((capacity, joints))
+        # 要素ごとの書き込みは numpy の添字より memoryview の方が速い
+        self._time_view = memoryview(self._times)
+        self._angle_view = memoryview(self._angles).cast('B').cast('d')
+        self._writer = TrajectoryWriter(
+            path, robot=robot, joints=joints, dtype='float64',
+            compression=compression, chunk_frames=flush_frames,
+            metadata={'recorded_at': time.time()})
+        self._start = clock()
+        self._wakeup = threading.Event()
+        self._closing = False
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def record(self, angles):
+        """
+        関節角度を現在の時刻で記録
+
+        パラメータ:
+            angles: 関節角度 [rad] (joints 要素のシーケンス)
+
+        戻り値:
+            recorded: 記録したか(バッファが一杯・終了後は False)
+        """
+        frames = self.frames
+        if self._closing or frames - self.flushed >= self.capacity:
+            self.dropped += 1
+            return False
+        slot = frames % self.capacity
+        self._time_view[slot] = self.clock() - self._start
+        view = self._angle_view
+        base = slot * self.joints
+        for index in range(self.joints):
+            view[base + index] = angles[index]
+        # 配列へ書き込んでから数を増やす(書き出し側は frames までを読む)
+        self.frames = frames + 1
+        if frames + 1 - self.flushed == self.flush_frames:
+            self._wakeup.set()
+        return True
+
+    def _run(self):
+        """書き出しスレッド"""
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            closing = self._closing
+            try:
+                self._flush()
+            except Exception as e:
+                self._error = e
+                return
+            if closing:
+                return
+
+    def _flush(self):
+        """記録済みで未書き出しのフレームをファイルへ書き出す"""
+        frames = self.frames
+        start = self.flushed
+        while start < frames:
+            slot = start % self.capacity
+            stop = min(frames, start + self.capacity - slot)
+            count = stop - start
+            self._writer.write(self._times[slot:slot + count],
+                               self._angles[slot:slot + count])
+            start = stop
+            # 書き出したスロットを record() で再利用できるようにする
+            self.flushed = start
+        self._writer.flush()
+
+    def close(self):
+        """残りのフレームを書き出してファイルを閉じる"""
+        if self._thread is None:
+            return
+        self._closing = True
+        self._wakeup.set()
+        self._thread.join()
+        self._thread = None
+        self._writer.close()
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __repr__(self):
+        return (f'SessionRecorder(path={self.path!r}, frames={self.frames}, '
+                f'flushed={self.flushed}, dropped={self.dropped})')
+
+
+def load_session(path, interval=50):
+    """
+    記録したファイルを一定間隔の軌道に変換
+
+    記録はスライダーを動かしたときのみのため、各時刻では直前に記録した
+    関節角度を保つ(操作していない間は静止)
+
+    パラメータ:
+        path: 記録したファイルのパス
+        interval: サンプル間隔 [ms] (animate_trajectory の interval と
+                  同じ値にすると操作時と同じ速さで再生する)
+
+    戻り値:
+        trajectory: Trajectory
+    """
+    from robot_arm_simulator.trajectory import Trajectory, sample_times
+
+    with TrajectoryFile(path) as recording:
+        times, angles = recording.read()
+    if len(times) == 0:
+        raise ValueError(f"No frames recorded in {path}")
+    samples = sample_times(times[0], times[-1], interval / 1000.0)
+    index = np.searchsorted(times, samples, side='right') - 1
+    return Trajectory(samples - times[0], angles[index])
@@ -2,21 +2,27 @@
 ロボットアーム シミュレータ
 """
 
+import os
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation
 from robot_arm_simulator.config import RobotConfig
+from robot_arm_simulator.kinematics import (  # noqa: F401
+    IK_STATUS_OK, IK_STATUS_OUT_OF_REACH_LENGTH, IK_STATUS_OUT_OF_REACH_ANGLE,
+    IK_STATUS_NAN_CLAMPED, ThreeAxisKinematics, inverse_kinematics,
+    inverse_kinematics_batch)
+from robot_arm_simulator.export import (
+    SUPPORTED_FORMATS, export_trajectory, split_angles)
+from robot_arm_simulator.trajectory_file import open_trajectory
+from robot_arm_simulator.plot_setup import pyplot
+from robot_arm_simulator.serial_chain import SerialChain
 
-# 日本語フォントの設定
-# plt.rcParams['font.family'] = 'MS Gothic'  # Windowsの場合
-# plt.rcParams['font.family'] = 'Yu Gothic'  # 游ゴシック
-plt.rcParams['font.family'] = 'Meiryo'     # メイリオ
-# plt.rcParams['font.family'] = 'DejaVu Sans'  # 他のOSの場合
+# matplotlib と日本語フォントの設定は描画機能を初めて使うときに読み込む
+# (フォントは RobotConfig.FONT_FAMILY で設定)
 
 
-class ThreeAxisRobot:
+class ThreeAxisRobot(ThreeAxisKinematics):
     """
     3軸ロボットアームクラス
+    (運動学は ThreeAxisKinematics、このクラスは描画機能を追加する)
 
     パラメータ:
         link1_length: 第1リンク長 [mm] (省略時は設定ファイルから取得)
@@ -24,76 +30,6 @@ class ThreeAxisRobot:
         link3_length: 第3リンク長 [mm] (省略時は設定ファイルから取得)
     """
 
-    def __init__(self, link1_length=None, link2_length=None, link3_length=None):
-        """コンストラクタ"""
-        # 設定ファイルから値を取得(引数が指定されていない場合)
-        if link1_length is None:
-            link1_length = RobotConfig.LINK1_LENGTH
-        if link2_length is None:
-            link2_length = RobotConfig.LINK2_LENGTH
-        if link3_length is None:
-            link3_length = RobotConfig.LINK3_LENGTH
-
-        self.link1 = link1_length
-        self.link2 = link2_length
-        self.link3 = link3_length
-
-        # 角度制限を設定ファイルから取得 [rad]
-        self.theta1_min, self.theta1_max = RobotConfig.get_theta1_range_rad()
-        self.theta2_min, self.theta2_max = RobotConfig.get_theta2_range_rad()
-        self.theta3_min, self.theta3_max = RobotConfig.get_theta3_range_rad()
-        self.theta4_min, self.theta4_max = RobotConfig.get_theta4_range_rad()
-
-    def forward_kinematics(self, theta1, theta2, theta3, theta4=0):
-        """
-        順運動学: 関節角度から各リンクの端点位置を計算
-
-        パラメータ:
-            theta1: 根元回転角度 [rad] (Z軸周り)
-            theta2: 根元モーター角度 [rad] (Y軸周り)
-            theta3: 関節モーター角度 [rad] (Y軸周り)
-            theta4: Link3の角度 [rad] (Y軸周り)
-
-        戻り値:
-            positions: リンクの端点位置のリスト [(x, y, z), ...]
-        """
-        # 角度制限のチェック
-        theta1 = np.clip(theta1, self.theta1_min, self.theta1_max)
-        theta2 = np.clip(theta2, self.theta2_min, self.theta2_max)
-        theta3 = np.clip(theta3, self.theta3_min, self.theta3_max)
-        theta4 = np.clip(theta4, self.theta4_min, self.theta4_max)
-
-        # 基点(原点)
-        p0 = np.array([0, 0, 0])
-
-        # 第1関節(Z軸回転のみ、高さ方向には動かない)
-        # この時点では回転のみで、リンクはまだ伸びていない
-        p1 = np.array([0, 0, 0])
-
-        # 第2関節(Z軸回転 + Y軸回転後のリンク1端点)
-        # Z軸回転とY軸回転の組み合わせ
-        x1 = self.link1 * np.sin(theta2) * np.cos(theta1)
-        y1 = self.link1 * np.sin(theta2) * np.sin(theta1)
-        z1 = self.link1 * np.cos(theta2)
-        p2 = np.array([x1, y1, z1])
-
-        # 第3関節(リンク2端点)
-        # theta2 + theta3 の合成角度でリンク2が伸びる
-        total_angle2 = theta2 + theta3
-        x2 = x1 + self.link2 * np.sin(total_angle2) * np.cos(theta1)
-        y2 = y1 + self.link2 * np.sin(total_angle2) * np.sin(theta1)
-        z2 = z1 + self.link2 * np.cos(total_angle2)
-        p3 = np.array([x2, y2, z2])
-
-        # 手先(リンク3端点) - theta4で独立して動く
-        total_angle3 = theta2 + theta3 + theta4
-        x3 = x2 + self.link3 * np.sin(total_angle3) * np.cos(theta1)
-        y3 = y2 + self.link3 * np.sin(total_angle3) * np.sin(theta1)
-        z3 = z2 + self.link3 * np.cos(total_angle3)
-        p4 = np.array([x3, y3, z3])
-
-        return [p0, p1, p2, p3, p4]
-
     def plot_robot(self, theta1, theta2, theta3, theta4=0, ax=None):
         """
         ロボットアームを3D描画
@@ -109,10 +45,37 @@ class ThreeAxisRobot:
             ax: 3D軸オブジェクト
         """
         if ax is None:
+            plt = pyplot()
             fig = plt.figure(figsize=(10, 10))
             fig.canvas.manager.set_window_title('Robot Arm Simulator')
             ax = fig.add_subplot(111, projection='3d')
 
+        self.create_plot_artists(ax, theta1, theta2, theta3, theta4)
+
+        return ax
+
+    def create_plot_artists(self, ax, theta1, theta2, theta3, theta4=0):
+        """
+        ロボットアームの描画要素を作成
+
+        plot_robot と同じ描画要素を作成して返す。
+        アニメーションではこの描画要素を使い回し、
+        update_plot_artists でデータとタイトルのみを更新する
+
+        パラメータ:
+            ax: matplotlib 3D軸
+            theta1: 根元回転角度 [rad]
+            theta2: 根元モーター角度 [rad]
+            theta3: 関節モーター角度 [rad]
+            theta4: Link3の角度 [rad]
+
+        戻り値:
+            artists: 描画要素の辞書
+                     'links': リンクの Line3D のリスト
+                     'base': 基点の scatter
+                     'end_effector': 手先の scatter
+                     'title': タイトルの Text
+        """
         # 順運動学で位置を計算
         positions = self.forward_kinematics(theta1, theta2, theta3, theta4)
 
@@ -125,6 +88,7 @@ class ThreeAxisRobot:
                        'Link 3 [len:' + str(RobotConfig.LINK3_LENGTH) + ' mm]']
 
         # リンクを描画
+        links = []
         for i in range(len(positions) - 1):
             if i == 0:
                 # 基点から第1関節(実際は同じ位置)
@@ -134,18 +98,19 @@ class ThreeAxisRobot:
             zs = [positions[i][2], positions[i+1][2]]
             color = link_colors[i-1] if i-1 < len(link_colors) else 'blue'
             label = link_labels[i-1] if i-1 < len(link_labels) else None
-            ax.plot(xs, ys, zs, '-', color=color, linewidth=3,
-                    marker='o', markersize=8, label=label)
+            line, = ax.plot(xs, ys, zs, '-', color=color, linewidth=3,
+                            marker='o', markersize=8, label=label)
+            links.append(line)
 
         # 基点を描画
-        ax.scatter([0], [0], [0], color=RobotConfig.BASE_COLOR,
-                   s=100, label='Base')
+        base = ax.scatter([0], [0], [0], color=RobotConfig.BASE_COLOR,
+                          s=100, label='Base')
 
         # 手先位置を描画
         end_pos = positions[-1]
-        ax.scatter([end_pos[0]], [end_pos[1]], [end_pos[2]],
-                   color=RobotConfig.END_EFFECTOR_COLOR, s=100,
-                   label='End Effector')
+        end_effector = ax.scatter([end_pos[0]], [end_pos[1]], [end_pos[2]],
+                                  color=RobotConfig.END_EFFECTOR_COLOR, s=100,
+                                  label='End Effector')
 
         # 軸の設定
         max_reach = self.link1 + self.link2 + self.link3
@@ -156,16 +121,326 @@ class ThreeAxisRobot:
         ax.set_xlabel('X [mm]')
         ax.set_ylabel('Y [mm]')
         ax.set_zlabel('Z [mm]')
-        ax.set_title(
+        title = ax.set_title(
+            self._format_title(theta1, theta2, theta3, theta4, end_pos))
+        ax.legend(loc='upper left', bbox_to_anchor=(1.15, 1), borderaxespad=0)
+
+        return {'links': links, 'base': base,
+                'end_effector': end_effector, 'title': title}
+
+    def update_plot_artists(self, artists, theta1, theta2, theta3, theta4=0):
+        """
+        create_plot_artists で作成した描画要素のデータのみを更新
+
+        パラメータ:
+            artists: create_plot_artists の戻り値
+            theta1: 根元回転角度 [rad]
+            theta2: 根元モーター角度 [rad]
+            theta3: 関節モーター角度 [rad]
+            theta4: Link3の角度 [rad]
+
+        戻り値:
+            updated: 更新した描画要素のタプル(blit 用)
+        """
+        positions = self.forward_kinematics(theta1, theta2, theta3, theta4)
+
+        # リンクの端点を更新(p1 -> p2, p2 -> p3, p3 -> p4)
+        for i, line in enumerate(artists['links'], start=1):
+            line.set_data_3d([positions[i][0], positions[i+1][0]],
+                             [positions[i][1], positions[i+1][1]],
+                             [positions[i][2], positions[i+1][2]])
+
+        # 手先位置を更新
+        end_pos = positions[-1]
+        end_effector = artists['end_effector']
+        _set_scatter_position(end_effector, end_pos)
+
+        artists['title'].set_text(
+            self._format_title(theta1, theta2, theta3, theta4, end_pos))
+
+        return (*artists['links'], artists['base'], end_effector,
+                artists['title'])
+
+    def joint_sliders(self):
+        """
+        interactive_control のスライダーの設定
+
+        戻り値:
+            [(ラベル, 最小角度 [deg], 最大角度 [deg]), ...] (関節ごと)
+        """
+        return [('Base 回転', RobotConfig.THETA1_MIN_DEG,
+                 RobotConfig.THETA1_MAX_DEG),
+                ('Base', RobotConfig.THETA2_MIN_DEG,
+                 RobotConfig.THETA2_MAX_DEG),
+                ('リンク_1', RobotConfig.THETA3_MIN_DEG,
+                 RobotConfig.THETA3_MAX_DEG),
+                ('リンク_2', RobotConfig.THETA4_MIN_DEG,
+                 RobotConfig.THETA4_MAX_DEG)]
+
+    @staticmethod
+    def _format_title(theta1, theta2, theta3, theta4, end_pos):
+        """描画タイトルの文字列を作成"""
+        return (
             f'Robot Arm\n' +
             f'θ1={np.degrees(theta1):.1f}°, θ2={np.degrees(theta2):.1f}°, ' +
             f'θ3={np.degrees(theta3):.1f}°, θ4={np.degrees(theta4):.1f}°\n' +
             f'End Effector: ' +
             f'({end_pos[0]:.3f}, {end_pos[1]:.3f}, {end_pos[2]:.3f})')
-        ax.legend(loc='upper left', bbox_to_anchor=(1.15, 1), borderaxespad=0)
+
+
+class SerialChainRobot(SerialChain):
+    """
+    N 軸のシリアルリンク機構クラス
+    (運動学は SerialChain、このクラスは描画機能を追加する)
+
+    ThreeAxisRobot と同じ描画関数を持つため、RobotSimulator と
+    export_trajectory でそのまま使用できる。
+    角度は関節数分を可変長引数で渡す(不足分は 0、超過分は無視)
+
+    パラメータ:
+        SerialChain と同じ
+    """
+
+    def _angles(self, angles):
+        """角度を関節数分に揃える"""
+        angles = list(angles[:self.dof])
+        return angles + [0.0] * (self.dof - len(angles))
+
+    def _segments(self):
+        """
+        リンクとして描画する関節座標系の原点の組 (i, i + 1) の i のリスト
+        (原点が一致する組を除く、直動関節は常に含める)
+        """
+        offsets = [*self._fixed[1:], self._fixed_tool]
+        return [i for i in range(self.dof)
+                if not self._revolute[i]
+                or np.linalg.norm(offsets[i][:3, 3]) > 0]
+
+    def plot_robot(self, *angles, ax=None):
+        """
+        機構を3D描画
+
+        パラメータ:
+            angles: 各関節の角度 [rad] (直動関節は位置 [mm])
+            ax: matplotlib 3D軸(省略時は新規作成)
+
+        戻り値:
+            ax: 3D軸オブジェクト
+        """
+        if ax is None:
+            plt = pyplot()
+            fig = plt.figure(figsize=(10, 10))
+            fig.canvas.manager.set_window_title('Robot Arm Simulator')
+            ax = fig.add_subplot(111, projection='3d')
+
+        self.create_plot_artists(ax, *angles)
 
         return ax
 
+    def create_plot_artists(self, ax, *angles):
+        """
+        機構の描画要素を作成
+
+        ThreeAxisRobot.create_plot_artists と同じ形式の描画要素を返す。
+        リンクは関節座標系の原点(と手先)のうち、離れている組を結ぶ
+
+        パラメータ:
+            ax: matplotlib 3D軸
+            angles: 各関節の角度 [rad] (直動関節は位置 [mm])
+
+        戻り値:
+            artists: 描画要素の辞書('links', 'base', 'end_effector',
+                     'title')
+        """
+        angles = self._angles(angles)
+        positions = self.forward_kinematics(*angles)
+
+        link_colors = [RobotConfig.LINK1_COLOR,
+                       RobotConfig.LINK2_COLOR,
+                       RobotConfig.LINK3_COLOR]
+        links = []
+        segments = self._segments()
+        for k, i in enumerate(segments):
+            start, end = positions[i], positions[i + 1]
+            color = link_colors[k] if k < len(link_colors) else f'C{k}'
+            line, = ax.plot([start[0], end[0]], [start[1], end[1]],
+                            [start[2], end[2]], '-', color=color,
+                            linewidth=3, marker='o', markersize=8,
+                            label=f'Link {k + 1}')
+            links.append(line)
+
+        origin = positions[0]
+        base = ax.scatter([origin[0]], [origin[1]], [origin[2]],
+                          color=RobotConfig.BASE_COLOR, s=100, label='Base')
+        end_pos = positions[-1]
+        end_effector = ax.scatter([end_pos[0]], [end_pos[1]], [end_pos[2]],
+                                  color=RobotConfig.END_EFFECTOR_COLOR, s=100,
+                                  label='End Effector')
+
+        max_reach = self.max_reach()
+        ax.set_xlim([-max_reach, max_reach])
+        ax.set_ylim([-max_reach, max_reach])
+        ax.set_zlim([0, max_reach])
+
+        ax.set_xlabel('X [mm]')
+        ax.set_ylabel('Y [mm]')
+        ax.set_zlabel('Z [mm]')
+        title = ax.set_title(self._format_title(angles, end_pos))
+        ax.legend(loc='upper left', bbox_to_anchor=(1.15, 1), borderaxespad=0)
+
+        return {'links': links, 'base': base, 'segments': segments,
+                'end_effector': end_effector, 'title': title}
+
+    def update_plot_artists(self, artists, *angles):
+        """
+        create_plot_artists で作成した描画要素のデータのみを更新
+
+        パラメータ:
+            artists: create_plot_artists の戻り値
+            angles: 各関節の角度 [rad] (直動関節は位置 [mm])
+
+        戻り値:
+            updated: 更新した描画要素のタプル(blit 用)
+        """
+        angles = self._angles(angles)
+        positions = self.forward_kinematics(*angles)
+
+        for i, line in zip(artists['segments'], artists['links']):
+            line.set_data_3d([positions[i][0], positions[i + 1][0]],
+                             [positions[i][1], positions[i + 1][1]],
+                             [positions[i][2], positions[i + 1][2]])
+
+        end_pos = positions[-1]
+        end_effector = artists['end_effector']
+        _set_scatter_position(end_effector, end_pos)
+
+        artists['title'].set_text(self._format_title(angles, end_pos))
+
+        return (*artists['links'], artists['base'], end_effector,
+                artists['title'])
+
+    def joint_sliders(self):
+        """
+        interactive_control のスライダーの設定
+
+        戻り値:
+            [(関節名, 最小値, 最大値), ...] (回転関節は [deg]、
+            直動関節は [mm])
+        """
+        sliders = []
+        for joint in self.joints:
+            lower, upper = joint.lower, joint.upper
+            if joint.joint_type == 'revolute':
+                lower, upper = np.degrees(lower), np.degrees(upper)
+            sliders.append((joint.name, lower, upper))
+        return sliders
+
+    def _format_title(self, angles, end_pos):
+        """描画タイトルの文字列を作成(4関節ごとに改行)"""
+        values = []
+        for i, (joint, angle) in enumerate(zip(self.joints, angles)):
+            if joint.joint_type == 'revolute':
+                values.append(f'{joint.name}={np.degrees(angle):.1f}°')
+            else:
+                values.append(f'{joint.name}={angle:.1f} mm')
+        lines = [', '.join(values[i:i + 4])
+                 for i in range(0, len(values), 4)]
+        return (f'{self.name}\n' + '\n'.join(lines) + '\n' +
+                'End Effector: ' +
+                f'({end_pos[0]:.3f}, {end_pos[1]:.3f}, {end_pos[2]:.3f})')
+
+
+def _set_scatter_position(scatter, position):
+    """
+    1点の 3D scatter の位置を更新(公開 API のみを使用)
+
+    パラメータ:
+        scatter: ax.scatter で作成した Path3DCollection
+        position: 位置 (x, y, z)
+    """
+    scatter.set_offsets([(position[0], position[1])])
+    scatter.set_3d_properties([position[2]], 'z')
+
+
+# Figure 全体の blit で上書きする FuncAnimation の非公開のメソッド
+# (動作を確認した matplotlib の版以降で、これらがある場合のみ使用する)
+_BLIT_HOOKS = ('_blit_draw', '_blit_clear')
+_BLIT_MIN_VERSION = (3, 5)
+
+_figure_blit_animation_class = None
+
+
+def _blit_view(ax):
+    """背景を保存し直す必要があるかを判定する表示状態(公開 API のみを使用)"""
+    return (ax.get_xlim(), ax.get_ylim(), ax.get_zlim(),
+            ax.elev, ax.azim, getattr(ax, 'roll', None),
+            tuple(ax.figure.bbox.bounds))
+
+
+def _figure_blit_animation():
+    """
+    Figure 全体を blit する FuncAnimation のクラスを取得
+
+    標準の FuncAnimation は Axes の範囲のみを blit するため、
+    Axes の外側にあるタイトルが更新されない。
+    背景の保存と転送を Figure の範囲で行うことでタイトルも更新する
+    (matplotlib を遅延読み込みするため、初回の呼び出し時にクラスを定義する)
+
+    matplotlib の非公開のメソッド (_BLIT_HOOKS) を上書きするのはこの関数内
+    のみとし、背景は独自の辞書に保存する。matplotlib の版が
+    _BLIT_MIN_VERSION より古い場合やメソッドがない場合は None を返す
+    (呼び出し側は blit を使わずに描画する)
+
+    戻り値:
+        FuncAnimation のサブクラス(使用できない場合は None)
+    """
+    global _figure_blit_animation_class
+    if _figure_blit_animation_class is not None:
+        return _figure_blit_animation_class
+    import matplotlib
+    from matplotlib.animation import FuncAnimation
+
+    version = tuple(int(part) for part in
+                    matplotlib.__version__.split('.')[:2] if part.isdigit())
+    if version < _BLIT_MIN_VERSION or \
+            not all(hasattr(FuncAnimation, hook) for hook in _BLIT_HOOKS):
+        return None
+
+    class FigureBlitAnimation(FuncAnimation):
+        """Figure 全体を blit する FuncAnimation"""
+
+        def _figure_backgrounds(self):
+            """Axes ごとの (表示状態, Figure 全体の背景) の辞書"""
+            return self.__dict__.setdefault('_figure_background_cache', {})
+
+        def _blit_clear(self, artists):
+            backgrounds = self._figure_backgrounds()
+            for ax in {a.axes for a in artists}:
+                view, background = backgrounds.get(ax, (None, None))
+                if view is None:
+                    continue
+                if _blit_view(ax) == view:
+                    ax.figure.canvas.restore_region(background)
+                else:
+                    backgrounds.pop(ax)
+
+        def _blit_draw(self, artists):
+            backgrounds = self._figure_backgrounds()
+            updated_ax = {a.axes for a in artists}
+            # 表示範囲・視点・図の大きさが変わった場合のみ背景を保存し直す
+            for ax in updated_ax:
+                view = _blit_view(ax)
+                if backgrounds.get(ax, (None, None))[0] != view:
+                    backgrounds[ax] = (
+                        view, ax.figure.canvas.copy_from_bbox(ax.figure.bbox))
+            for a in artists:
+                a.axes.draw_artist(a)
+            for ax in updated_ax:
+                ax.figure.canvas.blit(ax.figure.bbox)
+
+    _figure_blit_animation_class = FigureBlitAnimation
+    return _figure_blit_animation_class
+
 
 class RobotSimulator:
     """
@@ -177,56 +452,142 @@ class RobotSimulator:
         コンストラクタ
 
         パラメータ:
-            robot: ThreeAxisRobotインスタンス
+            robot: ThreeAxisRobot または SerialChainRobot インスタンス
         """
         self.robot = robot
         self.fig = None
         self.ax = None
         self.animation = None
+        self.live_timer = None
 
-    def animate_trajectory(self, trajectory, interval=50, save_path=None):
+    def animate_trajectory(self, trajectory, interval=50, save_path=None,
+                           render_mode='persistent', blit=None):
         """
         軌道をアニメーション表示
 
         パラメータ:
             trajectory: [(theta1, theta2, theta3), ...] の軌道リスト
+                        (theta4 を含む4要素でも可、
+                        TrajectoryFile またはそのパスでも可)
             interval: フレーム間隔 [ms]
             save_path: 保存先パス(省略時は表示のみ)
+                       .gif / .png は画面を開かずに逐次書き出す
+            render_mode: 描画方式
+                         'persistent': 描画要素を一度だけ作成し、
+                                       フレームごとにデータのみ更新
+                         'redraw': フレームごとに Axes をクリアして再描画
+            blit: blit を使用するか(省略時はバックエンドが対応していて
+                  表示のみの場合に使用)
         """
+        if render_mode not in ('persistent', 'redraw'):
+            raise ValueError(f"Unknown render_mode: {render_mode}")
+        trajectory = open_trajectory(trajectory)
+
+        if save_path and \
+                os.path.splitext(save_path)[1].lower() in SUPPORTED_FORMATS:
+            stats = export_trajectory(self.robot, trajectory, save_path,
+                                      interval=interval)
+            print(f"Animation saved to: {save_path} ({stats})")
+            return
+
+        from matplotlib.animation import FuncAnimation
+        plt = pyplot()
+
         self.fig = plt.figure(figsize=(10, 10))
         self.fig.canvas.manager.set_window_title('Robot Arm Simulator')
         self.ax = self.fig.add_subplot(111, projection='3d')
 
-        def update(frame):
-            """アニメーション更新関数"""
-            self.ax.clear()
-            if len(trajectory[frame]) == 4:
-                theta1, theta2, theta3, theta4 = trajectory[frame]
-            else:
-                theta1, theta2, theta3 = trajectory[frame]
-                theta4 = 0
-            self.robot.plot_robot(theta1, theta2, theta3, theta4, self.ax)
-            return self.ax,
-
-        self.animation = FuncAnimation(
+        if render_mode == 'redraw':
+            blit = False
+        elif blit is None:
+            blit = self.fig.canvas.supports_blit and not save_path
+
+        def get_angles(frame):
+            """フレームの関節角度を (theta1, theta2, theta3, theta4) で取得"""
+            return split_angles(trajectory[frame])
+
+        if render_mode == 'persistent':
+            artists = self.robot.create_plot_artists(self.ax, *get_angles(0))
+
+            def update(frame):
+                """アニメーション更新関数(データのみ更新)"""
+                updated = self.robot.update_plot_artists(
+                    artists, *get_angles(frame))
+                if not blit:
+                    return updated
+                # blit 時は Axes3D.draw を経由しないため、Axes3D.draw と同様に
+                # scatter を投影して奥行き順に並べ、リンクの上に描画する
+                scatters = sorted(
+                    (artists['base'], artists['end_effector']),
+                    key=lambda artist: artist.do_3d_projection(),
+                    reverse=True)
+                return (*artists['links'], *scatters, artists['title'])
+        else:
+            def update(frame):
+                """アニメーション更新関数"""
+                self.ax.clear()
+                self.robot.plot_robot(*get_angles(frame), ax=self.ax)
+                return self.ax,
+
+        animation_class = _figure_blit_animation() if blit else None
+        if animation_class is None:
+            # blit を使えない matplotlib では全体を再描画する
+            blit = False
+            animation_class = FuncAnimation
+        self.animation = animation_class(
             self.fig, update, frames=len(trajectory),
-            interval=interval, blit=False, repeat=True
+            interval=interval, blit=blit, repeat=True
         )
 
         if save_path:
-            self.animation.save(save_path, writer='pillow', fps=20)
+            self.animation.save(save_path, writer='pillow',
+                                fps=1000.0 / interval)
             print(f"Animation saved to: {save_path}")
         else:
             plt.show()
 
     def interactive_control(self,
                             init_theta1=0.0, init_theta2=0.0,
-                            init_theta3=0.0, init_theta4=0.0):
+                            init_theta3=0.0, init_theta4=0.0,
+                            redraw_interval=16, initial=None, recorder=None):
         """
         インタラクティブな角度制御
         スライダーで各関節の角度を調整
+
+        スライダーはロボットの joint_sliders から関節ごとに作成する。
+        スライダーの変更はすぐには描画せず、redraw_interval の間に
+        発生した変更をまとめて一度だけ描画に反映する
+
+        パラメータ:
+            init_theta1 - init_theta4: 初期角度 [rad]
+            redraw_interval: 再描画の最短間隔 [ms] (既定は約60fps)
+            initial: 各関節の初期値のリスト [rad]
+                     (指定時は init_theta1 - init_theta4 より優先、
+                     SerialChainRobot で5関節以上の場合に使用)
+            recorder: 関節角度の変更を記録する SessionRecorder または
+                      保存先パス(パスの場合は終了時にファイルを閉じる、
+                      load_session で再生できる)
         """
+        from matplotlib.backend_bases import TimerBase
         from matplotlib.widgets import Slider, TextBox, Button
+        plt = pyplot()
+
+        specs = self.robot.joint_sliders()
+        if initial is None:
+            initial = (init_theta1, init_theta2, init_theta3, init_theta4)
+        initial = list(initial[:len(specs)])
+        initial += [0.0] * (len(specs) - len(initial))
+        # 回転関節は [deg]、直動関節は [mm] で表示する
+        scales = [np.degrees(1.0) if self._is_revolute(i) else 1.0
+                  for i in range(len(specs))]
+
+        owns_recorder = isinstance(recorder, (str, os.PathLike))
+        if owns_recorder:
+            from robot_arm_simulator.recorder import SessionRecorder
+            recorder = SessionRecorder(recorder, joints=len(specs),
+                                       robot=self.robot)
+        if recorder is not None:
+            recorder.record(initial)
 
         # 図の作成
         self.fig = plt.figure(figsize=(14, 8))
@@ -234,194 +595,146 @@ class RobotSimulator:
         self.ax = self.fig.add_subplot(111, projection='3d')
         plt.subplots_adjust(left=0.1, right=0.85, bottom=0.30, top=0.88)
 
-        # 初期状態を描画
-        self.robot.plot_robot(init_theta1, init_theta2,
-                              init_theta3, init_theta4, self.ax)
+        # 初期状態を描画(以降は描画要素のデータのみ更新する)
+        artists = self.robot.create_plot_artists(self.ax, *initial)
 
         # スライダーとテキストボックスの作成
+        # (4関節で 0.18 から 0.05 間隔、関節が多い場合は間隔を詰める)
         slider_width = 0.55
         slider_left = 0.15
         textbox_left = slider_left + slider_width + 0.07
         textbox_width = 0.08
+        spacing = min(0.05, 0.15 / max(len(specs) - 1, 1))
+        height = min(0.03, spacing * 0.6)
+
+        sliders = []
+        text_boxes = []
+        for i, (label, lower, upper) in enumerate(specs):
+            bottom = 0.18 - spacing * i
+            ax_slider = plt.axes([slider_left, bottom, slider_width, height])
+            ax_text = plt.axes([textbox_left, bottom, textbox_width, height])
+            value = initial[i] * scales[i]
+            sliders.append(Slider(ax_slider, label, lower, upper,
+                                  valinit=value, valstep=0.001))
+            text_boxes.append(TextBox(ax_text, '', initial=f'{value:.3f}'))
 
-        # θ1用
-        ax_theta1 = plt.axes([slider_left, 0.18, slider_width, 0.03])
-        ax_text1 = plt.axes([textbox_left, 0.18, textbox_width, 0.03])
-
-        # θ2用
-        ax_theta2 = plt.axes([slider_left, 0.13, slider_width, 0.03])
-        ax_text2 = plt.axes([textbox_left, 0.13, textbox_width, 0.03])
-
-        # θ3用
-        ax_theta3 = plt.axes([slider_left, 0.08, slider_width, 0.03])
-        ax_text3 = plt.axes([textbox_left, 0.08, textbox_width, 0.03])
-
-        # θ4用
-        ax_theta4 = plt.axes([slider_left, 0.03, slider_width, 0.03])
-        ax_text4 = plt.axes([textbox_left, 0.03, textbox_width, 0.03])
-
-        # リセットボタン用
+        # リセットボタン
         ax_reset = plt.axes(
             [textbox_left + textbox_width + 0.02, 0.18, 0.08, 0.03])
-
-        slider_theta1 = Slider(ax_theta1, 'Base 回転',
-                               RobotConfig.THETA1_MIN_DEG,
-                               RobotConfig.THETA1_MAX_DEG,
-                               valinit=np.degrees(init_theta1),
-                               valstep=0.001)
-        slider_theta2 = Slider(ax_theta2, 'Base',
-                               RobotConfig.THETA2_MIN_DEG,
-                               RobotConfig.THETA2_MAX_DEG,
-                               valinit=np.degrees(init_theta2),
-                               valstep=0.001)
-        slider_theta3 = Slider(ax_theta3, 'リンク_1',
-                               RobotConfig.THETA3_MIN_DEG,
-                               RobotConfig.THETA3_MAX_DEG,
-                               valinit=np.degrees(init_theta3),
-                               valstep=0.001)
-        slider_theta4 = Slider(ax_theta4, 'リンク_2',
-                               RobotConfig.THETA4_MIN_DEG,
-                               RobotConfig.THETA4_MAX_DEG,
-                               valinit=np.degrees(init_theta4),
-                               valstep=0.001)
-
-        text_theta1 = TextBox(
-            ax_text1, '', initial=f'{np.degrees(init_theta1):.3f}')
-        text_theta2 = TextBox(
-            ax_text2, '', initial=f'{np.degrees(init_theta2):.3f}')
-        text_theta3 = TextBox(
-            ax_text3, '', initial=f'{np.degrees(init_theta3):.3f}')
-        text_theta4 = TextBox(
-            ax_text4, '', initial=f'{np.degrees(init_theta4):.3f}')
-
-        # リセットボタン
         reset_button = Button(ax_reset, 'リセット')
 
-        def update(val):
-            """スライダー更新時の処理"""
-            self.ax.clear()
-            theta1 = np.radians(slider_theta1.val)
-            theta2 = np.radians(slider_theta2.val)
-            theta3 = np.radians(slider_theta3.val)
-            theta4 = np.radians(slider_theta4.val)
-            self.robot.plot_robot(theta1, theta2, theta3, theta4, self.ax)
+        # 再描画をまとめるためのタイマー
+        # (GUI のイベントループがないバックエンドでは即時に描画する)
+        redraw_timer = self.fig.canvas.new_timer(interval=redraw_interval)
+        redraw_timer.single_shot = True
+        coalesce = type(redraw_timer) is not TimerBase
+        redraw_pending = False
+
+        def redraw():
+            """保留中のスライダー変更を描画に反映"""
+            nonlocal redraw_pending
+            redraw_pending = False
+            angles = [slider.val / scale
+                      for slider, scale in zip(sliders, scales)]
+            self.robot.update_plot_artists(artists, *angles)
 
             # テキストボックスも更新
-            text_theta1.set_val(f'{slider_theta1.val:.3f}')
-            text_theta2.set_val(f'{slider_theta2.val:.3f}')
-            text_theta3.set_val(f'{slider_theta3.val:.3f}')
-            text_theta4.set_val(f'{slider_theta4.val:.3f}')
+            # (submit イベントからスライダーが再度更新されないようにする)
+            for slider, text_box in zip(sliders, text_boxes):
+                text_box.eventson = False
+                text_box.set_val(f'{slider.val:.3f}')
+                text_box.eventson = True
 
             self.fig.canvas.draw_idle()
 
-        def update_from_text1(text):
-            """テキストボックス1からの更新"""
-            try:
-                val = float(text)
-                val = np.clip(val, RobotConfig.THETA1_MIN_DEG,
-                              RobotConfig.THETA1_MAX_DEG)
-                slider_theta1.set_val(val)
-            except ValueError:
-                pass
-
-        def update_from_text2(text):
-            """テキストボックス2からの更新"""
-            try:
-                val = float(text)
-                val = np.clip(val, RobotConfig.THETA2_MIN_DEG,
-                              RobotConfig.THETA2_MAX_DEG)
-                slider_theta2.set_val(val)
-            except ValueError:
-                pass
-
-        def update_from_text3(text):
-            """テキストボックス3からの更新"""
-            try:
-                val = float(text)
-                val = np.clip(val, RobotConfig.THETA3_MIN_DEG,
-                              RobotConfig.THETA3_MAX_DEG)
-                slider_theta3.set_val(val)
-            except ValueError:
-                pass
-
-        def update_from_text4(text):
-            """テキストボックス4からの更新"""
-            try:
-                val = float(text)
-                val = np.clip(val, RobotConfig.THETA4_MIN_DEG,
-                              RobotConfig.THETA4_MAX_DEG)
-                slider_theta4.set_val(val)
-            except ValueError:
-                pass
+        redraw_timer.add_callback(redraw)
+
+        def update(val):
+            """スライダー更新時の処理"""
+            nonlocal redraw_pending
+            if recorder is not None:
+                # 描画をまとめる前の全ての変更を記録する
+                recorder.record([slider.val / scale
+                                 for slider, scale in zip(sliders, scales)])
+            if not coalesce:
+                redraw()
+            elif not redraw_pending:
+                redraw_pending = True
+                redraw_timer.start()
+
+        def update_from_text(slider, lower, upper):
+            """
+            テキストボックスからスライダーを更新する関数を作成
+
+            slider.set_val から update が1回呼ばれる。redraw でテキスト
+            ボックスを更新する際は eventson を無効にしているため、
+            この submit が再度呼ばれてスライダーを更新し直すことはない
+            """
+            def submit(text):
+                try:
+                    slider.set_val(np.clip(float(text), lower, upper))
+                except ValueError:
+                    pass
+            return submit
 
         def reset(event):
             """リセットボタンが押されたときの処理"""
-            slider_theta1.reset()
-            slider_theta2.reset()
-            slider_theta3.reset()
-            slider_theta4.reset()
-
-        slider_theta1.on_changed(update)
-        slider_theta2.on_changed(update)
-        slider_theta3.on_changed(update)
-        slider_theta4.on_changed(update)
+            for slider in sliders:
+                slider.reset()
 
-        text_theta1.on_submit(update_from_text1)
-        text_theta2.on_submit(update_from_text2)
-        text_theta3.on_submit(update_from_text3)
-        text_theta4.on_submit(update_from_text4)
+        for slider, text_box, (_, lower, upper) in zip(
+                sliders, text_boxes, specs):
+            slider.on_changed(update)
+            text_box.on_submit(update_from_text(slider, lower, upper))
 
         reset_button.on_clicked(reset)
 
-        plt.show()
+        try:
+            plt.show()
+        finally:
+            if owns_recorder:
+                recorder.close()
 
+    def live_view(self, source, interval=33):
+        """
+        外部から更新される関節角度を一定間隔で描画
 
-def inverse_kinematics(px: int, py: int, pz: int, len_1: int, len_2: int):
-    try:
-        # XY平面上の距離
-        dxy = np.sqrt(px*px + py*py)
-        # 目標位置までの3D距離
-        pow_reach = px*px + py*py + pz*pz
-        arm_reach = np.sqrt(pow_reach)
-        pow_l1 = len_1*len_1
-        pow_l2 = len_2*len_2
-
-        # ベース回転角（Z軸周り）
-        theta0 = np.arctan2(py, px)
-        # 余弦定理で肘関節の角度を計算
-        cos_theta1 = (pow_l1 + pow_l2 - pow_reach) / (2*len_1*len_2)
-        # 範囲チェック
-        if arm_reach > (len_1 + len_2):
-            print("[ERROR] Target is out of reach! Len:", arm_reach)
-            return (0, 0, 0)
-        elif abs(cos_theta1) > 1.0:
-            print("[ERROR] Target is out of reach! angle:", cos_theta1)
-            return (0, 0, 0)
-        else:
-            theta2 = np.pi - np.arccos(cos_theta1)
-            if np.isnan(theta2):
-                print("[ERROR] theta2 is NaN:", theta2)
-                theta2 = 0.0
-
-            # 角度計算
-            alpha = np.arctan2(pz, dxy)
-            if 0 == arm_reach:
-                beta = 0.0
-            else:
-                beta = np.arccos(
-                    (pow_reach + pow_l1 - pow_l2) / (2*len_1*arm_reach))
-            theta1 = np.pi/2 - (alpha + beta)
-
-            if np.isnan(theta0):
-                print("[ERROR] theta0 is NaN:", theta0)
-                theta0 = 0.0
-            if np.isnan(theta1):
-                print("[ERROR] theta1 is NaN:", theta1)
-                theta1 = 0.0
-            return (theta0, theta1, theta2)
-    except Exception as e:
-        print("[ERROR] Inverse Kinematics Error:", e)
-        return (0, 0, 0)
+        描画は source の最新の値のみを使う。描画が間に合わない間に
+        更新された値は描画せずに捨てる(描画が遅れて溜まらない)
+
+        パラメータ:
+            source: 最新の関節角度を返す関数(値がない場合は None)
+                    (例: lambda: server.latest and server.latest['angles'])
+            interval: 描画の間隔 [ms]
+        """
+        plt = pyplot()
+
+        self.fig = plt.figure(figsize=(10, 10))
+        self.fig.canvas.manager.set_window_title('Robot Arm Simulator')
+        self.ax = self.fig.add_subplot(111, projection='3d')
+        angles = source()
+        artists = self.robot.create_plot_artists(
+            self.ax, *(angles if angles is not None else (0.0,) * 4))
+        last = [angles]
+
+        def refresh():
+            """最新の値が変わっていれば描画を更新"""
+            angles = source()
+            if angles is None or angles == last[0]:
+                return
+            last[0] = angles
+            self.robot.update_plot_artists(artists, *angles)
+            self.fig.canvas.draw_idle()
+
+        self.live_timer = self.fig.canvas.new_timer(interval=interval)
+        self.live_timer.add_callback(refresh)
+        self.live_timer.start()
+        plt.show()
+
+    def _is_revolute(self, index):
+        """関節 index が回転関節か(ThreeAxisRobot は全て回転関節)"""
+        joints = getattr(self.robot, 'joints', None)
+        return joints is None or joints[index].joint_type == 'revolute'
 
 
 if __name__ == "__main__":
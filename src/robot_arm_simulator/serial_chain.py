@@ -0,0 +1,392 @@
+"""
+ロボットアーム 汎用のシリアルリンク機構
+関節・リンクのパラメータ(URDF 形式に近い関節の定義、または DH パラメータ)
+から任意の関節数のアームを表し、4x4 の同次変換行列を (N, dof) の関節角度に
+対して一括で合成して順運動学・ヤコビ行列を計算する
+(numpy のみを使用し、matplotlib には依存しない)
+"""
+
+import numpy as np
+from robot_arm_simulator.config import RobotConfig
+
+# 関節の種類
+JOINT_TYPES = ('revolute', 'prismatic')
+
+
+def translation(xyz):
+    """平行移動の同次変換行列 形状 (4, 4)"""
+    matrix = np.eye(4)
+    matrix[:3, 3] = xyz
+    return matrix
+
+
+def rotation_rpy(rpy):
+    """
+    ロール・ピッチ・ヨー(固定軸 X, Y, Z の順に回転)の同次変換行列
+
+    パラメータ:
+        rpy: (roll, pitch, yaw) [rad]
+
+    戻り値:
+        matrix: 形状 (4, 4) (URDF の origin rpy と同じ定義)
+    """
+    roll, pitch, yaw = rpy
+    cr, sr = np.cos(roll), np.sin(roll)
+    cp, sp = np.cos(pitch), np.sin(pitch)
+    cy, sy = np.cos(yaw), np.sin(yaw)
+    matrix = np.eye(4)
+    matrix[:3, :3] = [
+        [cy * cp, cy * sp * sr - sy * cr, cy * sp * cr + sy * sr],
+        [sy * cp, sy * sp * sr + cy * cr, sy * sp * cr - cy * sr],
+        [-sp, cp * sr, cp * cr]]
+    return matrix
+
+
+def origin_transform(xyz=(0, 0, 0), rpy=(0, 0, 0)):
+    """URDF の origin (平行移動してから回転) の同次変換行列 形状 (4, 4)"""
+    return translation(xyz) @ rotation_rpy(rpy)
+
+
+class Joint:
+    """
+    関節の定義(URDF の joint に相当)
+
+    親の関節座標系から origin で移動・回転した座標系の axis まわりに回転
+    (prismatic は axis 方向に移動)する
+
+    パラメータ:
+        name: 関節名(スライダーの表示などに使う)
+        axis: 回転軸・移動方向(関節座標系) 形状 (3,)
+        origin: 親の関節座標系からの固定の変換 形状 (4, 4)
+                (origin_transform で作成、省略時は単位行列)
+        lower, upper: 角度 [rad] (prismatic は位置 [mm]) の制限
+        joint_type: 'revolute' (回転) または 'prismatic' (直動)
+    """
+
+    def __init__(self, name, axis=(0, 0, 1), origin=None,
+                 lower=-np.pi, upper=np.pi, joint_type='revolute'):
+        """コンストラクタ"""
+        if joint_type not in JOINT_TYPES:
+            raise ValueError(f"Unknown joint_type: {joint_type}")
+        axis = np.asarray(axis, dtype=float)
+        length = np.linalg.norm(axis)
+        if axis.shape != (3,) or length == 0:
+            raise ValueError(f"axis must be a non-zero 3-vector, got {axis}")
+        if lower > upper:
+            raise ValueError(f"lower must not exceed upper for {name}")
+        self.name = name
+        self.axis = axis / length
+        self.origin = np.eye(4) if origin is None else \
+            np.asarray(origin, dtype=float)
+        self.lower = float(lower)
+        self.upper = float(upper)
+        self.joint_type = joint_type
+
+    def __repr__(self):
+        return (f'Joint(name={self.name!r}, type={self.joint_type}, '
+                f'axis={self.axis.tolist()}, '
+                f'offset={self.origin[:3, 3].tolist()}, '
+                f'limits=({self.lower:.4f}, {self.upper:.4f}))')
+
+
+class SerialChain:
+    """
+    シリアルリンク機構の運動学クラス(描画機能なし)
+
+    基点から順に関節の変換 origin_i · motion_i(q_i) を合成し、最後に
+    tool (手先の固定の変換) を掛けたものが手先の座標系になる
+
+    パラメータ:
+        joints: Joint のリスト(基点側から順に)
+        tool: 最後の関節座標系から手先までの固定の変換 形状 (4, 4)
+              (origin_transform で作成、省略時は単位行列)
+        name: 機構の名前
+    """
+
+    def __init__(self, joints, tool=None, name='Serial Chain'):
+        """コンストラクタ"""
+        if len(joints) == 0:
+            raise ValueError("at least one joint is required")
+        self.joints = list(joints)
+        self.tool = np.eye(4) if tool is None else \
+            np.asarray(tool, dtype=float)
+        self.name = name
+        self.dof = len(self.joints)
+
+        # 一括計算用の配列
+        self._origins = np.stack([joint.origin for joint in self.joints])
+        self._revolute = np.array(
+            [joint.joint_type == 'revolute' for joint in self.joints])
+        # 各関節の座標系を関節の軸が z 軸になるように回転しておき、
+        # 関節の動きを z 軸まわりの回転・z 軸方向の移動だけにする
+        # (_fixed[i] は関節 i-1 の回転後の座標系から関節 i の回転後の
+        # 座標系までの固定の変換)
+        aligns = [np.eye(4)] + [self._axis_alignment(joint.axis)
+                                for joint in self.joints]
+        self._fixed = np.stack([
+            aligns[i].T @ joint.origin @ aligns[i + 1]
+            for i, joint in enumerate(self.joints)])
+        self._fixed_tool = aligns[-1].T @ self.tool
+
+    @classmethod
+    def from_dh(cls, parameters, lower=None, upper=None, names=None,
+                tool=None, name='DH Chain'):
+        """
+        DH パラメータ(標準形式)から作成
+
+        関節 i の変換は Rz(theta_i + offset_i) · Tz(d_i) · Tx(a_i) · Rx(alpha_i)
+        (各関節は直前の座標系の Z 軸まわりに回転する)
+
+        パラメータ:
+            parameters: 関節ごとの (a [mm], alpha [rad], d [mm],
+                        offset [rad]) 形状 (dof, 4)
+            lower, upper: 角度の制限 [rad] 形状 (dof,) (省略時は ±π)
+            names: 関節名のリスト(省略時は 'joint1', ...)
+            tool: 最後の関節の DH 変換の後に掛ける固定の変換 形状 (4, 4)
+            name: 機構の名前
+
+        戻り値:
+            SerialChain
+        """
+        parameters = np.asarray(parameters, dtype=float)
+        if parameters.ndim != 2 or parameters.shape[1] != 4:
+            raise ValueError(
+                f"parameters must have shape (dof, 4), "
+                f"got {parameters.shape}")
+        dof = len(parameters)
+        lower = np.full(dof, -np.pi) if lower is None else lower
+        upper = np.full(dof, np.pi) if upper is None else upper
+        names = names or [f'joint{i + 1}' for i in range(dof)]
+
+        # Rz(theta) の後の固定部分 Tz(d) Tx(a) Rx(alpha) は、次の関節の
+        # origin (最後の関節は tool) に含める
+        fixed = []
+        for a, alpha, d, _ in parameters:
+            fixed.append(translation((a, 0, d)) @
+                         rotation_rpy((alpha, 0, 0)))
+        joints = []
+        previous = np.eye(4)
+        for i, (_, _, _, offset) in enumerate(parameters):
+            origin = previous @ rotation_rpy((0, 0, offset))
+            joints.append(Joint(names[i], (0, 0, 1), origin,
+                                lower[i], upper[i]))
+            previous = fixed[i]
+        last = previous if tool is None else previous @ tool
+        return cls(joints, last, name)
+
+    @classmethod
+    def from_dict(cls, spec):
+        """
+        URDF 形式に近い辞書(JSON から読み込んだものなど)から作成
+
+        パラメータ:
+            spec: {'name': 機構の名前,
+                   'joints': [{'name': ..., 'type': 'revolute',
+                               'axis': [x, y, z], 'xyz': [x, y, z],
+                               'rpy': [r, p, y], 'lower': ..., 'upper': ...},
+                              ...],
+                   'tool': {'xyz': [...], 'rpy': [...]}}
+                  (xyz [mm], rpy・角度の制限 [rad]、省略した項目は既定値)
+
+        戻り値:
+            SerialChain
+        """
+        joints = []
+        for i, entry in enumerate(spec['joints']):
+            joints.append(Joint(
+                entry.get('name', f'joint{i + 1}'),
+                entry.get('axis', (0, 0, 1)),
+                origin_transform(entry.get('xyz', (0, 0, 0)),
+                                 entry.get('rpy', (0, 0, 0))),
+                entry.get('lower', -np.pi), entry.get('upper', np.pi),
+                entry.get('type', 'revolute')))
+        tool = spec.get('tool', {})
+        return cls(joints, origin_transform(tool.get('xyz', (0, 0, 0)),
+                                            tool.get('rpy', (0, 0, 0))),
+                   spec.get('name', 'Serial Chain'))
+
+    @classmethod
+    def three_axis(cls, robot=None):
+        """
+        ThreeAxisKinematics と同じ機構を作成
+
+        第1軸は Z軸まわり、第2〜4軸は Y軸まわりの回転で、リンクは各関節の
+        座標系の Z 方向に伸びる。関節座標系の原点は forward_kinematics の
+        p0 〜 p3、手先は p4 と一致する
+
+        パラメータ:
+            robot: ThreeAxisKinematics インスタンス
+                   (リンク長・角度制限を使用、省略時は設定ファイルから取得)
+
+        戻り値:
+            SerialChain
+        """
+        if robot is None:
+            link1, link2, link3 = RobotConfig.get_link_lengths()
+            limits = [RobotConfig.get_theta1_range_rad(),
+                      RobotConfig.get_theta2_range_rad(),
+                      RobotConfig.get_theta3_range_rad(),
+                      RobotConfig.get_theta4_range_rad()]
+        else:
+            link1, link2, link3 = robot.link1, robot.link2, robot.link3
+            limits = list(zip(*robot.joint_limits()))
+        axes = [(0, 0, 1), (0, 1, 0), (0, 1, 0), (0, 1, 0)]
+        offsets = [0, 0, link1, link2]
+        joints = [Joint(f'theta{i + 1}', axes[i],
+                        translation((0, 0, offsets[i])), *limits[i])
+                  for i in range(4)]
+        return cls(joints, translation((0, 0, link3)), 'Three Axis Robot')
+
+    def joint_limits(self):
+        """
+        関節の制限を配列で取得
+
+        戻り値:
+            lower: 下限 形状 (dof,)
+            upper: 上限 形状 (dof,)
+        """
+        return (np.array([joint.lower for joint in self.joints]),
+                np.array([joint.upper for joint in self.joints]))
+
+    def link_lengths(self):
+        """
+        隣り合う関節座標系の原点(最後は手先)の間の距離 [mm] 形状 (dof,)
+
+        直動関節の移動量は含まない
+        """
+        offsets = np.concatenate([self._origins[1:, :3, 3],
+                                  self.tool[None, :3, 3]])
+        return np.linalg.norm(offsets, axis=1)
+
+    def max_reach(self):
+        """基点から手先までの最大距離の上限 [mm]"""
+        reach = self.link_lengths().sum()
+        for joint in self.joints:
+            if joint.joint_type == 'prismatic':
+                reach += max(abs(joint.lower), abs(joint.upper))
+        return float(reach)
+
+    def _as_joint_array(self, thetas):
+        """関節角度を (N, dof) の配列に変換"""
+        thetas = np.asarray(thetas, dtype=float)
+        if thetas.ndim != 2 or thetas.shape[1] != self.dof:
+            raise ValueError(
+                f"thetas must have shape (N, {self.dof}), got {thetas.shape}")
+        return thetas
+
+    @staticmethod
+    def _axis_alignment(axis):
+        """
+        z 軸を関節の軸に向ける回転
+
+        パラメータ:
+            axis: 関節の軸(単位ベクトル)
+
+        戻り値:
+            rotation: 同次変換行列 形状 (4, 4) (3列目が axis)
+        """
+        axis = np.asarray(axis, dtype=float)
+        helper = np.eye(3)[np.argmin(np.abs(axis))]
+        x_axis = np.cross(helper, axis)
+        x_axis /= np.linalg.norm(x_axis)
+        rotation = np.eye(4)
+        rotation[:3, :3] = np.column_stack(
+            [x_axis, np.cross(axis, x_axis), axis])
+        return rotation
+
+    def frames_batch(self, thetas, clip=True):
+        """
+        各関節座標系と手先の座標系(バッチ版)
+
+        frames[:, i] は関節 i の origin までを合成し、関節の軸が z 軸に
+        なるように回転した座標系(関節 i 自身の動きは含まない)、
+        frames[:, dof] は手先の座標系。
+        関節ごとに固定の行列を1回掛け、関節の動きは z 軸まわりの回転
+        (x, y の列の混合)または z 軸方向の移動として合成する
+
+        パラメータ:
+            thetas: 関節角度 形状 (N, dof)
+            clip: 関節の制限でクリップするか
+
+        戻り値:
+            frames: 同次変換行列 形状 (N, dof + 1, 4, 4)
+        """
+        thetas = self._as_joint_array(thetas)
+        if clip:
+            thetas = np.clip(thetas, *self.joint_limits())
+        count = len(thetas)
+        cos = np.cos(thetas)
+        sin = np.sin(thetas)
+
+        frames = np.empty((count, self.dof + 1, 4, 4))
+        current = np.broadcast_to(np.eye(4), (count, 4, 4))
+        for i in range(self.dof):
+            frame = (current.reshape(-1, 4) @ self._fixed[i]) \
+                .reshape(count, 4, 4)
+            frames[:, i] = frame
+            current = frame
+            if self._revolute[i]:
+                c = cos[:, i, None]
+                s = sin[:, i, None]
+                x_column = frame[:, :, 0]
+                y_column = frame[:, :, 1]
+                current = frame.copy()
+                current[:, :, 0] = c * x_column + s * y_column
+                current[:, :, 1] = c * y_column - s * x_column
+            else:
+                current[:, :, 3] += thetas[:, i, None] * frame[:, :, 2]
+        frames[:, self.dof] = (current.reshape(-1, 4) @ self._fixed_tool) \
+            .reshape(count, 4, 4)
+        return frames
+
+    def forward_kinematics_batch(self, thetas):
+        """
+        順運動学(バッチ版): 各関節座標系の原点と手先の位置
+
+        パラメータ:
+            thetas: 関節角度 形状 (N, dof) (関節の制限でクリップする)
+
+        戻り値:
+            positions: 位置 [mm] 形状 (N, dof + 1, 3)
+                       (three_axis の場合は ThreeAxisKinematics の
+                       forward_kinematics_batch と一致する)
+        """
+        return self.frames_batch(thetas)[:, :, :3, 3]
+
+    def forward_kinematics(self, *thetas):
+        """
+        順運動学(1姿勢)
+
+        パラメータ:
+            thetas: 各関節の角度 [rad] (dof 個)
+
+        戻り値:
+            positions: 各関節座標系の原点と手先の位置のリスト [(x, y, z), ...]
+        """
+        return list(self.forward_kinematics_batch([thetas])[0])
+
+    def jacobian_batch(self, thetas):
+        """
+        手先のヤコビ行列(バッチ版)
+
+        関節の制限によるクリップは行わない(数値計算で使用するため)
+
+        パラメータ:
+            thetas: 関節角度 形状 (N, dof)
+
+        戻り値:
+            jacobian: d(x, y, z, ωx, ωy, ωz) / d(q1, ..., q_dof)
+                      形状 (N, 6, dof) (位置の行は [mm/rad] または
+                      直動関節では [mm/mm])
+        """
+        frames = self.frames_batch(thetas, clip=False)
+        # 関節の軸(ワールド座標系)と、関節から手先までのベクトル
+        axes = frames[:, :-1, :3, 2]
+        lever = frames[:, -1:, :3, 3] - frames[:, :-1, :3, 3]
+        revolute = self._revolute[None, :, None]
+        linear = np.where(revolute, np.cross(axes, lever), axes)
+        angular = np.where(revolute, axes, 0.0)
+        return np.concatenate([linear, angular], axis=2).transpose(0, 2, 1)
+
+    def __repr__(self):
+        return f'SerialChain(name={self.name!r}, dof={self.dof})'
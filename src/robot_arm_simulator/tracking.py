@@ -0,0 +1,283 @@
+"""
+ロボットアーム 連続する目標の逆運動学(追従)
+移動する目標を1サンプルずつ解く場合、目標ごとに inverse_kinematics を
+独立に呼ぶと解析解の分岐が入れ替わり、関節角度が跳ぶことがある。
+IKTracker は前回の解を保持し、角度制限の範囲内で theta1 を連続につなぎ、
+前回の姿勢からのヤコビ行列による差分の更新(ニュートン法)を優先して解く
+(1 kHz 程度の目標の列を想定し、math モジュールのスカラー計算のみを使う)。
+theta1 の角度制限が [-π, π] の場合、目標が -X 軸を横切ると制限の端で
+theta1 は反対側へ約 2π 回り直すしかなく、この跳びは避けられない。
+1サンプルあたりの変化を抑えるのは max_step のみ
+"""
+
+import math
+
+import numpy as np
+from robot_arm_simulator.kinematics import (
+    IK_STATUS_NO_FEASIBLE_BRANCH, IK_STATUS_OK, IK_STATUS_OUT_OF_REACH_ANGLE,
+    IK_STATUS_OUT_OF_REACH_LENGTH, ThreeAxisKinematics)
+
+# 解き方(IKTracker.mode)
+TRACKING_MODES = ('jacobian', 'analytic', 'hold')
+
+_TWO_PI = 2.0 * math.pi
+
+
+class IKTracker:
+    """
+    前回の解を使って連続する目標を解く逆運動学
+
+    1. 前回の姿勢から theta1 を目標の方位へ連続に回し、
+       第2・第3軸はヤコビ行列によるニュートン法で数回だけ更新する
+       (theta1 が角度制限の外に出る場合は 2 へ)
+    2. 収束しない・角度制限の外に出る場合は、解析解の全ての分岐
+       (theta1 は 2π ずらしたものも含む)のうち角度制限内で前回の姿勢に
+       最も近いものを選ぶ
+    3. どの分岐も解けない場合は前回の姿勢を保つ
+    theta4 は解かずに固定する(theta4 を含めた手先の位置を合わせる)
+
+    パラメータ:
+        robot: ThreeAxisKinematics インスタンス
+               (リンク長・角度制限を使用、省略時は設定ファイルから取得)
+        initial: 最初の目標の分岐を選ぶ基準の姿勢 [rad] (4要素)
+                 (省略時は角度制限の中央)
+        theta4: 固定する theta4 [rad]
+        tolerance: 位置の許容誤差 [mm]
+        max_iterations: 1サンプルあたりのニュートン法の最大反復回数
+        max_step: 1サンプルあたりの関節角度の変化の上限 [rad]
+                  (省略時は制限なし、超える場合は解の方向へ max_step だけ
+                  動かし limited を True にする)。角度制限の端で theta1 が
+                  約 2π 回り直す跳びを抑えるのはこの上限のみで、その間は
+                  手先が目標から遅れる(error が大きくなる)
+
+    属性:
+        angles: 最新の関節角度 (theta1, ..., theta4) [rad]
+        mode: 最新のサンプルの解き方 (TRACKING_MODES のいずれか)
+        status: 最新のサンプルのステータス (IK_STATUS_*)
+        error: 最新のサンプルの手先位置の誤差 [mm]
+        limited: 最新のサンプルで max_step により変化を制限したか
+        counts: 解き方ごとのサンプル数の辞書
+    """
+
+    def __init__(self, robot=None, initial=None, theta4=0.0, tolerance=1e-6,
+                 max_iterations=3, max_step=None):
+        """コンストラクタ"""
+        if robot is None:
+            robot = ThreeAxisKinematics()
+        self.link1 = float(robot.link1)
+        self.link2 = float(robot.link2)
+        self.link3 = float(robot.link3)
+        lower, upper = robot.joint_limits()
+        self.lower = tuple(float(value) for value in lower)
+        self.upper = tuple(float(value) for value in upper)
+        theta4 = min(max(float(theta4), self.lower[3]), self.upper[3])
+        self.tolerance = tolerance
+        self.max_iterations = max_iterations
+        self.max_step = max_step
+
+        # theta4 を固定した第2リンク + 第3リンクを1本の仮想リンクとみなす
+        # (長さ reach、第2リンクからの角度 offset)
+        self.theta4 = theta4
+        self._reach = math.hypot(self.link2 + self.link3 * math.cos(theta4),
+                                 self.link3 * math.sin(theta4))
+        self._offset = math.atan2(self.link3 * math.sin(theta4),
+                                  self.link2 + self.link3 * math.cos(theta4))
+
+        if initial is None:
+            initial = [(low + high) / 2
+                       for low, high in zip(self.lower, self.upper)]
+        self._initial = tuple(float(value) for value in initial[:3])
+        self.reset()
+
+    def reset(self):
+        """前回の解を破棄(次の目標は initial を基準に解析解で解く)"""
+        self.angles = None
+        self.mode = None
+        self.status = None
+        self.error = None
+        self.limited = False
+        self.counts = dict.fromkeys(TRACKING_MODES, 0)
+
+    def _forward(self, theta1, theta2, theta3):
+        """手先位置 (x, y, z) と平面内の半径 r"""
+        total_angle2 = theta2 + theta3
+        total_angle3 = total_angle2 + self.theta4
+        r = self.link1 * math.sin(theta2) + \
+            self.link2 * math.sin(total_angle2) + \
+            self.link3 * math.sin(total_angle3)
+        z = self.link1 * math.cos(theta2) + \
+            self.link2 * math.cos(total_angle2) + \
+            self.link3 * math.cos(total_angle3)
+        return r * math.cos(theta1), r * math.sin(theta1), z, r
+
+    def _within(self, theta1, theta2, theta3):
+        """角度制限内か"""
+        lower, upper = self.lower, self.upper
+        return (lower[0] <= theta1 <= upper[0] and
+                lower[1] <= theta2 <= upper[1] and
+                lower[2] <= theta3 <= upper[2])
+
+    def _jacobian_update(self, x, y, z, previous):
+        """
+        前回の姿勢からの差分の更新
+
+        戻り値:
+            (theta1, theta2, theta3) (収束しない・角度制限外の場合は None)
+        """
+        theta1, theta2, theta3 = previous
+        _, _, _, radius = self._forward(theta1, theta2, theta3)
+        rho = math.hypot(x, y)
+        if rho > self.tolerance:
+            # 目標の方位へ最短の向きに回す(r < 0 の姿勢は反対側を向く)
+            facing = theta1 if radius >= 0.0 else theta1 + math.pi
+            theta1 += math.remainder(math.atan2(y, x) - facing, _TWO_PI)
+        target_r = x * math.cos(theta1) + y * math.sin(theta1)
+
+        link1, link2, link3, theta4 = \
+            self.link1, self.link2, self.link3, self.theta4
+        for _ in range(self.max_iterations):
+            total_angle2 = theta2 + theta3
+            total_angle3 = total_angle2 + theta4
+            r1 = link1 * math.sin(theta2)
+            z1 = link1 * math.cos(theta2)
+            # 第2リンクより先の平面内の成分
+            r23 = link2 * math.sin(total_angle2) + \
+                link3 * math.sin(total_angle3)
+            z23 = link2 * math.cos(total_angle2) + \
+                link3 * math.cos(total_angle3)
+            error_r = target_r - (r1 + r23)
+            error_z = z - (z1 + z23)
+            if error_r * error_r + error_z * error_z <= \
+                    self.tolerance * self.tolerance:
+                break
+            # d(r, z) / d(theta2, theta3) = [[z, z23], [-r, -r23]]
+            determinant = (z1 + z23) * -r23 + z23 * (r1 + r23)
+            if abs(determinant) < 1e-9 * link1 * link2:
+                return None
+            theta2 += (-r23 * error_r - z23 * error_z) / determinant
+            theta3 += ((r1 + r23) * error_r + (z1 + z23) * error_z) / \
+                determinant
+
+        if not self._within(theta1, theta2, theta3):
+            return None
+        position = self._forward(theta1, theta2, theta3)
+        error_sq = (x - position[0]) ** 2 + (y - position[1]) ** 2 + \
+            (z - position[2]) ** 2
+        if error_sq > self.tolerance * self.tolerance:
+            return None
+        return theta1, theta2, theta3
+
+    def _analytic(self, x, y, z, previous):
+        """
+        角度制限内で previous に最も近い解析解
+
+        戻り値:
+            (theta1, theta2, theta3) と status
+            (解がない場合は (None, status))
+        """
+        len_1, len_2 = self.link1, self._reach
+        rho = math.hypot(x, y)
+        distance_sq = rho * rho + z * z
+        if math.sqrt(distance_sq) > len_1 + len_2:
+            return None, IK_STATUS_OUT_OF_REACH_LENGTH
+        cos_theta3 = (distance_sq - len_1 * len_1 - len_2 * len_2) / \
+            (2 * len_1 * len_2)
+        if abs(cos_theta3) > 1.0:
+            return None, IK_STATUS_OUT_OF_REACH_ANGLE
+
+        azimuth = math.atan2(y, x) if rho > 0.0 else previous[0]
+        best, best_cost = None, math.inf
+        for theta1, radius in ((azimuth, rho), (azimuth + math.pi, -rho)):
+            # theta1 は前回の値に最も近い 2π の倍数のずれを選び、
+            # 角度制限外なら反対側にずらしたものも試す
+            theta1 = previous[0] + math.remainder(theta1 - previous[0],
+                                                  _TWO_PI)
+            shifted = theta1 - math.copysign(_TWO_PI, theta1 - previous[0])
+            for elbow in (1.0, -1.0):
+                virtual = elbow * math.acos(cos_theta3)
+                theta2 = math.atan2(radius, z) - math.atan2(
+                    len_2 * math.sin(virtual),
+                    len_1 + len_2 * math.cos(virtual))
+                theta3 = virtual - self._offset
+                for candidate in (theta1, shifted):
+                    if not self._within(candidate, theta2, theta3):
+                        continue
+                    cost = (candidate - previous[0]) ** 2 + \
+                        (theta2 - previous[1]) ** 2 + \
+                        (theta3 - previous[2]) ** 2
+                    if cost < best_cost:
+                        best, best_cost = (candidate, theta2, theta3), cost
+        if best is None:
+            return None, IK_STATUS_NO_FEASIBLE_BRANCH
+        return best, IK_STATUS_OK
+
+    def update(self, x, y, z):
+        """
+        次の目標の関節角度を求める
+
+        パラメータ:
+            x, y, z: 目標位置 [mm]
+
+        戻り値:
+            angles: 関節角度 (theta1, ..., theta4) [rad]
+                    (解がない場合は前回の姿勢)
+        """
+        previous = self._initial if self.angles is None else self.angles[:3]
+        solution = None
+        status = IK_STATUS_OK
+        if self.angles is not None:
+            solution = self._jacobian_update(x, y, z, previous)
+        if solution is not None:
+            mode = 'jacobian'
+        else:
+            solution, status = self._analytic(x, y, z, previous)
+            mode = 'analytic' if solution is not None else 'hold'
+        if solution is None:
+            solution = previous
+
+        self.limited = False
+        if self.max_step is not None and self.angles is not None:
+            largest = max(abs(new - old)
+                          for new, old in zip(solution, previous))
+            if largest > self.max_step:
+                scale = self.max_step / largest
+                solution = tuple(old + (new - old) * scale
+                                 for new, old in zip(solution, previous))
+                self.limited = True
+
+        self.angles = (*solution, self.theta4)
+        position = self._forward(*solution)
+        self.error = math.sqrt((x - position[0]) ** 2 +
+                               (y - position[1]) ** 2 +
+                               (z - position[2]) ** 2)
+        self.mode = mode
+        self.status = status
+        self.counts[mode] += 1
+        return self.angles
+
+    def track(self, targets):
+        """
+        目標の列を順に解く(オフラインでの確認用)
+
+        パラメータ:
+            targets: 目標位置の配列 [mm] 形状 (N, 3)
+
+        戻り値:
+            angles: 関節角度 [rad] 形状 (N, 4)
+            errors: 手先位置の誤差 [mm] 形状 (N,)
+        """
+        targets = np.asarray(targets, dtype=float)
+        if targets.ndim != 2 or targets.shape[1] != 3:
+            raise ValueError(
+                f"targets must have shape (N, 3), got {targets.shape}")
+        angles = np.empty((len(targets), 4))
+        errors = np.empty(len(targets))
+        for index, (x, y, z) in enumerate(targets.tolist()):
+            angles[index] = self.update(x, y, z)
+            errors[index] = self.error
+        return angles, errors
+
+    def __repr__(self):
+        counts = ', '.join(f'{mode}={count}'
+                           for mode, count in self.counts.items())
+        return f'IKTracker({counts})'
@@ -0,0 +1,503 @@
+"""
+ロボットアーム 軌道生成
+経由点から関節角度の軌道(時刻と (N, 4) の関節角度)を一括で生成する
+関節空間の補間(直線・3次・5次)と、直線・円弧の手先軌道(逆運動学)、
+関節の速度・加速度制限による時刻の付け直しに対応
+"""
+
+import numpy as np
+from robot_arm_simulator.config import RobotConfig
+
+# 関節空間の補間方法
+JOINT_METHODS = ('linear', 'cubic', 'quintic')
+
+# 手先軌道の速度プロファイル(0 - 1 の進み具合)
+PROFILES = ('linear', 'cubic', 'quintic')
+
+
+class Trajectory:
+    """
+    関節角度の軌道
+
+    animate_trajectory や export_trajectory にそのまま渡せる
+    (len() と添字で各時刻の (theta1, ..., theta4) を取得できる)
+
+    属性:
+        times: 時刻 [s] 形状 (N,)
+        angles: 関節角度 (theta1, ..., theta4) [rad] 形状 (N, 4)
+        feasible: 逆運動学の解が得られたか 形状 (N,)
+                  (関節空間の補間では全て True)
+    """
+
+    def __init__(self, times, angles, feasible=None):
+        """コンストラクタ"""
+        self.times = np.asarray(times, dtype=float)
+        self.angles = np.asarray(angles, dtype=float)
+        if feasible is None:
+            feasible = np.ones(len(self.times), dtype=bool)
+        self.feasible = np.asarray(feasible, dtype=bool)
+
+    def __len__(self):
+        return len(self.angles)
+
+    def __getitem__(self, index):
+        return self.angles[index]
+
+    def __iter__(self):
+        return iter(self.angles)
+
+    @property
+    def duration(self):
+        """軌道の長さ [s]"""
+        return float(self.times[-1] - self.times[0]) if len(self) else 0.0
+
+    @property
+    def interval(self):
+        """平均のサンプル間隔 [ms] (animate_trajectory の interval 用)"""
+        if len(self) < 2:
+            return 0.0
+        return 1000.0 * self.duration / (len(self) - 1)
+
+    def __repr__(self):
+        return (f'Trajectory(samples={len(self)}, '
+                f'duration={self.duration:.3f} s, '
+                f'feasible={int(self.feasible.sum())}/{len(self)})')
+
+
+def sample_times(start, end, dt):
+    """
+    start から end まで dt 間隔の時刻(最後は必ず end)
+
+    戻り値:
+        times: 時刻 [s] 形状 (N,)
+    """
+    if dt <= 0:
+        raise ValueError(f"dt must be positive, got {dt}")
+    count = int(np.floor((end - start) / dt + 1e-9)) + 1
+    times = start + np.arange(count) * dt
+    if end - times[-1] > 1e-9 * dt:
+        times = np.append(times, end)
+    return times
+
+
+def _as_joint_array(waypoints):
+    """経由点を (M, 4) の配列に変換(3要素の場合は theta4 = 0)"""
+    waypoints = np.asarray(waypoints, dtype=float)
+    if waypoints.ndim != 2 or waypoints.shape[1] not in (3, 4):
+        raise ValueError(
+            f"waypoints must have shape (M, 3) or (M, 4), "
+            f"got {waypoints.shape}")
+    if waypoints.shape[1] == 3:
+        waypoints = np.hstack([waypoints, np.zeros((len(waypoints), 1))])
+    return waypoints
+
+
+def waypoint_velocities(waypoints, times):
+    """
+    経由点での関節速度
+
+    両端は 0、途中は前後の区間の平均速度の平均
+    (前後で向きが変わる関節は 0 として行き過ぎを防ぐ)
+
+    パラメータ:
+        waypoints: 経由点の関節角度 [rad] 形状 (M, J)
+        times: 経由点の時刻 [s] 形状 (M,)
+
+    戻り値:
+        velocities: 関節速度 [rad/s] 形状 (M, J)
+    """
+    slopes = np.diff(waypoints, axis=0) / np.diff(times)[:, None]
+    velocities = np.zeros_like(waypoints)
+    same_direction = np.sign(slopes[:-1]) == np.sign(slopes[1:])
+    velocities[1:-1] = np.where(same_direction,
+                                (slopes[:-1] + slopes[1:]) / 2, 0.0)
+    return velocities
+
+
+def joint_trajectory(waypoints, times=None, method='quintic', dt=0.02,
+                     velocities=None):
+    """
+    関節空間の補間による軌道
+
+    パラメータ:
+        waypoints: 経由点の関節角度 [rad] 形状 (M, 4) または (M, 3)
+        times: 経由点の時刻 [s] 形状 (M,) (省略時は1区間 1 秒)
+        method: 補間方法
+                'linear': 直線(経由点で速度が不連続)
+                'cubic': 3次エルミート(速度が連続)
+                'quintic': 5次エルミート(速度・加速度が連続、
+                           経由点の加速度は 0)
+        dt: サンプル間隔 [s]
+        velocities: 経由点の関節速度 [rad/s] 形状 (M, 4)
+                    (省略時は waypoint_velocities で決める)
+
+    戻り値:
+        Trajectory
+    """
+    if method not in JOINT_METHODS:
+        raise ValueError(f"Unknown method: {method}")
+    waypoints = _as_joint_array(waypoints)
+    count = len(waypoints)
+    if count < 2:
+        raise ValueError("at least two waypoints are required")
+    if times is None:
+        times = np.arange(count, dtype=float)
+    times = np.asarray(times, dtype=float)
+    if times.shape != (count,) or np.any(np.diff(times) <= 0):
+        raise ValueError("times must be strictly increasing, one per waypoint")
+
+    samples = sample_times(times[0], times[-1], dt)
+    # サンプルごとの区間番号と区間内の位置 (0 - 1)
+    segment = np.clip(np.searchsorted(times, samples, side='right') - 1,
+                      0, count - 2)
+    duration = np.diff(times)[segment][:, None]
+    u = ((samples - times[segment]) / duration[:, 0])[:, None]
+    start = waypoints[segment]
+    end = waypoints[segment + 1]
+
+    if method == 'linear':
+        return Trajectory(samples, start + (end - start) * u)
+
+    if velocities is None:
+        velocities = waypoint_velocities(waypoints, times)
+    else:
+        velocities = _as_joint_array(velocities)
+    start_velocity = velocities[segment] * duration
+    end_velocity = velocities[segment + 1] * duration
+
+    u2 = u * u
+    u3 = u2 * u
+    if method == 'cubic':
+        h_start = 1 - 3*u2 + 2*u3
+        h_start_velocity = u - 2*u2 + u3
+        h_end = 3*u2 - 2*u3
+        h_end_velocity = u3 - u2
+    else:
+        u4 = u3 * u
+        u5 = u4 * u
+        h_start = 1 - 10*u3 + 15*u4 - 6*u5
+        h_start_velocity = u - 6*u3 + 8*u4 - 3*u5
+        h_end = 10*u3 - 15*u4 + 6*u5
+        h_end_velocity = -4*u3 + 7*u4 - 3*u5
+    angles = h_start * start + h_end * end + \
+        h_start_velocity * start_velocity + h_end_velocity * end_velocity
+    return Trajectory(samples, angles)
+
+
+def time_profile(u, profile='quintic'):
+    """
+    0 - 1 の時間に対する進み具合 (0 - 1)
+
+    パラメータ:
+        u: 正規化した時刻 形状 (N,)
+        profile: 'linear' (等速), 'cubic' (両端で速度 0),
+                 'quintic' (両端で速度・加速度 0)
+
+    戻り値:
+        s: 進み具合 形状 (N,)
+    """
+    if profile == 'linear':
+        return u
+    if profile == 'cubic':
+        return u * u * (3 - 2*u)
+    if profile == 'quintic':
+        return u * u * u * (10 - 15*u + 6*u*u)
+    raise ValueError(f"Unknown profile: {profile}")
+
+
+def solve_path(robot, points, times, pitch=None, current=None,
+               max_jump=0.5):
+    """
+    手先位置の列を逆運動学で一括して関節角度の軌道にする
+
+    pitch を省略した場合は、各時刻で角度制限内の解析解のうち
+    直前の時刻の解に最も近い分岐を選ぶ(経路の途中で分岐が制限外に
+    なっても、別の分岐へ跳ばないようにする)
+
+    パラメータ:
+        robot: ThreeAxisKinematics インスタンス
+        points: 手先位置 [mm] 形状 (N, 3)
+        times: 時刻 [s] 形状 (N,)
+        pitch: 第3リンクのピッチ [rad] (スカラーまたは形状 (N,))
+               省略時は theta4 = 0 で角度制限内の解析解を選ぶ
+        current: 最初の時刻の解析解の分岐を選ぶ基準の関節角度 [rad]
+                 形状 (4,) (pitch を省略した場合のみ、
+                 省略時は inverse_kinematics_select_batch と同じ順)
+        max_jump: 連続とみなす1サンプルあたりの関節角度の変化の上限 [rad]
+                  (超えた時刻は連続な分岐がないため feasible を False にする)
+
+    戻り値:
+        Trajectory (解が得られなかった時刻・直前から max_jump を超えて
+        跳んだ時刻は feasible が False。pitch を省略した場合、解が
+        得られなかった時刻の角度は直前の解を保つ(最初の解より前は
+        current、省略時は最初の解))
+    """
+    points = np.asarray(points, dtype=float)
+    if pitch is not None:
+        result = robot.inverse_kinematics_pitch_batch(points, pitch)
+        angles = result.angles
+        feasible = result.converged.copy()
+        jumps = np.max(np.abs(np.diff(angles, axis=0)), axis=1)
+        feasible[1:] &= jumps <= max_jump
+        return Trajectory(times, angles, feasible)
+
+    branches, candidates, _ = robot.inverse_kinematics_branches_batch(points)
+    solved = np.flatnonzero(candidates.any(axis=1))
+    if len(solved) == 0:
+        angles = np.zeros((len(points), 4))
+        if current is not None:
+            angles[:] = current
+        return Trajectory(times, angles, np.zeros(len(points), dtype=bool))
+    branches, candidates = branches[solved], candidates[solved]
+
+    # 解が得られた時刻の間で、前の時刻の分岐ごとに最も近い次の分岐
+    # nearest[i, b] (形状 (M - 1, 4))。分岐を選び直すのは
+    # nearest[i, b] != b となる時刻のみなので、その時刻だけをたどる
+    # (関節ごとに連続した配列で作業領域を使い回す)
+    joints = np.ascontiguousarray(branches.transpose(2, 0, 1))
+    blocked = ~candidates[1:]
+    nearest = np.empty((len(solved) - 1, 4), dtype=np.intp)
+    costs = np.empty((len(solved) - 1, 4))
+    difference = np.empty_like(costs)
+    for branch in range(4):
+        costs.fill(0.0)
+        for joint in joints:
+            np.subtract(joint[1:], joint[:-1, branch, None], out=difference)
+            difference *= difference
+            costs += difference
+        # 制限外の分岐(NaN を含む)は選ばない
+        costs[blocked] = np.inf
+        nearest[:, branch] = np.argmin(costs, axis=1)
+    changes = [np.flatnonzero(nearest[:, branch] != branch)
+               for branch in range(4)]
+
+    if current is None:
+        branch = int(np.argmax(candidates[0]))
+    else:
+        costs = np.sum((branches[0] - np.asarray(current, dtype=float)) ** 2,
+                       axis=1)
+        branch = int(np.argmin(np.where(candidates[0], costs, np.inf)))
+    choice = np.empty(len(solved), dtype=np.intp)
+    position = 0
+    while True:
+        index = np.searchsorted(changes[branch], position)
+        if index == len(changes[branch]):
+            choice[position:] = branch
+            break
+        stop = changes[branch][index]
+        choice[position:stop + 1] = branch
+        branch = nearest[stop, branch]
+        position = stop + 1
+    selected = branches[np.arange(len(solved)), choice]
+
+    # 最初の解は current からの移動を含めない(経路の開始前の姿勢のため)
+    feasible = np.zeros(len(points), dtype=bool)
+    feasible[solved[0]] = True
+    feasible[solved[1:]] = \
+        np.max(np.abs(np.diff(selected, axis=0)), axis=1) <= max_jump
+    # 解が得られない時刻は直前の解を保つ(最初の解の前は current、
+    # 省略時は最初の解)
+    held = np.full(len(points), -1)
+    held[solved] = solved
+    held = np.maximum.accumulate(held)
+    angles = np.empty((len(points), 4))
+    angles[solved] = selected
+    leading = held < 0
+    angles[~leading] = angles[held[~leading]]
+    angles[leading] = selected[0] if current is None else current
+    return Trajectory(times, angles, feasible)
+
+
+def cartesian_line(robot, start, end, duration, dt=0.02, profile='quintic',
+                   pitch=None, current=None, max_jump=0.5):
+    """
+    手先が直線上を動く軌道
+
+    パラメータ:
+        robot: ThreeAxisKinematics インスタンス
+        start, end: 始点・終点 [mm] 形状 (3,)
+        duration: 所要時間 [s]
+        dt: サンプル間隔 [s]
+        profile: 速度プロファイル (time_profile を参照)
+        pitch, current, max_jump: solve_path を参照
+
+    戻り値:
+        Trajectory
+    """
+    start = np.asarray(start, dtype=float)
+    end = np.asarray(end, dtype=float)
+    times = sample_times(0.0, duration, dt)
+    s = time_profile(times / duration, profile)[:, None]
+    points = start + (end - start) * s
+    return solve_path(robot, points, times, pitch, current, max_jump)
+
+
+def cartesian_arc(robot, start, via, end, duration, dt=0.02,
+                  profile='quintic', pitch=None, current=None,
+                  max_jump=0.5):
+    """
+    手先が3点を通る円弧上を動く軌道(start から via を通って end まで)
+
+    パラメータ:
+        robot: ThreeAxisKinematics インスタンス
+        start, via, end: 始点・経由点・終点 [mm] 形状 (3,)
+        duration: 所要時間 [s]
+        dt: サンプル間隔 [s]
+        profile: 速度プロファイル (time_profile を参照)
+        pitch, current, max_jump: solve_path を参照
+
+    戻り値:
+        Trajectory
+    """
+    start = np.asarray(start, dtype=float)
+    via = np.asarray(via, dtype=float)
+    end = np.asarray(end, dtype=float)
+
+    # 3点を通る円の中心(外心)と円の平面の基底
+    a = via - start
+    b = end - start
+    normal = np.cross(a, b)
+    normal_sq = normal @ normal
+    if normal_sq < 1e-12 * (a @ a) * (b @ b):
+        raise ValueError("start, via and end must not be collinear")
+    center = start + (np.cross(normal, a) * (b @ b) +
+                      np.cross(b, normal) * (a @ a)) / (2 * normal_sq)
+    radius_vector = start - center
+    radius = np.linalg.norm(radius_vector)
+    axis_u = radius_vector / radius
+    axis_v = np.cross(normal / np.sqrt(normal_sq), axis_u)
+
+    # 法線の周りに start -> via -> end の順で回る角度
+    offset = end - center
+    sweep = np.mod(np.arctan2(offset @ axis_v, offset @ axis_u), 2*np.pi)
+
+    times = sample_times(0.0, duration, dt)
+    angle = sweep * time_profile(times / duration, profile)
+    points = center + radius * (np.cos(angle)[:, None] * axis_u +
+                                np.sin(angle)[:, None] * axis_v)
+    return solve_path(robot, points, times, pitch, current, max_jump)
+
+
+def retime(path, rate=100.0, max_velocity=None, max_acceleration=None,
+           curvature_share=0.5):
+    """
+    関節の速度・加速度の制限内で最短時間になるよう軌道の時刻を付け直す
+
+    経路(関節角度の列)を関節空間の弧長 s でパラメータ化し、
+    ds/dt の上限を前進・後退の2回の走査で求める(TOPP と同様の考え方)。
+    加速度の制限は curvature_share の割合を経由点での向きの変化に、
+    残りを経路に沿った加減速に割り当てる(安全側の近似)。
+    走査の漸化式は累積和と累積最小値で一括計算する。
+    経由点の間の区間は台形の速度(加速・等速・減速)で進むため、
+    折れ線の角で減速しても区間の中では速度の上限まで加速する。
+    出力を rate で差分した速度・加速度も制限内に収まる
+
+    パラメータ:
+        path: 関節角度の列 [rad] 形状 (N, 4) (Trajectory も可、時刻は無視)
+              始点・終点では停止する
+        rate: 出力の制御周期 [Hz]
+        max_velocity: 各軸の最大角速度 [rad/s] 形状 (4,)
+                      (省略時は RobotConfig.get_max_velocity_rad())
+        max_acceleration: 各軸の最大角加速度 [rad/s^2] 形状 (4,)
+                          (省略時は RobotConfig.get_max_acceleration_rad())
+        curvature_share: 加速度の制限のうち経路の曲がりに割り当てる割合
+
+    戻り値:
+        Trajectory (1 / rate 間隔の時刻と関節角度)
+    """
+    if not 0.0 < curvature_share < 1.0:
+        raise ValueError(
+            f"curvature_share must be in (0, 1), got {curvature_share}")
+    if max_velocity is None:
+        max_velocity = RobotConfig.get_max_velocity_rad()
+    if max_acceleration is None:
+        max_acceleration = RobotConfig.get_max_acceleration_rad()
+    max_velocity = np.asarray(max_velocity, dtype=float)
+    max_acceleration = np.asarray(max_acceleration, dtype=float)
+
+    angles = _as_joint_array(getattr(path, 'angles', path))
+    # 同じ姿勢が続くサンプルは経路上の同じ点なので除く
+    length = np.linalg.norm(np.diff(angles, axis=0), axis=1)
+    angles = angles[np.concatenate([[True], length > 0])]
+    if len(angles) < 2:
+        return Trajectory(np.zeros(len(angles)), angles)
+    ds = length[length > 0]
+
+    # 区間ごとの向き(出力は区間内で直線補間するので、関節速度は
+    # direction * ds/dt)と、経由点での向きの変化
+    direction = np.diff(angles, axis=0) / ds[:, None]
+    steepest = np.abs(direction)
+    vertex = np.vstack([steepest[:1],
+                        np.maximum(steepest[:-1], steepest[1:]),
+                        steepest[-1:]])
+    turn = np.zeros_like(angles)
+    turn[1:-1] = np.abs(np.diff(direction, axis=0))
+    spacing = np.concatenate([[1.0], 0.5 * (ds[:-1] + ds[1:]), [1.0]])
+    # 制御周期の差分による加速度は、経由点1つの向きの変化 v * turn * rate
+    # と、1周期に複数の経由点を通る場合の曲がり v^2 * turn / spacing
+    # の和で抑えられる(v = ds/dt)。和が curvature_share * 最大加速度
+    # 以下となる v の上限(2次方程式の正の解)
+    share = curvature_share * max_acceleration
+    linear = rate * turn
+    quadratic = turn / spacing[:, None]
+    with np.errstate(divide='ignore'):
+        # (ds/dt)^2 の上限: 速度の制限と、曲がりによる加速度の制限
+        limit = np.minimum(
+            np.min((max_velocity / vertex) ** 2, axis=1),
+            np.min((2 * share / (linear + np.sqrt(
+                linear ** 2 + 4 * quadratic * share))) ** 2, axis=1))
+        # 区間ごとの経路に沿った加速度 d2s/dt2 の上限
+        accel = np.min((1 - curvature_share) * max_acceleration / steepest,
+                       axis=1)
+    limit[[0, -1]] = 0.0
+
+    # x = (ds/dt)^2 は区間で x[i+1] <= x[i] + 2 a ds (前進)、
+    # x[i] <= x[i+1] + 2 a ds (後退)。cumulative[i] = Σ_{m<i} 2 a ds として
+    # 前進は x[i] = min_{k<=i}(limit[k] - cumulative[k]) + cumulative[i]、
+    # 後退は x[i] = min_{k>=i}(x[k] + cumulative[k]) - cumulative[i]
+    cumulative = np.concatenate([[0.0], np.cumsum(2 * accel * ds)])
+    forward = np.minimum.accumulate(limit - cumulative) + cumulative
+    backward = np.minimum.accumulate(
+        (forward + cumulative)[::-1])[::-1] - cumulative
+    speed = np.sqrt(np.maximum(backward, 0.0))
+
+    # 区間内は台形の速度(speed[i] から加速し、区間の速度の上限で等速、
+    # speed[i+1] まで減速)。経由点の速度が曲がりで抑えられていても、
+    # 区間の中では速度・加速度の上限まで速くなる
+    with np.errstate(divide='ignore'):
+        cruise_limit = np.min(max_velocity / steepest, axis=1)
+    start_speed, end_speed = speed[:-1], speed[1:]
+    peak = np.minimum(cruise_limit, np.sqrt(
+        (2 * accel * ds + start_speed ** 2 + end_speed ** 2) / 2))
+    # 前進・後退の走査により peak >= 両端の速度(丸め誤差のみ補正)
+    peak = np.maximum(peak, np.maximum(start_speed, end_speed))
+    accel_time = (peak - start_speed) / accel
+    decel_time = (peak - end_speed) / accel
+    accel_distance = (peak ** 2 - start_speed ** 2) / (2 * accel)
+    decel_distance = (peak ** 2 - end_speed ** 2) / (2 * accel)
+    cruise_distance = np.maximum(ds - accel_distance - decel_distance, 0.0)
+    cruise_time = cruise_distance / peak
+    duration = accel_time + cruise_time + decel_time
+    times = np.concatenate([[0.0], np.cumsum(duration)])
+
+    # 制御周期の時刻での s を求め、経路上で補間する
+    samples = sample_times(0.0, times[-1], 1.0 / rate)
+    segment = np.clip(np.searchsorted(times, samples, side='right') - 1,
+                      0, len(ds) - 1)
+    tau = samples - times[segment]
+    v0 = start_speed[segment]
+    vp = peak[segment]
+    a = accel[segment]
+    t1 = accel_time[segment]
+    t2 = t1 + cruise_time[segment]
+    d1 = accel_distance[segment]
+    d2 = d1 + cruise_distance[segment]
+    decel_tau = np.maximum(tau - t2, 0.0)
+    progress = np.where(
+        tau < t1, v0 * tau + 0.5 * a * tau * tau,
+        np.where(tau < t2, d1 + vp * (tau - t1),
+                 d2 + vp * decel_tau - 0.5 * a * decel_tau ** 2))
+    fraction = np.clip(progress / ds[segment], 0.0, 1.0)[:, None]
+    resampled = angles[segment] + \
+        (angles[segment + 1] - angles[segment]) * fraction
+    return Trajectory(samples, resampled)
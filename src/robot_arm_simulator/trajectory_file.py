@@ -0,0 +1,446 @@
+"""
+ロボットアーム 軌道のバイナリファイル
+長い軌道をタプルのリストや pickle で保存するとメモリと読み込み時間が
+サンプル数に比例して増えるため、列(時刻・関節ごと)単位の
+バイナリ形式で保存し、読み込み側はメモリマップで必要なフレームのみを読む
+
+ファイルの構成(数値は全てリトルエンディアン):
+    ヘッダー: マジック b'RATRAJ' + 版数 (uint16) + JSON の長さ (uint32)
+              + JSON(関節数・数値型・圧縮方式・リンク長・角度制限など)
+              (8 byte 境界まで空白で埋める)
+    チャンク: b'CHNK' + フレーム数 (uint32) + データ長 (uint64) + データ
+              データは時刻 [s] (float64 × n) と関節角度 [rad]
+              (関節ごとに n 個ずつ並べた列) を続けたもので、
+              圧縮する場合はこれを zlib / lzma で圧縮したもの
+              (8 byte 境界まで 0 で埋める)
+チャンクはファイル末尾に追記していくため、追記時にヘッダーを書き直さない
+(書き込み途中で終了した末尾の不完全なチャンクは読み込み時に無視する)
+"""
+
+import bisect
+import json
+import os
+import struct
+
+import numpy as np
+
+# ファイルの拡張子
+TRAJECTORY_EXTENSION = '.rtraj'
+
+# 対応する圧縮方式 (None は圧縮なし、メモリマップのまま読む)
+COMPRESSIONS = (None, 'zlib', 'lzma')
+
+# 関節角度の数値型
+DTYPES = ('float32', 'float64')
+
+_MAGIC = b'RATRAJ'
+_VERSION = 1
+_HEADER = struct.Struct('<6sHI')
+_CHUNK_MAGIC = b'CHNK'
+_CHUNK = struct.Struct('<4sIQ')
+_ALIGNMENT = 8
+
+
+def _padding(size):
+    """size を 8 byte 境界にそろえるための埋め草の長さ"""
+    return -size % _ALIGNMENT
+
+
+def _compressor(compression):
+    """圧縮方式のモジュール (zlib / lzma、圧縮なしは None)"""
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Unknown compression: {compression}")
+    if compression is None:
+        return None
+    import importlib
+    return importlib.import_module(compression)
+
+
+def _read_header(file):
+    """
+    ヘッダーを読み込む
+
+    戻り値:
+        header: ヘッダーの辞書
+        size: ヘッダーの長さ(最初のチャンクの位置) [byte]
+    """
+    fixed = file.read(_HEADER.size)
+    if len(fixed) < _HEADER.size:
+        raise ValueError("Not a trajectory file (too short)")
+    magic, version, length = _HEADER.unpack(fixed)
+    if magic != _MAGIC:
+        raise ValueError("Not a trajectory file (bad magic)")
+    if version != _VERSION:
+        raise ValueError(f"Unsupported trajectory file version: {version}")
+    header = json.loads(file.read(length).decode('utf-8'))
+    size = _HEADER.size + length
+    return header, size + _padding(size)
+
+
+def _scan_chunks(file, start, file_size):
+    """
+    チャンクの位置を列挙(末尾の不完全なチャンクは除く)
+
+    戻り値:
+        chunks: [(データの位置, フレーム数, データ長), ...]
+        end: 最後の完全なチャンクの終端(埋め草を含む)の位置 [byte]
+    """
+    chunks = []
+    offset = start
+    while offset + _CHUNK.size <= file_size:
+        file.seek(offset)
+        magic, frames, length = _CHUNK.unpack(file.read(_CHUNK.size))
+        if magic != _CHUNK_MAGIC:
+            raise ValueError(f"Corrupt trajectory file at byte {offset}")
+        end = offset + _CHUNK.size + length
+        if end > file_size:
+            break
+        chunks.append((offset + _CHUNK.size, frames, length))
+        offset = end + _padding(length)
+    return chunks, offset
+
+
+class TrajectoryWriter:
+    """
+    軌道のバイナリファイルへの書き込み
+
+    write() に渡した配列を chunk_frames フレームごとのチャンクとして
+    ファイル末尾に書き込む(バッファに溜めないため、メモリ使用量は
+    1回に渡す配列の大きさのみ)
+
+    パラメータ:
+        path: 保存先パス
+        robot: リンク長・角度制限をヘッダーに記録するロボット
+               (ThreeAxisKinematics / SerialChain、省略可)
+        joints: 関節数
+        dtype: 関節角度の数値型 ('float32' / 'float64')
+        compression: 圧縮方式 (COMPRESSIONS のいずれか)
+        chunk_frames: 1チャンクあたりの最大フレーム数
+        append: 既存のファイルに追記するか
+                (関節数・数値型・圧縮方式は既存のファイルに合わせる)
+        metadata: ヘッダーに記録する任意の情報(JSON に変換できる辞書)
+
+    属性:
+        frames: 書き込んだフレーム数(追記の場合は既存分を含む)
+    """
+
+    def __init__(self, path, robot=None, joints=4, dtype='float32',
+                 compression=None, chunk_frames=65536, append=False,
+                 metadata=None):
+        """コンストラクタ"""
+        if chunk_frames < 1:
+            raise ValueError(
+                f"chunk_frames must be >= 1, got {chunk_frames}")
+        self.path = os.fspath(path)
+        self.chunk_frames = chunk_frames
+        self.frames = 0
+
+        if append and os.path.exists(self.path) and \
+                os.path.getsize(self.path) > 0:
+            self._file = open(self.path, 'r+b')
+            header, start = _read_header(self._file)
+            chunks, end = _scan_chunks(
+                self._file, start, os.path.getsize(self.path))
+            # 不完全なチャンクを切り詰めてから追記する
+            # (末尾の埋め草が欠けている場合は 0 で延長される)
+            self._file.truncate(end)
+            self._file.seek(end)
+            self.frames = sum(frames for _, frames, _ in chunks)
+        else:
+            if dtype not in DTYPES:
+                raise ValueError(f"Unknown dtype: {dtype}")
+            _compressor(compression)
+            header = {'joints': int(joints), 'dtype': dtype,
+                      'compression': compression}
+            if robot is not None:
+                if hasattr(robot, 'link_lengths'):
+                    lengths = robot.link_lengths()
+                else:
+                    lengths = (robot.link1, robot.link2, robot.link3)
+                header['link_lengths'] = [float(value) for value in lengths]
+                lower, upper = robot.joint_limits()
+                header['lower'] = [float(value) for value in lower]
+                header['upper'] = [float(value) for value in upper]
+            if metadata:
+                header['metadata'] = metadata
+            encoded = json.dumps(header, ensure_ascii=False).encode('utf-8')
+            size = _HEADER.size + len(encoded)
+            self._file = open(self.path, 'wb')
+            self._file.write(_HEADER.pack(_MAGIC, _VERSION, len(encoded)))
+            self._file.write(encoded + b' ' * _padding(size))
+
+        self.joints = header['joints']
+        self.dtype = np.dtype(header['dtype']).newbyteorder('<')
+        self.compression = header['compression']
+        self._compressor = _compressor(self.compression)
+
+    def write(self, times, angles):
+        """
+        フレームを書き込む
+
+        パラメータ:
+            times: 時刻 [s] 形状 (N,)
+            angles: 関節角度 [rad] 形状 (N, joints)
+        """
+        if self._file is None:
+            raise ValueError("TrajectoryWriter is closed")
+        times = np.asarray(times, dtype='<f8')
+        angles = np.asarray(angles, dtype=self.dtype)
+        if angles.ndim != 2 or angles.shape[1] != self.joints or \
+                times.shape != (len(angles),):
+            raise ValueError(
+                f"times/angles must have shapes (N,)/(N, {self.joints}), "
+                f"got {times.shape}/{angles.shape}")
+        for start in range(0, len(angles), self.chunk_frames):
+            stop = start + self.chunk_frames
+            self._write_chunk(times[start:stop], angles[start:stop])
+
+    def _write_chunk(self, times, angles):
+        """1チャンクを書き込む"""
+        # 列単位で並べる(関節ごとに連続)
+        payload = times.tobytes() + angles.T.tobytes()
+        if self._compressor is not None:
+            payload = self._compressor.compress(payload)
+        self._file.write(_CHUNK.pack(_CHUNK_MAGIC, len(times), len(payload)))
+        self._file.write(payload)
+        self._file.write(b'\0' * _padding(len(payload)))
+        self.frames += len(times)
+
+    def flush(self):
+        """書き込んだチャンクをファイルへ反映"""
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self):
+        """ファイルを閉じる"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __repr__(self):
+        return (f'TrajectoryWriter(path={self.path!r}, frames={self.frames}, '
+                f'dtype={self.dtype.name}, compression={self.compression})')
+
+
+class TrajectoryFile:
+    """
+    軌道のバイナリファイルの読み込み
+
+    ファイル全体をメモリマップし、開くときはチャンクの位置のみを読む。
+    animate_trajectory や export_trajectory にそのまま渡せる
+    (len() と添字で各フレームの (theta1, ..., theta4) を取得できる)。
+    圧縮したファイルは直前に使ったチャンクのみを展開して保持するため、
+    順に読む場合のメモリ使用量はファイルの大きさによらない
+
+    パラメータ:
+        path: ファイルパス
+
+    属性:
+        joints: 関節数
+        dtype: 関節角度の数値型
+        compression: 圧縮方式
+        link_lengths: リンク長 [mm] (記録されていない場合は None)
+        lower, upper: 角度制限 [rad] (記録されていない場合は None)
+        metadata: 任意の情報の辞書
+    """
+
+    def __init__(self, path):
+        """コンストラクタ"""
+        self.path = os.fspath(path)
+        with open(self.path, 'rb') as file:
+            header, start = _read_header(file)
+            chunks, _ = _scan_chunks(file, start, os.path.getsize(self.path))
+        self.joints = header['joints']
+        self.dtype = np.dtype(header['dtype']).newbyteorder('<')
+        self.compression = header['compression']
+        self.link_lengths = header.get('link_lengths')
+        self.lower = header.get('lower')
+        self.upper = header.get('upper')
+        self.metadata = header.get('metadata', {})
+        self._compressor = _compressor(self.compression)
+
+        self._chunks = chunks
+        # チャンクの先頭フレームの番号(添字からチャンクを二分探索する)
+        self._starts = []
+        count = 0
+        for _, frames, _ in chunks:
+            self._starts.append(count)
+            count += frames
+        self._count = count
+        self._map = (np.memmap(self.path, dtype=np.uint8, mode='r')
+                     if chunks else None)
+        self._cached = (None, None, None)
+
+    def _load(self, index):
+        """
+        チャンクの時刻と関節角度
+
+        戻り値:
+            times: 時刻 [s] 形状 (n,)
+            angles: 関節角度 [rad] 形状 (joints, n) (関節ごとの列)
+        """
+        if self._cached[0] == index:
+            return self._cached[1], self._cached[2]
+        offset, frames, length = self._chunks[index]
+        if self._compressor is None:
+            buffer = self._map
+        else:
+            buffer = np.frombuffer(self._compressor.decompress(
+                self._map[offset:offset + length]), dtype=np.uint8)
+            offset = 0
+        times = np.frombuffer(buffer, dtype='<f8', count=frames,
+                              offset=offset)
+        angles = np.frombuffer(
+            buffer, dtype=self.dtype, count=frames * self.joints,
+            offset=offset + times.nbytes).reshape(self.joints, frames)
+        self._cached = (index, times, angles)
+        return times, angles
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        """
+        フレームの関節角度
+
+        パラメータ:
+            index: フレーム番号(負の値は末尾から)
+
+        戻り値:
+            angles: 関節角度 [rad] 形状 (joints,)
+        """
+        index = int(index)
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError(f"frame index out of range: {index}")
+        chunk = bisect.bisect_right(self._starts, index) - 1
+        _, angles = self._load(chunk)
+        return angles[:, index - self._starts[chunk]]
+
+    def __iter__(self):
+        for _, angles in self.chunks():
+            yield from angles
+
+    def chunks(self):
+        """
+        チャンクごとの時刻と関節角度を順に返すジェネレータ
+
+        戻り値:
+            (times, angles): 時刻 [s] 形状 (n,) と
+                             関節角度 [rad] 形状 (n, joints)
+        """
+        for index in range(len(self._chunks)):
+            times, angles = self._load(index)
+            yield times, angles.T
+
+    def read(self, start=0, stop=None):
+        """
+        フレームの範囲をまとめて読む
+
+        パラメータ:
+            start, stop: フレーム番号の範囲 (stop は含まない、省略時は末尾)
+
+        戻り値:
+            times: 時刻 [s] 形状 (n,)
+            angles: 関節角度 [rad] 形状 (n, joints)
+        """
+        start, stop, _ = slice(start, stop).indices(self._count)
+        stop = max(start, stop)
+        times = np.empty(stop - start)
+        angles = np.empty((stop - start, self.joints), dtype=self.dtype)
+        first = max(bisect.bisect_right(self._starts, start) - 1, 0)
+        for chunk in range(first, len(self._chunks)):
+            base = self._starts[chunk]
+            if base >= stop:
+                break
+            chunk_times, chunk_angles = self._load(chunk)
+            low = max(start - base, 0)
+            high = min(stop - base, len(chunk_times))
+            times[base + low - start:base + high - start] = \
+                chunk_times[low:high]
+            angles[base + low - start:base + high - start] = \
+                chunk_angles[:, low:high].T
+        return times, angles
+
+    @property
+    def duration(self):
+        """軌道の長さ [s]"""
+        if self._count < 2:
+            return 0.0
+        first = self._load(0)[0][0]
+        last = self._load(len(self._chunks) - 1)[0][-1]
+        return float(last - first)
+
+    @property
+    def interval(self):
+        """平均のサンプル間隔 [ms] (animate_trajectory の interval 用)"""
+        if self._count < 2:
+            return 0.0
+        return 1000.0 * self.duration / (self._count - 1)
+
+    def close(self):
+        """メモリマップを解放(取得済みの配列は参照が残る間は有効)"""
+        self._map = None
+        self._cached = (None, None, None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __repr__(self):
+        return (f'TrajectoryFile(path={self.path!r}, frames={self._count}, '
+                f'chunks={len(self._chunks)}, dtype={self.dtype.name}, '
+                f'compression={self.compression})')
+
+
+def save_trajectory(path, trajectory, times=None, robot=None, **options):
+    """
+    軌道をバイナリファイルに保存
+
+    パラメータ:
+        path: 保存先パス
+        trajectory: Trajectory または [(theta1, ..., theta4), ...] の軌道
+        times: 時刻 [s] (省略時は trajectory.times、なければ 0, 1, 2, ...)
+        robot: リンク長・角度制限をヘッダーに記録するロボット
+        options: TrajectoryWriter のその他の引数 (dtype, compression など)
+
+    戻り値:
+        frames: 保存したフレーム数
+    """
+    angles = np.asarray(getattr(trajectory, 'angles', trajectory),
+                        dtype=float)
+    if angles.ndim != 2:
+        raise ValueError(
+            f"trajectory must have shape (N, joints), got {angles.shape}")
+    if times is None:
+        times = getattr(trajectory, 'times', None)
+    if times is None:
+        times = np.arange(len(angles), dtype=float)
+    with TrajectoryWriter(path, robot=robot, joints=angles.shape[1],
+                          **options) as writer:
+        writer.write(times, angles)
+        return writer.frames
+
+
+def open_trajectory(trajectory):
+    """
+    パスの場合は TrajectoryFile として開き、それ以外はそのまま返す
+
+    パラメータ:
+        trajectory: 軌道またはバイナリファイルのパス
+
+    戻り値:
+        trajectory: len() と添字で関節角度を取得できる軌道
+    """
+    if isinstance(trajectory, (str, os.PathLike)):
+        return TrajectoryFile(trajectory)
+    return trajectory
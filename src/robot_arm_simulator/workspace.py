@@ -0,0 +1,671 @@
+"""
+ロボットアーム 到達可能領域(ワークスペース)
+関節の角度制限内で手先が到達できる領域をボクセルで表し、
+ディスク上にメモリマップ(.npy)としてキャッシュする
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+from robot_arm_simulator.kinematics import damped_least_squares_step
+
+# キャッシュ形式のバージョン(計算方法を変えたら上げる)
+CACHE_VERSION = 2
+
+# 既定のキャッシュディレクトリ
+DEFAULT_CACHE_DIR = os.path.join(
+    os.path.expanduser('~'), '.cache', 'robot_arm_simulator')
+
+# 一度に順運動学を計算するサンプル数(メモリ使用量の上限)
+_FK_CHUNK = 1 << 18
+
+
+def _in_range(angles, angle_min, angle_max):
+    """角度(2π の周期を考慮)が範囲内かを判定"""
+    return ((angle_min <= angles) & (angles <= angle_max)) | \
+        ((angle_min <= angles - 2*np.pi) & (angles - 2*np.pi <= angle_max)) | \
+        ((angle_min <= angles + 2*np.pi) & (angles + 2*np.pi <= angle_max))
+
+
+def robot_parameters(robot):
+    """
+    到達可能領域を決めるロボットのパラメータを取得
+
+    パラメータ:
+        robot: ThreeAxisKinematics インスタンス
+
+    戻り値:
+        params: リンク長 [mm] と角度制限 [rad] の辞書
+    """
+    return {
+        'links': [float(robot.link1), float(robot.link2), float(robot.link3)],
+        'limits': [[float(robot.theta1_min), float(robot.theta1_max)],
+                   [float(robot.theta2_min), float(robot.theta2_max)],
+                   [float(robot.theta3_min), float(robot.theta3_max)],
+                   [float(robot.theta4_min), float(robot.theta4_max)]],
+    }
+
+
+def cache_key(robot, resolution):
+    """
+    キャッシュのキー(リンク長・角度制限・分解能のハッシュ)を作成
+
+    パラメータ:
+        robot: ThreeAxisKinematics インスタンス
+        resolution: ボクセルの一辺 [mm]
+
+    戻り値:
+        key: 16進文字列
+    """
+    params = robot_parameters(robot)
+    params['resolution'] = float(resolution)
+    params['version'] = CACHE_VERSION
+    text = json.dumps(params, sort_keys=True)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+
+
+class ReachabilityMap:
+    """
+    到達可能領域のボクセルマップ
+
+    grid[i, j, k] はボクセル中心
+    origin + (i + 0.5, j + 0.5, k + 0.5) * resolution に手先が
+    到達可能かを表す
+
+    パラメータ:
+        grid: 到達可能フラグ 形状 (nx, ny, nz) の bool 配列(メモリマップ可)
+        origin: グリッドの最小角の座標 [mm]
+        resolution: ボクセルの一辺 [mm]
+    """
+
+    def __init__(self, grid, origin, resolution):
+        """コンストラクタ"""
+        self.grid = grid
+        self.origin = np.asarray(origin, dtype=float)
+        self.resolution = float(resolution)
+
+    @staticmethod
+    def grid_geometry(robot, resolution):
+        """
+        ロボットの最大到達距離を覆うグリッドの原点と形状を計算
+
+        パラメータ:
+            robot: ThreeAxisKinematics インスタンス
+            resolution: ボクセルの一辺 [mm]
+
+        戻り値:
+            origin: グリッドの最小角の座標 [mm]
+            shape: グリッドの形状 (nx, ny, nz)
+        """
+        max_reach = float(robot.link1 + robot.link2 + robot.link3)
+        cells = int(np.ceil(2 * max_reach / resolution))
+        origin = np.full(3, -cells * resolution / 2)
+        return origin, (cells, cells, cells)
+
+    @classmethod
+    def build(cls, robot, resolution=5.0, out=None):
+        """
+        関節空間のサンプリングから到達可能領域を計算
+
+        第1軸(Z軸周り)の回転はリンクの姿勢を変えないため、
+        第2〜4軸をサンプリングした順運動学で垂直断面(半径・高さ)の
+        到達可能領域を求め、第1軸の角度制限内で回転させて3次元にする
+
+        パラメータ:
+            robot: ThreeAxisKinematics インスタンス
+            resolution: ボクセルの一辺 [mm]
+            out: 結果を書き込む bool 配列(省略時は新規作成)
+
+        戻り値:
+            ReachabilityMap
+        """
+        origin, shape = cls.grid_geometry(robot, resolution)
+        section = cls._build_section(robot, resolution, origin, shape)
+
+        grid = np.zeros(shape, dtype=bool) if out is None else out
+        centers = [origin[axis] + (np.arange(shape[axis]) + 0.5) * resolution
+                   for axis in range(3)]
+        x, y = np.meshgrid(centers[0], centers[1], indexing='ij')
+        phi = np.arctan2(y, x)
+        # ボクセル内の Z軸からの距離の範囲(最近点と最遠点)
+        half = resolution / 2
+        near_x = np.maximum(np.abs(x) - half, 0.0)
+        near_y = np.maximum(np.abs(y) - half, 0.0)
+        rho_min = np.hypot(near_x, near_y)
+        rho_max = np.hypot(np.abs(x) + half, np.abs(y) + half)
+
+        # 断面の半径方向のインデックス範囲(正負の両側)
+        def section_range(r_low, r_high):
+            low = np.floor((r_low - origin[0]) / resolution).astype(np.intp)
+            high = np.floor((r_high - origin[0]) / resolution).astype(np.intp)
+            return (np.clip(low, 0, shape[0] - 1),
+                    np.clip(high, 0, shape[0] - 1))
+
+        ranges = [section_range(rho_min, rho_max),
+                  section_range(-rho_max, -rho_min)]
+        allowed = [
+            _in_range(phi, robot.theta1_min, robot.theta1_max),
+            _in_range(np.where(phi > 0, phi - np.pi, phi + np.pi),
+                      robot.theta1_min, robot.theta1_max)]
+        max_span = max(int((high - low).max()) for low, high in ranges)
+
+        # 高さごとに断面の到達可能フラグを XY 平面へ展開する
+        # (ボクセルが断面のどれかのセルにかかっていれば到達可能)
+        for k in range(shape[2]):
+            column = section[:, k]
+            layer = np.zeros(shape[:2], dtype=bool)
+            for (low, high), ok in zip(ranges, allowed):
+                for offset in range(max_span + 1):
+                    index = np.minimum(low + offset, high)
+                    layer |= ok & column[index]
+            grid[:, :, k] = layer
+        return cls(grid, origin, resolution)
+
+    @staticmethod
+    def _build_section(robot, resolution, origin, shape):
+        """
+        第1軸を固定したときの垂直断面(符号付き半径・高さ)の到達可能領域
+
+        各関節の刻みは、その関節より先のリンク長で動く手先の移動量が
+        ボクセルの半分以下になるように決める。複数の関節が同時に動くと
+        到達可能な点と最も近いサンプルの距離は最大 3/4 ボクセルになり、
+        サンプルが隣のセルに入ることがあるため、結果を1セル膨張させる
+        (到達可能な点のセルは必ず含まれ、境界が最大1セル外側に広がる)
+        """
+        lever = [robot.link1 + robot.link2 + robot.link3,
+                 robot.link2 + robot.link3,
+                 robot.link3]
+        limits = [(robot.theta2_min, robot.theta2_max),
+                  (robot.theta3_min, robot.theta3_max),
+                  (robot.theta4_min, robot.theta4_max)]
+        axes = []
+        for (angle_min, angle_max), length in zip(limits, lever):
+            steps = int(np.ceil((angle_max - angle_min) * length /
+                                (resolution / 2))) + 1
+            axes.append(np.linspace(angle_min, angle_max, max(steps, 2)))
+
+        theta1 = float(np.clip(0.0, robot.theta1_min, robot.theta1_max))
+        cos_theta1 = np.cos(theta1)
+        sin_theta1 = np.sin(theta1)
+        section = np.zeros((shape[0], shape[2]), dtype=bool)
+
+        theta3, theta4 = np.meshgrid(axes[1], axes[2], indexing='ij')
+        theta3 = theta3.ravel()
+        theta4 = theta4.ravel()
+        rows_per_chunk = max(1, _FK_CHUNK // theta3.size)
+        for start in range(0, axes[0].size, rows_per_chunk):
+            theta2 = axes[0][start:start + rows_per_chunk]
+            thetas = np.empty((theta2.size * theta3.size, 4))
+            thetas[:, 0] = theta1
+            thetas[:, 1] = np.repeat(theta2, theta3.size)
+            thetas[:, 2] = np.tile(theta3, theta2.size)
+            thetas[:, 3] = np.tile(theta4, theta2.size)
+            end = robot.forward_kinematics_batch(thetas)[:, -1]
+            r = end[:, 0] * cos_theta1 + end[:, 1] * sin_theta1
+            i = np.floor((r - origin[0]) / resolution).astype(np.intp)
+            k = np.floor((end[:, 2] - origin[2]) / resolution).astype(np.intp)
+            inside = (i >= 0) & (i < shape[0]) & (k >= 0) & (k < shape[2])
+            section[i[inside], k[inside]] = True
+
+        # 1セルの膨張(3x3、軸ごとに分けて計算)
+        dilated = section.copy()
+        dilated[1:] |= section[:-1]
+        dilated[:-1] |= section[1:]
+        section = dilated.copy()
+        section[:, 1:] |= dilated[:, :-1]
+        section[:, :-1] |= dilated[:, 1:]
+        return section
+
+    @classmethod
+    def load(cls, robot, resolution=5.0, cache_dir=None):
+        """
+        キャッシュから到達可能領域を読み込む(なければ計算して保存)
+
+        キャッシュはリンク長・角度制限・分解能のハッシュをキーとした
+        .npy ファイルで、メモリマップで読み込むため読み込みは一瞬で終わる。
+        リンク長や角度制限が変わるとキーが変わり、再計算される
+
+        パラメータ:
+            robot: ThreeAxisKinematics インスタンス
+            resolution: ボクセルの一辺 [mm]
+            cache_dir: キャッシュディレクトリ(省略時は DEFAULT_CACHE_DIR)
+
+        戻り値:
+            ReachabilityMap
+        """
+        if cache_dir is None:
+            cache_dir = DEFAULT_CACHE_DIR
+        path = os.path.join(cache_dir,
+                            f'reach_{cache_key(robot, resolution)}.npy')
+        origin, shape = cls.grid_geometry(robot, resolution)
+
+        if not os.path.exists(path):
+            os.makedirs(cache_dir, exist_ok=True)
+            # 書き込み途中のファイルを読み込まないよう、一時ファイルに
+            # 書き込んでから置き換える
+            temp_path = f'{path}.{os.getpid()}.tmp'
+            grid = np.lib.format.open_memmap(
+                temp_path, mode='w+', dtype=bool, shape=shape)
+            cls.build(robot, resolution, out=grid)
+            grid.flush()
+            del grid
+            os.replace(temp_path, path)
+
+        grid = np.load(path, mmap_mode='r')
+        if grid.shape != shape:
+            raise ValueError(f"Cache file has unexpected shape: {path}")
+        return cls(grid, origin, resolution)
+
+    def voxel_index(self, points):
+        """
+        座標をボクセルのインデックスに変換
+
+        パラメータ:
+            points: 座標 [mm] 形状 (N, 3)
+
+        戻り値:
+            index: インデックス 形状 (N, 3)
+            inside: グリッドの範囲内か 形状 (N,)
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 3)
+        with np.errstate(invalid='ignore'):
+            index = np.floor((points - self.origin) / self.resolution)
+        inside = np.all((index >= 0) & (index < self.grid.shape), axis=1)
+        index = np.where(inside[:, None], index, 0).astype(np.intp)
+        return index, inside
+
+    def is_reachable(self, points):
+        """
+        座標が到達可能領域内かを判定(1点あたり O(1))
+
+        パラメータ:
+            points: 座標 [mm] 形状 (N, 3) または (3,)
+
+        戻り値:
+            reachable: 到達可能か 形状 (N,) (1点の場合は bool)
+        """
+        single = np.ndim(points) == 1
+        index, inside = self.voxel_index(points)
+        reachable = inside & self.grid[index[:, 0], index[:, 1], index[:, 2]]
+        return bool(reachable[0]) if single else reachable
+
+    def reachable_points(self):
+        """
+        到達可能なボクセルの中心座標を取得
+
+        戻り値:
+            points: 座標 [mm] 形状 (M, 3)
+        """
+        index = np.argwhere(self.grid)
+        return self.origin + (index + 0.5) * self.resolution
+
+
+def _nearest_in_range(angles, angle_min, angle_max):
+    """
+    範囲内で最も近い角度(2π の周期を考慮)を取得
+
+    戻り値:
+        nearest: 範囲内の角度 [rad]
+        gap: 元の角度との差の絶対値 [rad] (0 - π)
+    """
+    shifted = angle_min + np.mod(angles - angle_min, 2*np.pi)
+    to_max = shifted - angle_max
+    to_min = angle_min + 2*np.pi - shifted
+    inside = to_max <= 0
+    nearest = np.where(inside, shifted,
+                       np.where(to_max <= to_min, angle_max, angle_min))
+    gap = np.where(inside, 0.0, np.minimum(to_max, to_min))
+    return nearest, gap
+
+
+def _ring_offsets(radius):
+    """チェビシェフ距離がちょうど radius のセルのオフセット 形状 (K, 2)"""
+    if radius == 0:
+        return np.zeros((1, 2), dtype=np.intp)
+    steps = np.arange(-radius, radius + 1)
+    i, k = np.meshgrid(steps, steps, indexing='ij')
+    offsets = np.stack([i.ravel(), k.ravel()], axis=1)
+    return offsets[np.abs(offsets).max(axis=1) == radius]
+
+
+class NearestReachableIndex:
+    """
+    目標に最も近い到達可能点を探すための空間インデックス
+
+    ReachabilityMap と同様に第1軸を除いた垂直断面で考える。第2〜4軸の
+    サンプリングで得た手先位置(半径・高さ)を、半径の正負ごとに一様グリッドの
+    バケット(1セルあたり最大 bucket_size 点)へ格納しておき、目標を含むセルから
+    外側へ順に探索する。第1軸は角度制限内で目標の方位に最も近い角度とする
+
+    パラメータ:
+        robot: ThreeAxisKinematics インスタンス
+        spacing: グリッドのセルの一辺 [mm]
+        bucket_size: 1セルに格納するサンプル数の上限
+    """
+
+    # 一度に距離を計算する候補点の数(メモリ使用量の上限)
+    _QUERY_CHUNK = 1 << 18
+
+    # リングを広げて探索する最大回数(超えた点は全サンプルと比較する)
+    _MAX_RINGS = 4
+
+    def __init__(self, robot, spacing=5.0, bucket_size=8):
+        """コンストラクタ"""
+        self.robot = robot
+        self.spacing = float(spacing)
+        self.bucket_size = int(bucket_size)
+
+        # 断面のグリッド(半径 0 - 最大到達距離、高さ ±最大到達距離)
+        max_reach = float(robot.link1 + robot.link2 + robot.link3)
+        radial = int(np.ceil(max_reach / self.spacing)) + 1
+        self.origin = np.array([0.0, -radial * self.spacing])
+        self.shape = (radial, 2 * radial)
+        cell_count = radial * 2 * radial
+
+        # 半径の正負(第1軸の向き)ごとにセルを分け、末尾に空のセルを1つ置く
+        self._sections = np.full(
+            (2 * cell_count + 1, self.bucket_size, 2), np.inf)
+        self._angles = np.zeros((2 * cell_count + 1, self.bucket_size, 3))
+        self._fill_buckets(*self._sample_section())
+        self._start_radius = self._empty_radius()
+        # 全サンプルとの比較用に、正負の側ごとにサンプルを並べておく
+        cell_count = self.shape[0] * self.shape[1]
+        cells, slots = np.nonzero(np.isfinite(self._sections[:, :, 0]))
+        self._samples = []
+        for side in (cells < cell_count, cells >= cell_count):
+            self._samples.append((self._sections[cells[side], slots[side]],
+                                  cells[side], slots[side]))
+
+    def _sample_section(self):
+        """
+        第2〜4軸を角度制限内で格子状にサンプリングし、断面上の手先位置を計算
+
+        各関節の刻みは、その関節より先のリンク長で動く手先の移動量が
+        セルの一辺以下になるように決める
+        """
+        robot = self.robot
+        lever = [robot.link1 + robot.link2 + robot.link3,
+                 robot.link2 + robot.link3,
+                 robot.link3]
+        lower, upper = robot.joint_limits()
+        axes = []
+        for angle_min, angle_max, length in zip(lower[1:], upper[1:], lever):
+            steps = int(np.ceil((angle_max - angle_min) * length /
+                                self.spacing)) + 1
+            axes.append(np.linspace(angle_min, angle_max, max(steps, 2)))
+        grids = np.meshgrid(*axes, indexing='ij')
+        angles = np.stack([grid.ravel() for grid in grids], axis=1)
+
+        thetas = np.zeros((len(angles), 4))
+        thetas[:, 1:] = angles
+        end = robot.forward_kinematics_batch(thetas)[:, -1]
+        # 第1軸 0 のとき半径方向は X 軸
+        section = end[:, [0, 2]]
+        return section, angles
+
+    def _fill_buckets(self, section, angles):
+        """サンプルを半径の正負ごとにセルへ振り分け、bucket_size 点まで格納"""
+        cells = []
+        points = []
+        values = []
+        for side, sign in enumerate((1.0, -1.0)):
+            mask = sign * section[:, 0] >= 0
+            point = section[mask] * np.array([sign, 1.0])
+            cells.append(self._cell_id(point, side))
+            points.append(point)
+            values.append(angles[mask])
+        cell = np.concatenate(cells)
+        point = np.concatenate(points)
+        value = np.concatenate(values)
+
+        # セル内の順番(0, 1, ...)を求め、先頭 bucket_size 個を残す
+        order = np.argsort(cell, kind='stable')
+        cell = cell[order]
+        slot = np.arange(len(cell)) - np.searchsorted(cell, cell, side='left')
+        keep = slot < self.bucket_size
+        cell = cell[keep]
+        slot = slot[keep]
+        self._sections[cell, slot] = point[order][keep]
+        self._angles[cell, slot] = value[order][keep]
+        self.sample_count = len(cell)
+
+    def _cell_index(self, points):
+        """断面の座標をセルのインデックス (N, 2) に変換(範囲外は端に丸める)"""
+        index = np.floor((points - self.origin) / self.spacing)
+        return np.clip(index, 0, np.array(self.shape) - 1).astype(np.intp)
+
+    def _cell_id(self, points, side):
+        """断面の座標をセル番号に変換"""
+        index = self._cell_index(points)
+        cell_count = self.shape[0] * self.shape[1]
+        return side * cell_count + np.ravel_multi_index(index.T, self.shape)
+
+    def _empty_radius(self):
+        """
+        各セルから最も近いサンプルのあるセルまでのチェビシェフ距離
+
+        これより内側のリングは空なので、探索をこの距離から始められる
+        """
+        cell_count = self.shape[0] * self.shape[1]
+        occupied = np.isfinite(self._sections[:-1, 0, 0]).reshape(
+            2, *self.shape)
+        radius = np.where(occupied, 0, -1)
+        reached = occupied.copy()
+        for step in range(1, max(self.shape)):
+            if reached.all():
+                break
+            grown = reached.copy()
+            grown[:, 1:] |= reached[:, :-1]
+            grown[:, :-1] |= reached[:, 1:]
+            grown[:, :, 1:] |= grown[:, :, :-1].copy()
+            grown[:, :, :-1] |= grown[:, :, 1:].copy()
+            radius[grown & ~reached] = step
+            reached = grown
+        # サンプルのない側は探索しない
+        radius[radius < 0] = max(self.shape)
+        return radius.reshape(2 * cell_count)
+
+    def _search(self, points, side, offset_sq, owner, count):
+        """
+        断面上の点に最も近いサンプルを探索
+
+        目標ごとに正負の両側を同時に探索する。探索済みのリングの外側の
+        サンプルまでの距離の2乗は offset_sq + (点からグリッドまで)^2 +
+        (radius * spacing)^2 以上であるため、目標の最良値がこれ以下に
+        なった時点でその側の探索を終える。グリッドから遠い点はリングが
+        広がり続けるため、_MAX_RINGS を超えたら全サンプルと比較する
+
+        パラメータ:
+            points: 断面上の点 (半径, 高さ) [mm] 形状 (M, 2)
+            side: 半径の正負 (0: 正, 1: 負) 形状 (M,)
+            offset_sq: 断面外の距離の2乗 [mm^2] 形状 (M,)
+            owner: 点に対応する目標の番号 形状 (M,)
+            count: 目標の数
+
+        戻り値:
+            distance_sq: 最も近いサンプルまでの距離の2乗 形状 (count,)
+            index: 最も近いサンプルを見つけた点の番号 形状 (count,)
+            cell, slot: サンプルの位置 形状 (count,)
+        """
+        shape = np.array(self.shape)
+        upper = self.origin + shape * self.spacing
+        clamped = np.clip(points, self.origin, upper)
+        bound_sq = offset_sq + np.sum((points - clamped) ** 2, axis=1)
+        center = self._cell_index(clamped)
+        base = side * (self.shape[0] * self.shape[1])
+        empty_cell = len(self._sections) - 1
+
+        best_sq = np.full(count, np.inf)
+        best_index = np.zeros(count, dtype=np.intp)
+        best_cell = np.full(count, empty_cell)
+        best_slot = np.zeros(count, dtype=np.intp)
+
+        def update(ids, nearest_sq, cell, slot):
+            """目標ごとの最良値を更新"""
+            # 同じ目標の正負の両側が同時に候補になる場合は小さい方を残す
+            targets = owner[ids]
+            previous = best_sq[targets]
+            np.minimum.at(best_sq, targets, nearest_sq)
+            winner = np.flatnonzero(
+                (nearest_sq < previous) & (nearest_sq == best_sq[targets]))
+            winner = winner[np.unique(targets[winner], return_index=True)[1]]
+            targets = targets[winner]
+            best_index[targets] = ids[winner]
+            best_cell[targets] = cell[winner]
+            best_slot[targets] = slot[winner]
+
+        radius = self._start_radius[
+            base + np.ravel_multi_index(center.T, self.shape)]
+        active = np.flatnonzero(radius < max(self.shape))
+        for _ in range(self._MAX_RINGS):
+            if len(active) == 0:
+                break
+            for ring in np.unique(radius[active]):
+                offsets = _ring_offsets(ring)
+                group = active[radius[active] == ring]
+                rows = max(1, self._QUERY_CHUNK //
+                           (len(offsets) * self.bucket_size))
+                for start in range(0, len(group), rows):
+                    ids = group[start:start + rows]
+                    cells = center[ids, None, :] + offsets[None, :, :]
+                    valid = np.all((cells >= 0) & (cells < shape), axis=2)
+                    flat = base[ids, None] + np.ravel_multi_index(
+                        np.clip(cells, 0, shape - 1).transpose(2, 0, 1),
+                        self.shape)
+                    flat = np.where(valid, flat, empty_cell)
+                    diff = self._sections[flat] - points[ids, None, None, :]
+                    dist_sq = np.einsum('ikbj,ikbj->ikb', diff, diff)
+                    dist_sq = dist_sq.reshape(len(ids), -1)
+                    nearest = np.argmin(dist_sq, axis=1)
+                    rows_index = np.arange(len(ids))
+                    update(ids,
+                           dist_sq[rows_index, nearest] + offset_sq[ids],
+                           flat[rows_index, nearest // self.bucket_size],
+                           nearest % self.bucket_size)
+            done = best_sq[owner[active]] <= \
+                bound_sq[active] + (radius[active] * self.spacing) ** 2
+            active = active[~done]
+            radius[active] += 1
+
+        # 残った点は全サンプルと比較する
+        for value, (samples, cells, slots) in enumerate(self._samples):
+            group = active[side[active] == value]
+            # リングの探索で見つかった最良値より近くなり得る点のみ
+            group = group[bound_sq[group] < best_sq[owner[group]]]
+            rows = max(1, self._QUERY_CHUNK // max(len(samples), 1))
+            for start in range(0, len(group), rows):
+                ids = group[start:start + rows]
+                # |p - s|^2 = |p|^2 - 2 p.s + |s|^2
+                dist_sq = np.sum(samples ** 2, axis=1) - \
+                    2 * points[ids] @ samples.T
+                nearest = np.argmin(dist_sq, axis=1)
+                nearest_sq = np.sum(
+                    (samples[nearest] - points[ids]) ** 2, axis=1)
+                update(ids, nearest_sq + offset_sq[ids],
+                       cells[nearest], slots[nearest])
+        return best_sq, best_index, best_cell, best_slot
+
+    def _refine(self, targets, angles, iterations, damping):
+        """
+        減衰最小二乗法(角度制限でクリップ)で手先位置を目標に近づける
+
+        1回の変化量は目標ごとの上限(最初はセルの一辺ぶんの角度)までとし、
+        近づいた場合は上限を広げて採用、遠ざかった場合は上限を狭めて
+        元の角度からやり直す
+        """
+        robot = self.robot
+        lower, upper = robot.joint_limits()
+        max_reach = robot.link1 + robot.link2 + robot.link3
+        limit = np.full(len(angles), 2 * self.spacing / max_reach)
+        best = angles.copy()
+        error = targets - robot.forward_kinematics_batch(best)[:, -1]
+        best_sq = np.sum(error ** 2, axis=1)
+        for _ in range(iterations):
+            # 目標から遠いほど減衰を強める(到達できない目標で振動しないよう)
+            damping_sq = (damping ** 2 + best_sq / 4)[:, None, None] * \
+                np.eye(3)
+            jacobian = robot.jacobian_batch(best)
+            step = damped_least_squares_step(jacobian, error, damping_sq)
+            # 角度制限に張り付いて外側へ動こうとする関節を固定して解き直す
+            blocked = ((best <= lower) & (step < 0)) | \
+                ((best >= upper) & (step > 0))
+            if blocked.any():
+                jacobian[blocked[:, None, :].repeat(3, axis=1)] = 0.0
+                step = damped_least_squares_step(jacobian, error, damping_sq)
+            largest = np.maximum(np.max(np.abs(step), axis=1), 1e-12)
+            step *= np.minimum(1.0, limit / largest)[:, None]
+            angles = np.clip(best + step, lower, upper)
+            new_error = targets - robot.forward_kinematics_batch(angles)[:, -1]
+            dist_sq = np.sum(new_error ** 2, axis=1)
+            better = dist_sq < best_sq
+            best[better] = angles[better]
+            best_sq[better] = dist_sq[better]
+            error[better] = new_error[better]
+            limit = np.where(better, limit * 2, limit / 2)
+        return best
+
+    def query(self, targets, refine=True, iterations=10, damping=1.0):
+        """
+        目標に最も近い到達可能な手先位置と関節角度を取得
+
+        パラメータ:
+            targets: 目標位置 [mm] 形状 (N, 3) または (3,)
+            refine: 探索結果を減衰最小二乗法で補正するか
+                    (False の場合は誤差がおよそセルの一辺以内の近似解)
+            iterations: 補正の反復回数
+            damping: 補正の減衰係数の最小値 [mm]
+
+        戻り値:
+            positions: 到達可能な手先位置 [mm] 形状 (N, 3)
+            angles: 関節角度 (theta1, ..., theta4) [rad] 形状 (N, 4)
+            distances: 目標からの距離 [mm] 形状 (N,)
+            (targets が1点の場合は、それぞれ (3,), (4,), float)
+            NaN / inf を含む目標は全て NaN (到達可能な点なし)
+        """
+        single = np.ndim(targets) == 1
+        targets = np.asarray(targets, dtype=float).reshape(-1, 3)
+        finite = np.isfinite(targets).all(axis=1)
+        positions = np.full((len(targets), 3), np.nan)
+        angles = np.full((len(targets), 4), np.nan)
+        distances = np.full(len(targets), np.nan)
+        if finite.any():
+            positions[finite], angles[finite], distances[finite] = \
+                self._query(targets[finite], refine, iterations, damping)
+        if single:
+            return positions[0], angles[0], float(distances[0])
+        return positions, angles, distances
+
+    def _query(self, targets, refine, iterations, damping):
+        """有限の目標 形状 (N, 3) に対する query"""
+        count = len(targets)
+        rho = np.hypot(targets[:, 0], targets[:, 1])
+        phi = np.arctan2(targets[:, 1], targets[:, 0])
+
+        # 半径が正の側は第1軸 = 方位、負の側は第1軸 = 方位 - π
+        # 第1軸を方位から gap だけずらすと、断面上の目標は
+        # (rho cos(gap), z) となり、距離の2乗に (rho sin(gap))^2 が加わる
+        theta1 = np.empty((2, count))
+        points = np.empty((2, count, 2))
+        offset_sq = np.empty((2, count))
+        for side, desired in enumerate((phi, phi - np.pi)):
+            theta1[side], gap = _nearest_in_range(
+                desired, self.robot.theta1_min, self.robot.theta1_max)
+            points[side, :, 0] = rho * np.cos(gap)
+            points[side, :, 1] = targets[:, 2]
+            offset_sq[side] = (rho * np.sin(gap)) ** 2
+
+        sides = np.repeat(np.arange(2), count)
+        owner = np.tile(np.arange(count), 2)
+        _, index, cell, slot = self._search(
+            points.reshape(-1, 2), sides, offset_sq.ravel(), owner, count)
+
+        angles = np.empty((count, 4))
+        angles[:, 0] = theta1.ravel()[index]
+        angles[:, 1:] = self._angles[cell, slot]
+        if refine:
+            angles = self._refine(targets, angles, iterations, damping)
+        positions = self.robot.forward_kinematics_batch(angles)[:, -1]
+        distances = np.linalg.norm(positions - targets, axis=1)
+        return positions, angles, distances